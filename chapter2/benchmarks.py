@@ -0,0 +1,625 @@
+"""
+통합 LLM 인터페이스 성능 측정 스크립트
+- 실제 Ollama/OpenAI 없이 로컬 대역 서버와 Mock 제공자만으로 실행됩니다.
+
+실행:
+    python benchmarks.py            # 모든 시나리오
+    python benchmarks.py transport  # 특정 시나리오만
+"""
+import asyncio
+import contextlib
+import io
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+import requests
+
+from fake_ollama_server import FakeOllamaServer
+from hybrid_basic import HybridLLM
+from llm_interface import LLM, Conversation
+from llm_ratelimit import RateLimiter, RateLimitTimeout
+from llm_registry import get_registry
+from llm_resilience import get_circuit_breaker, reset_resilience
+from llm_routing import AdaptiveRouter
+from llm_transport import LLMBackendError, TransportConfig
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def bench_transport(calls: int = 200):
+    """매 호출 새 연결(requests.post) vs 커넥션 풀 재사용(LLM.transport)"""
+    print(f"\n[transport] Ollama 대역 서버에 {calls}회 호출")
+    with FakeOllamaServer() as server:
+        url = f"{server.base_url}/api/generate"
+        payload = {"model": "llama3.2", "prompt": "안녕", "stream": False}
+
+        # 1) 기존 방식: 세션 없이 매번 requests.post
+        server.reset_stats()
+        start = time.perf_counter()
+        for _ in range(calls):
+            requests.post(url, json=payload, timeout=5).json()
+        plain_time = time.perf_counter() - start
+        plain_conns = server.connection_count
+
+        # 2) 커넥션 풀을 공유하는 LLM
+        llm = LLM(provider="ollama", base_url=server.base_url)
+        server.reset_stats()
+        start = time.perf_counter()
+        for _ in range(calls):
+            llm.generate("안녕")
+        pooled_time = time.perf_counter() - start
+        pooled_conns = server.connection_count
+        llm.close()
+
+    print(f"  requests.post : {plain_time * 1000 / calls:6.2f} ms/호출, TCP 연결 {plain_conns}개")
+    print(f"  커넥션 풀     : {pooled_time * 1000 / calls:6.2f} ms/호출, TCP 연결 {pooled_conns}개")
+    print(f"  속도 향상     : {plain_time / pooled_time:.2f}배")
+
+
+def bench_streaming(token_delay: float = 0.02):
+    """전체 응답을 기다릴 때와 스트리밍할 때 첫 토큰까지의 시간 비교"""
+    print(f"\n[streaming] 토큰당 지연 {token_delay * 1000:.0f}ms")
+    prompt = "스트리밍 동작을 설명해주세요."
+
+    mock = LLM(provider="mock", mock_token_delay=token_delay)
+    "".join(mock.generate_stream(prompt))
+    _print_stream_metrics("Mock (sync) ", mock.last_stream_metrics)
+    asyncio.run(_drain(mock.agenerate_stream(prompt)))
+    _print_stream_metrics("Mock (async)", mock.last_stream_metrics)
+
+    response_text = "Ollama 대역 서버가 보내는 스트리밍 응답을 토큰 단위로 확인합니다."
+    with FakeOllamaServer(token_delay=token_delay, response_text=response_text) as server:
+        llm = LLM(provider="ollama", base_url=server.base_url)
+        start = time.perf_counter()
+        llm.generate(prompt)
+        blocking_time = time.perf_counter() - start
+
+        "".join(llm.generate_stream(prompt))
+        _print_stream_metrics("Ollama 스트림", llm.last_stream_metrics)
+
+        async def consume_twice():
+            # 첫 호출은 httpx.AsyncClient 생성 비용이 포함되므로 두 번째 값을 봅니다
+            await _drain(llm.agenerate_stream(prompt))
+            await _drain(llm.agenerate_stream(prompt))
+
+        asyncio.run(consume_twice())
+        _print_stream_metrics("Ollama 비동기", llm.last_stream_metrics)
+        print(f"  Ollama 비스트리밍 generate: 첫 글자까지 {blocking_time * 1000:.1f}ms")
+
+        # 백엔드 오류는 토큰이 아니라 예외로 전달되고, 지표에는 실패로 남습니다
+        server.failure_rate = 1.0
+        for label, drain in (("동기", lambda: "".join(llm.generate_stream(prompt))),
+                             ("비동기", lambda: asyncio.run(_drain(llm.agenerate_stream(prompt))))):
+            try:
+                drain()
+            except LLMBackendError as e:
+                metrics = llm.last_stream_metrics
+                assert not metrics.ok and metrics.total_tokens == 0
+                assert metrics.time_to_first_token is None
+                print(f"  Ollama 500 ({label}): 예외 {e.status_code}, 지표 error={metrics.error}")
+            else:
+                raise AssertionError("실패한 스트림이 예외 없이 끝났습니다")
+        server.failure_rate = 0.0
+
+        # 200 응답 안의 error 줄, done 없이 끊긴 본문도 성공으로 세지 않습니다
+        for fault in ("error", "truncate"):
+            server.stream_fault = fault
+            for label, drain in (("동기", lambda: "".join(llm.generate_stream(prompt))),
+                                 ("비동기", lambda: asyncio.run(_drain(llm.agenerate_stream(prompt))))):
+                try:
+                    drain()
+                except LLMBackendError as e:
+                    metrics = llm.last_stream_metrics
+                    assert not metrics.ok, "깨진 스트림이 성공으로 기록되었습니다"
+                    print(f"  Ollama {fault} ({label}): 예외 '{e}'")
+                else:
+                    raise AssertionError(f"{fault} 스트림이 예외 없이 끝났습니다")
+        server.stream_fault = None
+        llm.close()
+
+
+def bench_batch(prompts: int = 64, latency: float = 0.05):
+    """generate_many의 동시성별 처리량 (지연을 주입한 Mock과 Ollama 대역 서버)"""
+    print(f"\n[batch] 프롬프트 {prompts}개, 호출당 지연 {latency * 1000:.0f}ms")
+    batch = [f"질문 {i}번에 답해주세요." for i in range(prompts)]
+
+    mock = LLM(provider="mock", mock_latency=latency)
+    _print_batch_scaling("Mock", mock, batch)
+
+    with FakeOllamaServer(latency=latency) as server:
+        llm = LLM(provider="ollama", base_url=server.base_url,
+                  transport_config=TransportConfig(pool_maxsize=32))
+        server.reset_stats()
+        _print_batch_scaling("Ollama 대역", llm, batch)
+        # 여섯 번의 generate_many가 같은 루프의 커넥션 풀을 나눠 씁니다
+        connections = server.connection_count
+        assert connections <= 32, connections
+
+        async def inside_loop():
+            return llm.generate_many(batch[:4])
+        assert all(r.ok for r in asyncio.run(inside_loop()))
+        print(f"  Ollama 대역 TCP 연결 {connections}개 (풀 크기 32), 이벤트 루프 안에서 부른 generate_many도 완료")
+        llm.close()
+
+
+def _print_batch_scaling(label: str, llm: LLM, batch):
+    baseline = None
+    for concurrency in (1, 2, 4, 8, 16, 32):
+        start = time.perf_counter()
+        results = llm.generate_many(batch, max_concurrency=concurrency)
+        elapsed = time.perf_counter() - start
+        failures = sum(1 for r in results if not r.ok)
+        throughput = len(batch) / elapsed
+        baseline = baseline or throughput
+        print(f"  {label:<10} 동시성 {concurrency:>2}: {throughput:7.1f} req/s "
+              f"({throughput / baseline:4.1f}배, 실패 {failures}건)")
+
+
+def bench_coalescing(callers: int = 50, latency: float = 0.05):
+    """같은 FAQ 질문이 동시에 몰릴 때 백엔드로 나가는 요청 수"""
+    print(f"\n[coalescing] 동일 프롬프트 동시 호출 {callers}개, 백엔드 지연 {latency * 1000:.0f}ms")
+    prompt = "환불은 며칠 안에 가능한가요?"
+
+    with FakeOllamaServer(latency=latency) as server:
+        for coalesce in (False, True):
+            llm = LLM(provider="ollama", base_url=server.base_url, coalesce=coalesce,
+                      transport_config=TransportConfig(pool_maxsize=callers))
+            label = "합치기 켬 " if coalesce else "합치기 끔"
+
+            # 동기 경로: 스레드마다 generate 호출
+            server.reset_stats()
+            barrier = threading.Barrier(callers)
+
+            def call():
+                barrier.wait()
+                llm.generate(prompt)
+
+            threads = [threading.Thread(target=call) for _ in range(callers)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            sync_time = time.perf_counter() - start
+            sync_upstream = server.request_count
+
+            # 비동기 경로: 한 이벤트 루프에서 agenerate 동시 호출
+            server.reset_stats()
+
+            async def fan_out():
+                await asyncio.gather(*(llm.agenerate(prompt) for _ in range(callers)))
+
+            start = time.perf_counter()
+            asyncio.run(fan_out())
+            async_time = time.perf_counter() - start
+            async_upstream = server.request_count
+
+            print(f"  {label} 동기: 백엔드 요청 {sync_upstream:>2}개, {sync_time * 1000:6.1f}ms | "
+                  f"비동기: 백엔드 요청 {async_upstream:>2}개, {async_time * 1000:6.1f}ms")
+            if coalesce:
+                print(f"  통계: {llm.coalescing_stats()}")
+
+                # 먼저 부른 호출이 취소되어도 합쳐진 호출은 같은 백엔드 응답을 받습니다
+                server.reset_stats()
+
+                async def cancel_leader():
+                    leader = asyncio.ensure_future(llm.agenerate(prompt))
+                    await asyncio.sleep(latency / 5)
+                    follower = asyncio.ensure_future(llm.agenerate(prompt))
+                    await asyncio.sleep(0)
+                    leader.cancel()
+                    text = await follower
+                    assert leader.cancelled(), "리더 호출이 취소되지 않았습니다"
+                    return text
+
+                text = asyncio.run(cancel_leader())
+                assert text and server.request_count == 1, "리더 취소가 팔로워로 번졌습니다"
+                print(f"  리더 취소 후 팔로워: 응답 받음, 백엔드 요청 {server.request_count}개")
+            llm.close()
+
+
+def bench_warmup(load_delay: float = 0.3):
+    """모델 예열 유무에 따른 첫 요청 지연"""
+    print(f"\n[warmup] 모델 콜드 로드 지연 {load_delay * 1000:.0f}ms")
+    for warm in (False, True):
+        with FakeOllamaServer(load_delay=load_delay) as server:
+            llm = LLM(provider="ollama", base_url=server.base_url, keep_alive="30m",
+                      warmup_models=["llama3.2"] if warm else None)
+            llm.wait_for_warmup()
+            start = time.perf_counter()
+            llm.generate("안녕하세요")
+            first = time.perf_counter() - start
+            keep_alive = server.received[-1].get("keep_alive")
+            label = "예열 후  " if warm else "예열 없음"
+            print(f"  {label}: 첫 요청 {first * 1000:6.1f}ms (keep_alive={keep_alive})")
+            llm.close()
+
+
+def check_context(turns: int = 5):
+    """
+    대화 context 왕복 확인: 서버가 돌려준 context를 다음 턴에 그대로 보내는지 검증하고,
+    대화 이력을 다시 보내는 방식과 요청 크기를 비교합니다.
+    """
+    print(f"\n[context] {turns}턴 대화에서 context 왕복 확인")
+    questions = [f"{i}번째 질문입니다. 앞의 내용을 이어서 설명해 주세요." for i in range(turns)]
+
+    with FakeOllamaServer() as server:
+        llm = LLM(provider="ollama", base_url=server.base_url)
+        conversation = llm.conversation()
+        returned = None
+        for question in questions:
+            conversation.generate(question)
+            sent = server.received[-1]
+            assert sent.get("context") == returned, "이전 턴의 context가 전달되지 않았습니다"
+            returned = conversation.context
+        assert returned and len(returned) > 0
+        print(f"  context {len(returned)}개 토큰이 {turns}턴 동안 그대로 왕복했습니다")
+
+        # 비교: context 없이 대화 이력을 프롬프트 앞에 붙여 다시 보내는 경우
+        resend = Conversation(llm)
+        resend_chars = 0
+        for question, turn in zip(questions, conversation.history):
+            resend_chars += len(resend._with_history(question))
+            resend.history.append(turn)
+        context_chars = sum(len(b.get("prompt", "")) for b in server.received)
+        print(f"  프롬프트로 보낸 글자 수: context 재사용 {context_chars}자 "
+              f"vs 이력 재전송 {resend_chars}자")
+
+        # 대화 턴도 generate와 같은 서킷 브레이커를 거칩니다
+        reset_resilience()
+        server.failure_rate = 1.0
+        text = conversation.generate("실패할 질문입니다.")
+        failures = get_circuit_breaker(f"ollama@{server.base_url}").consecutive_failures
+        assert text.startswith("Ollama 오류") and failures >= 1
+        server.failure_rate = 0.0
+        conversation.generate("회복 후 질문입니다.")
+        print(f"  실패한 턴: '{text}' (서킷에 실패 {failures}회 기록)")
+        reset_resilience()
+        llm.close()
+
+
+def bench_routing(requests_count: int = 300):
+    """
+    꼬리 지연이 있는 로컬 백엔드(보통 5ms, 5% 확률로 200ms)와
+    안정적인 클라우드 백엔드(40ms) 사이의 적응형 라우팅과 중복 요청 효과
+    """
+    print(f"\n[routing] 요청 {requests_count}개")
+    rng = random.Random(7)
+
+    def local(prompt):
+        time.sleep(0.2 if rng.random() < 0.05 else 0.005)
+        return "local"
+
+    def cloud(prompt):
+        time.sleep(0.04)
+        return "cloud"
+
+    for hedge in (False, True):
+        router = AdaptiveRouter(hedge=hedge, initial_hedge_delay=0.1)
+        router.add_backend("local", local, quality=0)
+        router.add_backend("cloud", cloud, quality=0)
+        latencies = []
+        for _ in range(requests_count):
+            start = time.perf_counter()
+            router.route("질문")
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[int(len(latencies) * 0.99)]
+        stats = router.stats()
+        label = "중복 요청 켬 " if hedge else "중복 요청 끔"
+        print(f"  {label}: p50 {p50 * 1000:6.1f}ms, p99 {p99 * 1000:6.1f}ms, "
+              f"결정 {stats['decisions']}, 중복 {stats['hedges_fired']}회 "
+              f"(승률 {stats['hedge_win_rate']:.0%})")
+        router.close()
+
+    # 로컬(무료)이 건강하고 SLO 안이면 더 빠른 클라우드 대신 로컬을 씁니다. 로컬이 죽으면 클라우드로 넘깁니다
+    with FakeOllamaServer(latency=0.05) as server, contextlib.redirect_stdout(io.StringIO()):
+        hybrid = HybridLLM(local_url=server.base_url)
+        local = sum(hybrid.process("오늘 날씨 어때?", "simple") != "클라우드 응답 시뮬레이션"
+                    for _ in range(25))
+        server.failure_rate = 1.0
+        during_outage = [hybrid.process("오늘 날씨 어때?", "simple") for _ in range(10)]
+        hybrid.router.close()
+    assert local == 25 and during_outage[-1] == "클라우드 응답 시뮬레이션"
+    print(f"  하이브리드 (로컬 50ms, 클라우드 즉시): 간단한 작업 {local}/25회 로컬, "
+          f"로컬 장애 중에는 클라우드")
+
+
+def bench_ratelimit(callers: int = 32, calls_per_caller: int = 10,
+                    capacity: int = 8, latency: float = 0.02):
+    """
+    동시 처리 용량이 capacity인 제공자(넘치면 429)를 여러 에이전트가 함께 쓸 때
+    제한 없이 보내는 경우와 AIMD 동시성 제어를 거치는 경우의 429 횟수와 대기 시간
+    """
+    print(f"\n[ratelimit] 호출자 {callers}개 × {calls_per_caller}회, "
+          f"제공자 동시 처리 용량 {capacity}")
+    lock = threading.Lock()
+    state = {"in_flight": 0, "rejected": 0}
+
+    def provider_call():
+        with lock:
+            if state["in_flight"] >= capacity:
+                state["rejected"] += 1
+                raise LLMBackendError("openai", 429)
+            state["in_flight"] += 1
+        try:
+            time.sleep(latency)
+        finally:
+            with lock:
+                state["in_flight"] -= 1
+
+    for limited in (False, True):
+        state["rejected"] = 0
+        limiter = RateLimiter(requests_per_minute=100_000, tokens_per_minute=10_000_000)
+
+        def caller():
+            for _ in range(calls_per_caller):
+                while True:  # 429를 받으면 잠시 후 다시 보내는 호출자
+                    try:
+                        if limited:
+                            with limiter.slot(estimated_tokens=100):
+                                provider_call()
+                        else:
+                            provider_call()
+                        break
+                    except LLMBackendError:
+                        time.sleep(0.005)
+
+        threads = [threading.Thread(target=caller) for _ in range(callers)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        label = "AIMD 제어 " if limited else "제한 없음"
+        print(f"  {label}: 429 {state['rejected']:>5}회, 전체 {elapsed * 1000:6.0f}ms")
+        if limited:
+            stats = limiter.stats()
+            print(f"    동시성 한도 {stats['concurrency_limit']}, 감속 {stats['backoffs']}회, "
+                  f"대기 p50 {stats['queue_wait_p50'] * 1000:.1f}ms / "
+                  f"p95 {stats['queue_wait_p95'] * 1000:.1f}ms")
+
+    # RPM 한도: 마감 시간 안에 통과하지 못한 호출만 RateLimitTimeout으로 실패합니다
+    limiter = RateLimiter(requests_per_minute=120, burst_seconds=1.0)
+    outcomes = []
+
+    def queued_call():
+        try:
+            with limiter.slot(timeout=1.0):
+                outcomes.append("ok")
+        except RateLimitTimeout:
+            outcomes.append("timeout")
+
+    threads = [threading.Thread(target=queued_call) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = limiter.stats()
+    print(f"  RPM 120, 마감 1초, 동시 호출 10개: 통과 {outcomes.count('ok')}개, "
+          f"시간 초과 {outcomes.count('timeout')}개, "
+          f"최대 대기 {stats['queue_wait_max'] * 1000:.0f}ms")
+
+    # 동기·비동기 호출이 한 줄에 서서 도착 순서대로 입장하고, 슬롯 반환 즉시 깨어납니다
+    limiter = RateLimiter(requests_per_minute=100_000, tokens_per_minute=10_000_000,
+                          initial_concurrency=1, max_concurrency=1)
+    order = []
+    limiter.acquire()   # 슬롯을 먼저 잡아 두고 뒤에 온 호출을 줄 세웁니다
+
+    async def async_waiters():
+        async def wait_turn(name):
+            async with limiter.aslot():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        tasks = []
+        for name in ("async-1", "async-2"):
+            tasks.append(asyncio.ensure_future(wait_turn(name)))
+            await asyncio.sleep(0.01)
+        return tasks
+
+    def sync_waiter():
+        with limiter.slot():
+            order.append("sync-3")
+
+    loop = asyncio.new_event_loop()
+    tasks = loop.run_until_complete(async_waiters())
+    sync_thread = threading.Thread(target=sync_waiter)
+    sync_thread.start()
+    time.sleep(0.02)
+    released = time.perf_counter()
+    limiter.release()
+    loop.run_until_complete(asyncio.gather(*tasks))
+    loop.close()
+    sync_thread.join()
+    handoff = limiter.stats()["queue_wait_max"]
+    assert order == ["async-1", "async-2", "sync-3"], f"대기 순서가 어긋났습니다: {order}"
+    print(f"  동시성 1, 비동기 2개 뒤 동기 1개: 입장 순서 {order}, "
+          f"반환 후 전체 {(time.perf_counter() - released) * 1000:.0f}ms "
+          f"(최대 대기 {handoff * 1000:.0f}ms)")
+
+
+def bench_resilience(calls: int = 100, failure_rate: float = 0.3):
+    """
+    불안정한 Ollama(일정 확률로 500)와 멈춘 Ollama에서의 재시도 예산과 서킷 브레이커
+    """
+    print(f"\n[resilience] 실패 확률 {failure_rate:.0%}인 서버에 요청 {calls}개")
+    with FakeOllamaServer(failure_rate=failure_rate, seed=3) as server:
+        for retries in (0, 1, 3):
+            reset_resilience()
+            server.reset_stats()
+            # 같은 서버에 대한 서킷이 열리지 않도록 임계값을 넉넉히 둡니다
+            llm = LLM(provider="ollama", base_url=server.base_url, retries=retries,
+                      retry_backoff=0.001, failure_threshold=calls)
+            ok = sum(not llm.generate("질문").startswith("Ollama 오류")
+                     for _ in range(calls))
+            budget = llm.resilience_stats()["retry_budget"]
+            print(f"  재시도 {retries}회: 성공 {ok:>3}/{calls}, "
+                  f"백엔드 요청 {server.request_count:>3}개 "
+                  f"(증폭 {server.request_count / calls:.2f}배), "
+                  f"예산 초과로 포기한 재시도 {budget['rejected']}회")
+            llm.close()
+
+    print("\n[resilience] 응답 없는 서버 (읽기 타임아웃 0.2초, 연속 3회 실패 시 서킷 열림)")
+    with FakeOllamaServer(hang=2.0) as server:
+        reset_resilience()
+        llm = LLM(provider="ollama", base_url=server.base_url, retries=0,
+                  failure_threshold=3, recovery_timeout=0.5,
+                  transport_config=TransportConfig(read_timeout=0.2))
+        for i in range(6):
+            start = time.perf_counter()
+            text = llm.generate("질문")
+            print(f"  호출 {i + 1}: {(time.perf_counter() - start) * 1000:6.1f}ms  {text[:40]}")
+
+        # 서버가 회복되면 recovery_timeout 뒤의 시험 호출(half-open)로 서킷이 닫힙니다
+        server.hang = 0.0
+        time.sleep(0.5)
+        start = time.perf_counter()
+        text = llm.generate("질문")
+        print(f"  회복 후: {(time.perf_counter() - start) * 1000:6.1f}ms  {text[:40]}")
+        breaker = get_circuit_breaker(f"ollama@{server.base_url}")
+        print("  상태 전이: " + ", ".join(f"{t['from']}→{t['to']}" for t in breaker.transitions))
+        llm.close()
+    reset_resilience()
+
+
+def _mixed_corpus(size: int, repeat_ratio: float, rng: random.Random):
+    """한국어·영어·코드가 섞인 코퍼스 (repeat_ratio만큼은 앞에 나온 텍스트를 반복)"""
+    korean = ["안녕하세요, 주문하신 상품의 배송 현황을 알려드립니다.",
+              "환불은 구매 후 7일 이내에 신청할 수 있습니다.",
+              "에이전트가 계획을 세우고 도구를 선택하여 작업을 수행합니다."]
+    english = ["The agent plans each step before calling a tool.",
+               "Token counts determine both latency and API cost.",
+               "Please summarize the meeting notes in three bullet points."]
+    code = ["def add(a, b):\n    return a + b\n",
+            "for i in range(10):\n    print(f'step {i}')\n",
+            "SELECT id, name FROM users WHERE active = 1;"]
+    corpus = []
+    for i in range(size):
+        if corpus and rng.random() < repeat_ratio:
+            corpus.append(rng.choice(corpus))
+            continue
+        parts = [rng.choice(rng.choice((korean, english, code))) for _ in range(rng.randint(1, 6))]
+        corpus.append(f"[{i}] " + " ".join(parts))
+    return corpus
+
+
+def bench_tokens(size: int = 20000, repeat_ratio: float = 0.3):
+    """
+    TokenAnalyzer 토큰 수 세기 처리량
+    (한 개씩 인코딩 vs 배치 API vs 캐시 적중 vs 프로세스 풀)
+    cl100k_base 인코딩 파일을 처음 한 번 내려받아야 합니다.
+    """
+    from tokenization import TokenAnalyzer
+
+    corpus = _mixed_corpus(size, repeat_ratio, random.Random(11))
+    print(f"\n[tokens] 코퍼스 {size}개 (중복 {repeat_ratio:.0%}, 한국어/영어/코드 혼합), "
+          f"CPU {os.cpu_count()}개")
+    analyzer = TokenAnalyzer(cache_size=size)
+
+    def measure(label, fn):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        print(f"  {label:<18}: {size / elapsed:>10,.0f} texts/s ({elapsed * 1000:7.1f}ms)")
+        return result
+
+    baseline = measure("한 개씩 encode", lambda: [len(analyzer.encoding.encode(t)) for t in corpus])
+    batched = measure("배치 + 중복 제거", lambda: analyzer.count_tokens_many(corpus))
+    cached = measure("캐시 적중", lambda: analyzer.count_tokens_many(corpus))
+    analyzer.clear_cache()
+    pooled = measure("프로세스 풀 4", lambda: analyzer.count_tokens_many(corpus, processes=4))
+    analyzer.clear_cache()
+    pooled = measure("프로세스 풀 4 (재사용)",
+                     lambda: analyzer.count_tokens_many(corpus, processes=4))
+    analyzer.close()
+
+    assert baseline == batched == cached == pooled, "방식에 따라 토큰 수가 달라졌습니다"
+    print(f"  토큰 합계 {sum(baseline):,}개 - 모든 방식의 결과가 같습니다")
+
+
+def bench_startup():
+    """
+    응답하지 않는 Ollama(연결만 받고 응답 없음) 환경에서 구성요소 초기화 시간
+    감지는 프로세스당 한 번이므로 첫 생성만 프로브 타임아웃(1초)을 기다립니다.
+    """
+    print("\n[startup] 응답하지 않는 Ollama 대역에서 초기화 시간")
+    for path in (os.path.join(_REPO_ROOT, "chapter3", "agent"),
+                 os.path.join(_REPO_ROOT, "chapter5")):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+    hung = socket.socket()
+    hung.bind(("127.0.0.1", 0))
+    hung.listen(64)
+    accepted = []
+    threading.Thread(
+        target=lambda: [accepted.append(hung.accept()) for _ in iter(int, 1)],
+        daemon=True,
+    ).start()
+    os.environ["OLLAMA_HOST"] = "127.0.0.1:%d" % hung.getsockname()[1]
+    get_registry().reset()
+
+    components = []
+    try:
+        from core import Agent
+        components.append(("Agent", Agent))
+    except ImportError as e:
+        print(f"  Agent 건너뜀: {e}")
+    try:
+        from basic_collaboration import SimpleCoordinator
+        components.append(("SimpleCoordinator", SimpleCoordinator))
+    except ImportError as e:
+        print(f"  SimpleCoordinator 건너뜀 (langchain-core 필요): {e}")
+
+    for round_name in ("첫 생성", "재생성"):
+        for name, factory in components:
+            probes_before = get_registry().probe_count
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                factory()
+                elapsed = time.perf_counter() - start
+            probes = get_registry().probe_count - probes_before
+            print(f"  {round_name} {name:<18}: {elapsed * 1000:7.1f}ms (프로브 {probes}회)")
+
+    get_registry().reset()
+    del os.environ["OLLAMA_HOST"]
+    hung.close()
+
+
+async def _drain(stream):
+    return [token async for token in stream]
+
+
+def _print_stream_metrics(label: str, metrics):
+    itl = metrics.mean_inter_token_latency or 0.0
+    print(f"  {label}: TTFT {metrics.time_to_first_token * 1000:6.1f}ms, "
+          f"토큰 간격 {itl * 1000:5.1f}ms, "
+          f"토큰 {metrics.total_tokens}개, 전체 {metrics.total_time * 1000:6.1f}ms")
+
+
+SCENARIOS = {
+    "transport": bench_transport,
+    "streaming": bench_streaming,
+    "batch": bench_batch,
+    "startup": bench_startup,
+    "coalescing": bench_coalescing,
+    "warmup": bench_warmup,
+    "context": check_context,
+    "routing": bench_routing,
+    "ratelimit": bench_ratelimit,
+    "resilience": bench_resilience,
+    "tokens": bench_tokens,
+}
+
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(SCENARIOS)
+    for name in selected:
+        SCENARIOS[name]()
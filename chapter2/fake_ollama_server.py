@@ -0,0 +1,231 @@
+"""
+벤치마크와 동작 확인에 사용하는 로컬 Ollama 대역(stand-in) 서버
+- 실제 Ollama 없이 /api/tags, /api/generate 엔드포인트를 흉내 냅니다.
+- 서버가 받은 TCP 연결 수와 요청 수를 세어 커넥션 재사용 여부를 확인할 수 있습니다.
+- failure_rate, hang으로 불안정하거나 멈춘 Ollama를, stream_fault로 중간에 깨지는 스트림을 흉내 낼 수 있습니다.
+"""
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"\S+\s*", text)
+
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1이어야 keep-alive로 연결을 재사용할 수 있습니다
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        # 핸들러 인스턴스 하나가 TCP 연결 하나에 대응합니다
+        self.server.owner._on_connection()
+
+    def log_message(self, format, *args):
+        pass  # 벤치마크 출력이 지저분해지지 않도록 로그를 끕니다
+
+    def do_GET(self):
+        owner = self.server.owner
+        owner._on_request()
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": m} for m in owner.models]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        owner = self.server.owner
+        owner._on_request()
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        owner.received.append(body)
+
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        # 멈춘 서버: 응답을 hang초 동안 보내지 않습니다
+        if owner.hang:
+            time.sleep(owner.hang)
+
+        # 불안정한 서버: failure_rate 확률로 500을 돌려줍니다
+        if owner._should_fail():
+            self._send_json(500, {"error": "simulated failure"})
+            return
+
+        # 아직 적재되지 않은 모델은 콜드 로드 지연을 흉내 냅니다
+        owner._load_model(body.get("model"))
+
+        # 프롬프트 없는 요청은 모델 예열 요청입니다
+        if not body.get("prompt"):
+            self._send_json(200, {"model": body.get("model"), "response": "", "done": True})
+            return
+
+        if owner.latency:
+            time.sleep(owner.latency)
+
+        # Ollama는 stream 필드가 없으면 스트리밍으로 응답합니다
+        if body.get("stream", True):
+            self._send_stream(body, owner)
+            return
+
+        # 비스트리밍 응답도 토큰을 모두 생성할 때까지 기다린 것처럼 지연합니다
+        if owner.token_delay:
+            time.sleep(owner.token_delay * len(_tokens(owner.response_text)))
+
+        self._send_json(200, {
+            "model": body.get("model"),
+            "response": owner.response_text,
+            "done": True,
+            "context": owner.next_context(body),
+        })
+
+    def _send_stream(self, body: dict, owner: "FakeOllamaServer"):
+        """토큰마다 NDJSON 한 줄을 chunked 인코딩으로 보냅니다"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        for i, token in enumerate(_tokens(owner.response_text)):
+            if owner.token_delay:
+                time.sleep(owner.token_delay)
+            if i == 1 and owner.stream_fault == "error":
+                # Ollama는 생성 도중 실패하면 200 응답 안에 error 줄을 보냅니다
+                self._write_chunk({"error": "simulated stream failure"})
+                self.wfile.write(b"0\r\n\r\n")
+                return
+            if i == 1 and owner.stream_fault == "truncate":
+                break   # done 없이 본문을 끝냅니다 (연결이 끊긴 경우)
+            self._write_chunk({"model": body.get("model"), "response": token, "done": False})
+        else:
+            self._write_chunk({"model": body.get("model"), "response": "", "done": True})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, payload: dict):
+        line = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _ThreadingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 동시 연결이 몰려도 SYN이 버려지지 않도록 대기열을 넉넉히 둡니다
+    request_queue_size = 128
+
+
+class FakeOllamaServer:
+    """
+    스레드 기반의 가짜 Ollama 서버
+
+    사용 예:
+        with FakeOllamaServer(latency=0.01) as server:
+            llm = LLM(provider="ollama", base_url=server.base_url)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0,
+                 token_delay: float = 0.0,
+                 load_delay: float = 0.0,
+                 response_text: str = "가짜 Ollama 응답입니다.",
+                 models: Optional[List[str]] = None,
+                 failure_rate: float = 0.0,
+                 hang: float = 0.0,
+                 stream_fault: Optional[str] = None,
+                 seed: Optional[int] = None):
+        self.host = host
+        self.port = port
+        self.latency = latency            # 생성 요청마다 추가할 지연 (초)
+        self.token_delay = token_delay    # 스트리밍 토큰 사이의 지연 (초)
+        self.load_delay = load_delay      # 모델 콜드 로드 지연 (초)
+        self.response_text = response_text
+        self.models = models or ["llama3.2"]
+        self.failure_rate = failure_rate  # 생성 요청이 500으로 실패할 확률 (실행 중에 바꿀 수 있음)
+        self.hang = hang                  # 생성 요청에 응답하기 전 멈춰 있을 시간 (초)
+        # 스트림을 첫 토큰 뒤에 깨뜨립니다: "error"면 error 줄, "truncate"면 done 없이 끝 (None이면 정상)
+        self.stream_fault = stream_fault
+        self._rng = random.Random(seed)
+
+        self.connection_count = 0
+        self.request_count = 0
+        self.failure_count = 0
+        self.loaded_models = set()
+        self.received = deque(maxlen=1000)  # 최근에 받은 요청 본문
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "FakeOllamaServer":
+        self._httpd = _ThreadingServer((self.host, self.port), _OllamaHandler)
+        self._httpd.owner = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def reset_stats(self):
+        with self._lock:
+            self.connection_count = 0
+            self.request_count = 0
+            self.failure_count = 0
+            self.received.clear()
+
+    def next_context(self, body: dict) -> List[int]:
+        """
+        이전 context 뒤에 이번 턴의 (가짜) 토큰 번호를 이어 붙입니다
+        클라이언트가 context를 제대로 되돌려 보내는지 확인하는 용도입니다.
+        """
+        previous = body.get("context") or []
+        turn = _tokens(body.get("prompt", "")) + _tokens(self.response_text)
+        return previous + [abs(hash(token)) % 32000 for token in turn]
+
+    def _load_model(self, model: str):
+        with self._lock:
+            loaded = model in self.loaded_models
+            self.loaded_models.add(model)
+        if not loaded and self.load_delay:
+            time.sleep(self.load_delay)
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            failed = self.failure_rate > 0 and self._rng.random() < self.failure_rate
+            if failed:
+                self.failure_count += 1
+        return failed
+
+    def _on_connection(self):
+        with self._lock:
+            self.connection_count += 1
+
+    def _on_request(self):
+        with self._lock:
+            self.request_count += 1
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -1,28 +1,54 @@
 """
 작업 복잡도에 따라 로컬/클라우드 LLM을 전환하는 하이브리드 예제.
 Ollama가 없어도 Mock 응답으로 동작을 확인할 수 있습니다.
+
+고정 규칙 대신 백엔드의 실제 지연 시간과 오류율을 보고 라우팅합니다.
+간단한 작업은 로컬(무료)이 건강하고 지연 목표(latency_slo) 안이면 로컬에서 처리하고,
+로컬이 자주 실패하거나 느려졌을 때, 또는 한 요청이 목표 시간을 넘겼을 때만 클라우드를 씁니다.
 """
 from ollama_client import OllamaClient
+from llm_routing import AdaptiveRouter
+
+# 복잡도별로 요구하는 품질 등급 (클라우드만 complex 작업을 처리)
+QUALITY_TIERS = {"simple": 0, "complex": 1}
 
 
 class HybridLLM:
     """작업에 따라 로컬/클라우드를 선택하는 시스템"""
 
-    def __init__(self):
-        self.local_client = OllamaClient()
+    def __init__(self, hedge: bool = True, latency_slo: float = 10.0,
+                 local_url: str = "http://localhost:11434"):
+        self.local_client = OllamaClient(base_url=local_url)
         # self.cloud_client = OpenAIClient()  # 실제로는 OpenAI 클라이언트
 
-    def process(self, task: str, complexity: str = "simple") -> str:
-        """복잡도에 따라 적절한 모델 선택"""
-        if complexity == "simple":
-            # 간단한 작업은 로컬에서  ❶
+        # 백엔드별 지연·오류율을 보고 고르는 적응형 라우터 (싼 백엔드 우선, SLO를 넘기면 클라우드)
+        self.router = AdaptiveRouter(hedge=hedge, latency_slo=latency_slo)
+        self.router.add_backend("local", self._local_generate, quality=0)
+        self.router.add_backend("cloud", self._cloud_generate, quality=1)
+
+    def process(self, task: str, complexity: str = None) -> str:
+        """복잡도가 요구하는 품질 등급 안에서 건강하고 SLO 안에 있는 가장 싼 백엔드 선택"""
+        complexity = complexity or self.estimate_complexity(task)
+        text, backend = self.router.route(task, min_quality=QUALITY_TIERS[complexity])
+
+        if backend == "local":
+            # 간단한 작업은 주로 로컬에서  ❶
             print("→ 로컬 모델 사용 (무료)")
-            return self.local_client.generate("llama3.2", task)
         else:
-            # 복잡한 작업은 클라우드에서  ❷
+            # 복잡한 작업이나 로컬이 느리거나 불안정할 때는 클라우드에서  ❷
             print("→ 클라우드 모델 사용 (고성능)")
-            # return self.cloud_client.generate(task)
-            return "클라우드 응답 시뮬레이션"
+        return text
+
+    def _local_generate(self, task: str) -> str:
+        """로컬 모델 호출 - 오류 문자열은 예외로 바꿔 라우터가 실패로 집계하게 합니다"""
+        result = self.local_client.generate("llama3.2", task)
+        if result.startswith(("Ollama 서버에 연결할 수 없습니다", "오류:")):
+            raise RuntimeError(result)
+        return result
+
+    def _cloud_generate(self, task: str) -> str:
+        # return self.cloud_client.generate(task)
+        return "클라우드 응답 시뮬레이션"
 
     def estimate_complexity(self, task: str) -> str:
         """작업 복잡도 자동 판단"""
@@ -34,6 +60,10 @@ class HybridLLM:
         else:
             return "simple"
 
+    def routing_stats(self) -> dict:
+        """라우팅 결정, 중복 요청 승률, 백엔드별 지연·오류율"""
+        return self.router.stats()
+
 
 if __name__ == "__main__":
     hybrid = HybridLLM()
@@ -47,3 +77,5 @@ if __name__ == "__main__":
         print(f"\n작업: {task}")
         result = hybrid.process(task, complexity)
         print(f"결과: {str(result)[:100]}...")
+
+    print(f"\n라우팅 통계: {hybrid.routing_stats()}")
@@ -0,0 +1,137 @@
+"""
+동일한 요청의 중복 호출을 합치는 single-flight 계층
+- 같은 키의 요청이 이미 진행 중이면 새로 보내지 않고 그 결과를 함께 받습니다.
+- 먼저 보낸 호출(리더)이 실패하면 기다리던 호출(팔로워)도 같은 예외를 받고,
+  진행 중 목록에서 지워지므로 다음 호출은 다시 시도합니다.
+- 비동기 호출은 별도 태스크에서 실행되므로 처음 부른 쪽이 취소되어도 나머지는 결과를 받고,
+  기다리는 호출이 모두 취소되었을 때만 백엔드 호출을 취소합니다.
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _InFlightCall:
+    """진행 중인 동기 호출 하나"""
+    __slots__ = ("event", "result", "error", "followers")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class _AsyncInFlightCall:
+    """진행 중인 비동기 호출 하나 (호출한 쪽과 분리된 태스크에서 실행)"""
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0   # 아직 결과를 기다리는 호출 수
+
+
+class SingleFlight:
+    """
+    키 단위로 진행 중인 호출을 합치는 도구 (동기/비동기 모두 지원)
+
+    사용 예:
+        flight = SingleFlight()
+        text = flight.do(key, lambda: llm_call(prompt))
+        text = await flight.ado(key, lambda: allm_call(prompt))
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _InFlightCall] = {}
+        # 비동기 호출은 이벤트 루프마다 따로 관리합니다
+        self._async_calls: Dict[Tuple[int, Hashable], _AsyncInFlightCall] = {}
+
+        self.leader_calls = 0     # 실제로 백엔드에 보낸 호출 수
+        self.coalesced_calls = 0  # 진행 중인 호출에 합쳐진 호출 수
+        self.leader_failures = 0  # 실패한 리더 호출 수
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """같은 key의 호출이 진행 중이면 그 결과를 기다리고, 아니면 fn을 실행합니다"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.coalesced_calls += 1
+                leader = False
+            else:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self.leader_calls += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.leader_failures += 1
+            raise
+        finally:
+            # 결과를 알리기 전에 목록에서 지워야 이후 호출이 새로 시작됩니다
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """do의 비동기 버전"""
+        loop = asyncio.get_running_loop()
+        loop_key = (id(loop), key)
+
+        call = self._async_calls.get(loop_key)
+        if call is not None and not call.task.done():
+            self.coalesced_calls += 1
+        else:
+            # fn을 별도 태스크로 실행해야 처음 부른 쪽이 취소되어도 팔로워가 함께 취소되지 않습니다
+            call = _AsyncInFlightCall(asyncio.ensure_future(fn()))
+            self._async_calls[loop_key] = call
+            self.leader_calls += 1
+            call.task.add_done_callback(
+                lambda task, call=call: self._finish_async(loop_key, call)
+            )
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if not call.task.done():
+                # 이 호출만 취소됨 - 기다리는 호출이 하나도 남지 않으면 백엔드 호출도 멈춥니다
+                call.waiters -= 1
+                if call.waiters == 0:
+                    call.task.cancel()
+            raise
+
+    def _finish_async(self, loop_key: Tuple[int, Hashable], call: _AsyncInFlightCall):
+        """비동기 호출이 끝나면 목록에서 지우고 실패를 집계합니다"""
+        if self._async_calls.get(loop_key) is call:
+            del self._async_calls[loop_key]
+        if call.task.cancelled():
+            self.leader_failures += 1
+        elif call.task.exception() is not None:  # 기다리는 호출이 없어도 경고가 나지 않도록 확인
+            self.leader_failures += 1
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls) + len(self._async_calls)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.leader_calls + self.coalesced_calls
+        return {
+            "leader_calls": self.leader_calls,
+            "coalesced_calls": self.coalesced_calls,
+            "leader_failures": self.leader_failures,
+            "in_flight": self.in_flight,
+            "coalesce_rate": self.coalesced_calls / total if total else 0.0,
+        }
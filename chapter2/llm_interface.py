@@ -1,20 +1,122 @@
 import os
-import requests
-from typing import Optional, Dict, Any
+import random
+import sys
+import time
+import asyncio
+import weakref
+from collections import deque
+from dataclasses import dataclass
+import threading
+from typing import Optional, Dict, Any, Iterator, AsyncIterator, List, Union
 import json
 
+# chapter2.llm_interface 형태로 불러와도 같은 폴더의 모듈을 찾을 수 있도록 경로를 추가합니다.
+_CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if _CURRENT_DIR not in sys.path:
+    sys.path.insert(0, _CURRENT_DIR)
+
+from llm_transport import HTTPTransport, TransportConfig, LLMBackendError, run_sync
+from llm_registry import get_registry, default_ollama_url
+from llm_coalescing import SingleFlight
+from llm_ratelimit import RateLimiter, estimate_tokens, get_rate_limiter
+from llm_resilience import (
+    CircuitOpenError, counts_as_failure, get_circuit_breaker, get_retry_budget
+)
+from llm_streaming import (
+    StreamMetrics, iter_ndjson, parse_ndjson_line, split_mock_tokens
+)
+
+@dataclass
+class GenerationResult:
+    """배치 생성(generate_many)에서 프롬프트 하나의 결과"""
+    index: int
+    prompt: str
+    text: Optional[str] = None
+    error: Optional[Exception] = None
+    latency: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _usage_tokens(response) -> Optional[int]:
+    """OpenAI 응답에 실제 사용 토큰 수가 있으면 돌려줍니다 (TPM 예약 보정용)"""
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage else None
+
+
 class LLM:
     """
     이 책의 모든 예제에서 사용할 통합 LLM 인터페이스
     자동으로 최적의 제공자를 선택합니다
     """
     
-    def __init__(self, provider: str = "auto", model: str = None):
+    # 장애 시 넘어갈 제공자 순서 (자동 감지 우선순위와 같습니다)
+    FAILOVER_ORDER = ("ollama", "openai")
+
+    def __init__(self, provider: str = "auto", model: str = None,
+                 base_url: str = None,
+                 transport_config: Optional[TransportConfig] = None,
+                 mock_token_delay: float = 0.0,
+                 mock_latency: float = 0.0,
+                 coalesce: bool = False,
+                 keep_alive: Optional[Union[str, int]] = None,
+                 warmup_models: Optional[List[str]] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 failover: bool = True,
+                 retries: int = 1,
+                 retry_backoff: float = 0.05,
+                 failure_threshold: int = 5,
+                 recovery_timeout: float = 30.0):
         """
         LLM 인터페이스 초기화
         provider: "auto", "ollama", "openai", "mock" 중 선택
         model: 사용할 모델명 (None이면 기본값 사용)
+        base_url: Ollama 서버 주소 (None이면 OLLAMA_HOST 또는 http://localhost:11434)
+        transport_config: 커넥션 풀 크기, keep-alive, 타임아웃 설정
+        mock_token_delay: Mock 스트리밍에서 토큰 사이에 넣을 지연 (초)
+        mock_latency: Mock 응답 한 번에 넣을 지연 (초, 배치 처리량 측정용)
+        coalesce: True면 동시에 들어온 동일 요청을 하나의 백엔드 호출로 합칩니다
+        keep_alive: Ollama가 요청 후 모델을 메모리에 유지할 시간 (예: "30m", -1은 계속 유지)
+        warmup_models: 시작할 때 미리 불러올 Ollama 모델 목록 (백그라운드에서 수행)
+        rate_limiter: OpenAI 호출에 적용할 속도 제한기 (None이면 프로세스 전역 제한기 공유)
+        failover: 백엔드가 실패하거나 서킷이 열려 있으면 다음 제공자로 넘어갈지 여부
+        retries: 백엔드 하나에 대한 재시도 횟수 (프로세스 전역 재시도 예산 안에서만 허용)
+        retry_backoff: 재시도 전 대기 시간의 기준값 (초, 지수 증가 + 무작위 지터)
+        failure_threshold: 서킷을 열기까지의 연속 실패 횟수
+        recovery_timeout: 열린 서킷이 시험 호출(half-open)을 허용하기까지의 시간 (초)
         """
+        self.base_url = base_url or default_ollama_url()
+        self.mock_token_delay = mock_token_delay
+        self.mock_latency = mock_latency
+
+        # 제공자별 커넥션 풀 - 이 인스턴스를 공유하는 모든 구성요소가 함께 사용합니다
+        self.transport = HTTPTransport(transport_config)
+        self._openai_client = None
+        self._async_openai_clients = weakref.WeakKeyDictionary()
+
+        # 최근 스트림들의 지연 시간 지표
+        self.stream_metrics = deque(maxlen=100)
+
+        # 동일 요청 합치기 (opt-in)
+        self._singleflight = SingleFlight() if coalesce else None
+
+        # Ollama 모델 유지 시간과 시작 시 예열할 모델
+        self.keep_alive = keep_alive
+        self.warmup_models = warmup_models or []
+        self._warmup_thread: Optional[threading.Thread] = None
+
+        # OpenAI RPM/TPM 제한과 적응형 동시성 (같은 API 키를 쓰는 인스턴스끼리 공유)
+        self.rate_limiter = rate_limiter
+
+        # 서킷 브레이커와 재시도 설정 (브레이커는 백엔드별로 프로세스 전역 공유)
+        self.failover = failover
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+
         # 제공자 자동 감지 또는 수동 설정
         if provider == "auto":
             self.provider = self._detect_provider()
@@ -27,32 +129,22 @@ class LLM:
         # 클라이언트 초기화
         self._initialize_client()
 
+        # 콜드 로드 지연이 첫 요청에 얹히지 않도록 모델을 미리 불러옵니다
+        if self.provider == "ollama" and self.warmup_models:
+            self._warmup_thread = threading.Thread(
+                target=self.warm_up, name="ollama-warmup", daemon=True
+            )
+            self._warmup_thread.start()
+
         print(f"[LLM] 초기화 완료: {self.provider} ({self.model})")
     
     def _detect_provider(self) -> str:
         """
         사용 가능한 LLM 제공자를 자동으로 감지
-        우선순위: Ollama  OpenAI  Mock
+        우선순위: Ollama  OpenAI  Mock
+        실제 확인은 프로세스당 한 번만 하고, 이후에는 레지스트리의 캐시를 사용합니다.
         """
-        # Ollama 확인
-        try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=1)
-            if response.status_code == 200:
-                print("[LLM] Ollama 감지됨")
-                return "ollama"
-        except Exception:
-            pass
-
-        # OpenAI API 키 확인
-        if os.getenv("OPENAI_API_KEY"):
-            print("[LLM] OpenAI API 키 감지됨")
-            return "openai"
-
-        # 둘 다 없으면 Mock 모드
-        print("[LLM] Ollama와 OpenAI가 없어 Mock 모드로 실행합니다.")
-        print("       - Ollama 설치: https://ollama.com")
-        print("       - OpenAI 설정: export OPENAI_API_KEY='your-key'")
-        return "mock"
+        return get_registry().detect_provider(self.base_url)
     
     def _get_default_model(self) -> str:
         """각 제공자의 기본 모델 반환"""
@@ -65,68 +157,557 @@ class LLM:
     
     def _initialize_client(self):
         """선택된 제공자에 따라 클라이언트 초기화"""
-        if self.provider == "ollama":
-            self.base_url = "http://localhost:11434"
-        elif self.provider == "openai":
+        if self.provider == "openai":
             self.api_key = os.getenv("OPENAI_API_KEY")
-        # Mock는 별도 초기화 불필요
+            if self.rate_limiter is None:
+                self.rate_limiter = get_rate_limiter("openai")
+        # Ollama는 base_url과 커넥션 풀만 있으면 되고, Mock는 별도 초기화 불필요
+
+    def _get_openai_client(self):
+        """OpenAI 클라이언트를 한 번만 만들어 재사용합니다"""
+        if self._openai_client is None:
+            from openai import OpenAI
+
+            self._openai_client = OpenAI(
+                api_key=self.api_key,
+                max_retries=self.transport.config.max_retries,
+                http_client=self.transport.httpx_client(),
+            )
+        return self._openai_client
+
+    def _get_async_openai_client(self):
+        """현재 이벤트 루프에서 사용할 AsyncOpenAI 클라이언트"""
+        loop = asyncio.get_running_loop()
+        client = self._async_openai_clients.get(loop)
+        if client is None:
+            from openai import AsyncOpenAI
+
+            client = AsyncOpenAI(
+                api_key=self.api_key,
+                max_retries=self.transport.config.max_retries,
+                http_client=self.transport.async_httpx_client(),
+            )
+            self._async_openai_clients[loop] = client
+        return client
+
+    def warm_up(self, models: Optional[List[str]] = None) -> Dict[str, bool]:
+        """
+        Ollama 모델을 메모리에 미리 불러옵니다
+        프롬프트 없이 /api/generate를 호출하면 Ollama는 모델만 적재하고 바로 응답합니다.
+        """
+        if self.provider != "ollama":
+            return {}
+        loaded = {}
+        for model in models or self.warmup_models or [self.model]:
+            payload = {"model": model, "stream": False}
+            if self.keep_alive is not None:
+                payload["keep_alive"] = self.keep_alive
+            try:
+                response = self.transport.post(
+                    f"{self.base_url}/api/generate", json=payload
+                )
+                loaded[model] = response.status_code == 200
+            except Exception:
+                loaded[model] = False
+        return loaded
+
+    def wait_for_warmup(self, timeout: Optional[float] = None) -> bool:
+        """백그라운드 예열이 끝날 때까지 기다립니다 (끝났으면 True)"""
+        if self._warmup_thread is None:
+            return True
+        self._warmup_thread.join(timeout)
+        return not self._warmup_thread.is_alive()
+
+    def conversation(self) -> "Conversation":
+        """여러 턴에 걸친 대화 세션을 시작합니다"""
+        return Conversation(self)
+
+    def close(self):
+        """커넥션 풀을 닫습니다"""
+        self.transport.close()
+        self._openai_client = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
     
     def generate(self, prompt: str, temperature: float = 0.7, 
                 max_tokens: int = 500) -> str:
         """
         모든 장에서 동일하게 사용할 텍스트 생성 메서드
         """
+        if self._singleflight is None:
+            return self._generate_provider(prompt, temperature, max_tokens)
+        return self._singleflight.do(
+            self._coalesce_key(prompt, temperature, max_tokens),
+            lambda: self._generate_provider(prompt, temperature, max_tokens)
+        )
+
+    def _generate_provider(self, prompt: str, temperature: float,
+                           max_tokens: int) -> str:
+        """
+        선택된 제공자로 텍스트를 생성합니다
+        서킷 브레이커·재시도 예산·장애 전환을 거치며, 모두 실패하면 오류 문자열을 돌려줍니다.
+        """
+        if self.provider not in self.FAILOVER_ORDER:
+            return self._request(prompt, temperature, max_tokens)
+        try:
+            return self._call_resilient(
+                lambda llm: llm._request(prompt, temperature, max_tokens)
+            )
+        except ImportError:
+            return "OpenAI 라이브러리가 설치되지 않았습니다. pip install openai"
+        except Exception as e:
+            return self._format_error(e)
+
+    def _request(self, prompt: str, temperature: float, max_tokens: int) -> str:
+        """이 인스턴스의 제공자로 한 번 호출합니다 (실패하면 예외 발생)"""
         if self.provider == "ollama":
-            return self._ollama_generate(prompt, temperature, max_tokens)
+            return self._ollama_request(prompt, temperature, max_tokens)
         elif self.provider == "openai":
-            return self._openai_generate(prompt, temperature, max_tokens)
+            return self._openai_request(prompt, temperature, max_tokens)
         else:
+            if self.mock_latency:
+                time.sleep(self.mock_latency)
             return self._mock_generate(prompt)
-    
-    def _ollama_generate(self, prompt: str, temperature: float, 
+
+    def _call_resilient(self, call):
+        """
+        장애 전환 순서대로 call(llm)을 시도합니다
+        서킷이 열린 백엔드는 기다리지 않고 건너뛰고, 재시도는 전역 예산이 허락할 때만 합니다.
+        모두 실패하면 마지막 오류를 올려 보내며, 오류의 failed_provider에 실패한 제공자가 남습니다.
+        """
+        budget = get_retry_budget()
+        budget.record_request()
+        last_error: Optional[Exception] = None
+        for llm in self._failover_chain():
+            breaker = llm._breaker()
+            for attempt in range(self.retries + 1):
+                if not breaker.allow():
+                    last_error = last_error or _tag_provider(
+                        CircuitOpenError(breaker.name, breaker.retry_in()), llm
+                    )
+                    break
+                try:
+                    result = call(llm)
+                except Exception as e:
+                    _tag_provider(e, llm)
+                    if not counts_as_failure(e):
+                        breaker.record_ignored()
+                        raise
+                    breaker.record_failure()
+                    last_error = e
+                    if attempt == self.retries or not budget.try_spend():
+                        break
+                    time.sleep(self._retry_delay(attempt))
+                    continue
+                breaker.record_success()
+                return result
+        raise last_error
+
+    async def _acall_resilient(self, call):
+        """_call_resilient의 비동기 버전 (call(llm)은 코루틴을 돌려줍니다)"""
+        budget = get_retry_budget()
+        budget.record_request()
+        last_error: Optional[Exception] = None
+        for llm in self._failover_chain():
+            breaker = llm._breaker()
+            for attempt in range(self.retries + 1):
+                if not breaker.allow():
+                    last_error = last_error or _tag_provider(
+                        CircuitOpenError(breaker.name, breaker.retry_in()), llm
+                    )
+                    break
+                try:
+                    result = await call(llm)
+                except Exception as e:
+                    _tag_provider(e, llm)
+                    if not counts_as_failure(e):
+                        breaker.record_ignored()
+                        raise
+                    breaker.record_failure()
+                    last_error = e
+                    if attempt == self.retries or not budget.try_spend():
+                        break
+                    await asyncio.sleep(self._retry_delay(attempt))
+                    continue
+                breaker.record_success()
+                return result
+        raise last_error
+
+    def _retry_delay(self, attempt: int) -> float:
+        # 재시도가 한꺼번에 몰리지 않도록 0~기준값×2^attempt 사이에서 무작위로 고릅니다
+        return random.uniform(0, self.retry_backoff * (2 ** attempt))
+
+    def _failover_chain(self) -> List["LLM"]:
+        """이 인스턴스와, 장애 시 순서대로 넘어갈 다른 제공자의 공유 인스턴스"""
+        chain = [self]
+        if not self.failover:
+            return chain
+        registry = get_registry()
+        start = self.FAILOVER_ORDER.index(self.provider) + 1
+        for provider in self.FAILOVER_ORDER[start:]:
+            if provider == "openai" and not os.getenv("OPENAI_API_KEY"):
+                continue
+            if not registry.is_healthy(provider, self.base_url):
+                continue
+            chain.append(shared_llm(provider=provider, base_url=self.base_url))
+        return chain
+
+    def _breaker(self):
+        """이 인스턴스의 백엔드에 대한 (프로세스 전역) 서킷 브레이커"""
+        name = f"ollama@{self.base_url}" if self.provider == "ollama" else self.provider
+        return get_circuit_breaker(name, self.failure_threshold, self.recovery_timeout)
+
+    def resilience_stats(self) -> Dict[str, Any]:
+        """장애 전환 대상 백엔드들의 서킷 상태와 재시도 예산"""
+        breakers = {}
+        if self.provider in self.FAILOVER_ORDER:
+            for llm in self._failover_chain():
+                breaker = llm._breaker()
+                breakers[breaker.name] = breaker.stats()
+        return {"breakers": breakers, "retry_budget": get_retry_budget().stats()}
+
+    async def agenerate(self, prompt: str, temperature: float = 0.7,
+                        max_tokens: int = 500) -> str:
+        """
+        generate의 비동기 버전
+        공유 비동기 클라이언트를 사용하므로 대기 중에 이벤트 루프를 막지 않습니다.
+        오류는 generate와 같은 형식의 문자열로 돌려줍니다.
+        """
+        try:
+            return await self._agenerate_raw(prompt, temperature, max_tokens)
+        except ImportError:
+            return "OpenAI 라이브러리가 설치되지 않았습니다. pip install openai"
+        except Exception as e:
+            return self._format_error(e)
+
+    async def agenerate_many(self, prompts: List[str], temperature: float = 0.7,
+                             max_tokens: int = 500,
+                             max_concurrency: int = 8) -> List[GenerationResult]:
+        """
+        여러 프롬프트를 동시에 처리합니다
+        세마포어로 동시 요청 수를 max_concurrency로 제한하고,
+        결과는 입력 순서대로, 실패는 항목별 error로 돌려줍니다.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run_one(index: int, prompt: str) -> GenerationResult:
+            result = GenerationResult(index=index, prompt=prompt)
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    result.text = await self._agenerate_raw(
+                        prompt, temperature, max_tokens
+                    )
+                except Exception as e:
+                    result.error = e
+                result.latency = time.perf_counter() - start
+            return result
+
+        return await asyncio.gather(
+            *(run_one(i, prompt) for i, prompt in enumerate(prompts))
+        )
+
+    def generate_many(self, prompts: List[str], temperature: float = 0.7,
+                      max_tokens: int = 500,
+                      max_concurrency: int = 8) -> List[GenerationResult]:
+        """
+        agenerate_many를 동기 코드에서 호출하기 위한 래퍼
+        프로세스 공용 백그라운드 루프(run_sync)에서 실행하므로 호출 사이에 비동기 커넥션 풀을 재사용하고,
+        이벤트 루프 안에서도 동작합니다(끝날 때까지 그 루프가 멈추므로 비동기 코드에서는 직접 await 하세요).
+        """
+        return run_sync(self.agenerate_many(
+            prompts, temperature, max_tokens, max_concurrency
+        ))
+
+    async def _agenerate_raw(self, prompt: str, temperature: float,
+                             max_tokens: int) -> str:
+        """비동기 생성 (오류는 예외로 전달, 설정 시 동일 요청 합치기)"""
+        if self._singleflight is None:
+            return await self._agenerate_provider(prompt, temperature, max_tokens)
+        return await self._singleflight.ado(
+            self._coalesce_key(prompt, temperature, max_tokens),
+            lambda: self._agenerate_provider(prompt, temperature, max_tokens)
+        )
+
+    async def _agenerate_provider(self, prompt: str, temperature: float,
+                                  max_tokens: int) -> str:
+        """제공자별 비동기 생성 (서킷 브레이커·재시도 예산·장애 전환 적용)"""
+        if self.provider not in self.FAILOVER_ORDER:
+            return await self._arequest(prompt, temperature, max_tokens)
+        return await self._acall_resilient(
+            lambda llm: llm._arequest(prompt, temperature, max_tokens)
+        )
+
+    async def _arequest(self, prompt: str, temperature: float,
                         max_tokens: int) -> str:
-        """Ollama를 사용한 텍스트 생성"""
+        """_request의 비동기 버전"""
+        if self.provider == "ollama":
+            return await self._aollama_request(prompt, temperature, max_tokens)
+        elif self.provider == "openai":
+            return await self._aopenai_request(prompt, temperature, max_tokens)
+        else:
+            if self.mock_latency:
+                await asyncio.sleep(self.mock_latency)
+            return self._mock_generate(prompt)
+
+    def _coalesce_key(self, prompt: str, temperature: float, max_tokens: int):
+        return (self.provider, self.model, prompt, temperature, max_tokens)
+
+    def coalescing_stats(self) -> Optional[Dict[str, Any]]:
+        """동일 요청 합치기 통계 (비활성화 상태면 None)"""
+        return self._singleflight.stats() if self._singleflight else None
+
+    def rate_limit_stats(self) -> Optional[Dict[str, Any]]:
+        """속도 제한 대기 시간(queue wait)과 동시성 한도 지표 (제한기가 없으면 None)"""
+        return self.rate_limiter.stats() if self.rate_limiter else None
+
+    def _format_error(self, error: Exception, provider: Optional[str] = None) -> str:
+        """
+        예외를 기존 generate가 돌려주던 오류 문자열 형식으로 바꿉니다
+        장애 전환 뒤에 실패했으면 이 인스턴스가 아니라 실제로 실패한 제공자로 표시합니다.
+        """
+        provider = provider or getattr(error, "failed_provider", None) or self.provider
+        label = "OpenAI" if provider == "openai" else "Ollama"
+        return f"{label} 오류: {str(error)}"
+
+    def generate_stream(self, prompt: str, temperature: float = 0.7,
+                        max_tokens: int = 500) -> Iterator[str]:
+        """
+        토큰이 도착하는 대로 하나씩 돌려주는 스트리밍 생성 메서드
+        스트림이 끝나면 지연 시간 지표가 self.stream_metrics에 쌓입니다.
+        백엔드 오류는 토큰으로 섞지 않고 예외로 올려 보내며, 그 스트림의 지표에는 error가 남습니다.
+        """
+        if self.provider == "ollama":
+            tokens = self._ollama_stream(prompt, temperature, max_tokens)
+        elif self.provider == "openai":
+            tokens = self._openai_stream(prompt, temperature, max_tokens)
+        else:
+            tokens = self._mock_stream(prompt)
+
+        metrics = StreamMetrics(provider=self.provider, model=self.model)
         try:
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "options": {
-                        "temperature": temperature,
-                        "num_predict": max_tokens
-                    },
-                    "stream": False
-                }
-            )
-            
-            if response.status_code == 200:
-                return response.json()['response']
-            else:
-                return f"Ollama 오류: {response.status_code}"
+            for token in tokens:
+                metrics.record_token()
+                yield token
+        except Exception as e:
+            metrics.record_error(e)
+            raise
+        finally:
+            tokens.close()
+            metrics.finish()
+            self.stream_metrics.append(metrics)
+
+    async def agenerate_stream(self, prompt: str, temperature: float = 0.7,
+                               max_tokens: int = 500) -> AsyncIterator[str]:
+        """generate_stream의 비동기 버전 (이벤트 루프를 막지 않습니다)"""
+        if self.provider == "ollama":
+            tokens = self._aollama_stream(prompt, temperature, max_tokens)
+        elif self.provider == "openai":
+            tokens = self._aopenai_stream(prompt, temperature, max_tokens)
+        else:
+            tokens = self._amock_stream(prompt)
+
+        metrics = StreamMetrics(provider=self.provider, model=self.model)
+        try:
+            async for token in tokens:
+                metrics.record_token()
+                yield token
         except Exception as e:
-            return f"Ollama 오류: {str(e)}"
+            metrics.record_error(e)
+            raise
+        finally:
+            await tokens.aclose()
+            metrics.finish()
+            self.stream_metrics.append(metrics)
+
+    @property
+    def last_stream_metrics(self) -> Optional[StreamMetrics]:
+        """가장 최근에 끝난 스트림의 지표"""
+        return self.stream_metrics[-1] if self.stream_metrics else None
+    
+    def _ollama_request(self, prompt: str, temperature: float,
+                        max_tokens: int) -> str:
+        """Ollama /api/generate 호출 (실패하면 예외 발생)"""
+        return self._ollama_call(
+            self._ollama_payload(prompt, temperature, max_tokens, False)
+        )['response']
+
+    def _ollama_call(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """/api/generate 응답 전체(JSON)를 돌려줍니다 (context 포함)"""
+        response = self.transport.post(f"{self.base_url}/api/generate", json=payload)
+        if response.status_code != 200:
+            raise LLMBackendError("ollama", response.status_code)
+        return response.json()
+
+    async def _aollama_request(self, prompt: str, temperature: float,
+                               max_tokens: int) -> str:
+        """_ollama_request의 비동기 버전 (공유 httpx.AsyncClient 사용)"""
+        client = self.transport.async_httpx_client()
+        response = await client.post(
+            f"{self.base_url}/api/generate",
+            json=self._ollama_payload(prompt, temperature, max_tokens, False)
+        )
+        if response.status_code != 200:
+            raise LLMBackendError("ollama", response.status_code)
+        return response.json()['response']
         
-    def _openai_generate(self, prompt: str, temperature: float, 
+    def _openai_request(self, prompt: str, temperature: float,
                         max_tokens: int) -> str:
-        """OpenAI API를 사용한 텍스트 생성"""
-        try:
-            from openai import OpenAI # ImportError 처리 위해 내부로 이동
-            client = OpenAI(api_key=self.api_key)
-            
+        """OpenAI Chat Completions 호출 (실패하면 예외 발생)"""
+        client = self._get_openai_client()
+        # 한도가 차 있으면 마감 시간까지 줄을 서고, 429/5xx는 동시성 한도를 줄입니다
+        with self.rate_limiter.slot(estimate_tokens(prompt, max_tokens)) as permit:
             response = client.chat.completions.create(
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=temperature,
                 max_tokens=max_tokens
             )
-            
-            return response.choices[0].message.content
-        except ImportError:
-            return "OpenAI 라이브러리가 설치되지 않았습니다. pip install openai"
-        except Exception as e:
-            return f"OpenAI 오류: {str(e)}"
-    
+            permit.settle(_usage_tokens(response))
+        return response.choices[0].message.content
+
+    async def _aopenai_request(self, prompt: str, temperature: float,
+                               max_tokens: int) -> str:
+        """_openai_request의 비동기 버전 (AsyncOpenAI 사용)"""
+        client = self._get_async_openai_client()
+        async with self.rate_limiter.aslot(estimate_tokens(prompt, max_tokens)) as permit:
+            response = await client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            permit.settle(_usage_tokens(response))
+        return response.choices[0].message.content
+
+    def _ollama_payload(self, prompt: str, temperature: float,
+                        max_tokens: int, stream: bool,
+                        context: Optional[List[int]] = None) -> Dict[str, Any]:
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "options": {
+                "temperature": temperature,
+                "num_predict": max_tokens
+            },
+            "stream": stream
+        }
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        if context:
+            # 이전 턴에서 받은 토큰 배열 - 대화 이력을 다시 토큰화·평가하지 않습니다
+            payload["context"] = context
+        return payload
+
+    def _ollama_stream(self, prompt: str, temperature: float,
+                       max_tokens: int) -> Iterator[str]:
+        """Ollama의 NDJSON 스트림을 한 줄씩 해석하여 토큰을 돌려줍니다 (실패하면 예외 발생)"""
+        response = self.transport.post(
+            f"{self.base_url}/api/generate",
+            json=self._ollama_payload(prompt, temperature, max_tokens, True),
+            stream=True
+        )
+        with response:
+            if response.status_code != 200:
+                raise LLMBackendError("ollama", response.status_code)
+            for chunk in iter_ndjson(response.iter_lines()):
+                text = _ollama_chunk_text(chunk)
+                if text:
+                    yield text
+                if chunk.get('done'):
+                    return
+        raise _ollama_incomplete()
+
+    async def _aollama_stream(self, prompt: str, temperature: float,
+                              max_tokens: int) -> AsyncIterator[str]:
+        """_ollama_stream의 비동기 버전 (httpx.AsyncClient 사용)"""
+        client = self.transport.async_httpx_client()
+        async with client.stream(
+            "POST", f"{self.base_url}/api/generate",
+            json=self._ollama_payload(prompt, temperature, max_tokens, True)
+        ) as response:
+            if response.status_code != 200:
+                raise LLMBackendError("ollama", response.status_code)
+            async for line in response.aiter_lines():
+                chunk = parse_ndjson_line(line)
+                if chunk is None:
+                    continue
+                text = _ollama_chunk_text(chunk)
+                if text:
+                    yield text
+                if chunk.get('done'):
+                    return
+        raise _ollama_incomplete()
+
+    def _openai_stream(self, prompt: str, temperature: float,
+                       max_tokens: int) -> Iterator[str]:
+        """OpenAI SSE 스트림의 각 청크에서 델타 텍스트를 꺼냅니다 (실패하면 예외 발생)"""
+        # 한도가 차 있으면 마감 시간까지 기다리고, 넘기면 RateLimitTimeout이 올라갑니다
+        self.rate_limiter.acquire(estimate_tokens(prompt, max_tokens))
+
+        # 스트림이 끝날 때까지 동시성 슬롯을 잡고 있습니다
+        error = None
+        try:
+            client = self._get_openai_client()
+            stream = client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            with stream:
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.rate_limiter.release(error)
+
+    async def _aopenai_stream(self, prompt: str, temperature: float,
+                              max_tokens: int) -> AsyncIterator[str]:
+        """_openai_stream의 비동기 버전"""
+        await self.rate_limiter.aacquire(estimate_tokens(prompt, max_tokens))
+
+        error = None
+        try:
+            client = self._get_async_openai_client()
+            stream = await client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            async with stream:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.rate_limiter.release(error)
+
+    def _mock_stream(self, prompt: str) -> Iterator[str]:
+        """Mock 응답을 토큰 단위로 나눠 mock_token_delay 간격으로 돌려줍니다"""
+        for token in split_mock_tokens(self._mock_generate(prompt)):
+            if self.mock_token_delay:
+                time.sleep(self.mock_token_delay)
+            yield token
+
+    async def _amock_stream(self, prompt: str) -> AsyncIterator[str]:
+        for token in split_mock_tokens(self._mock_generate(prompt)):
+            if self.mock_token_delay:
+                await asyncio.sleep(self.mock_token_delay)
+            yield token
+
     def _mock_generate(self, prompt: str) -> str:
         """테스트용 Mock 응답 생성"""
         # ReAct 에이전트 형식 감지
@@ -170,6 +751,101 @@ Action Input: 정보"""
         # 기본 응답
         return f"[Mock 응답] '{prompt[:50]}...'에 대한 시뮬레이션 응답입니다."
 
+class Conversation:
+    """
+    한 세션의 여러 턴을 이어가는 대화 객체
+    Ollama에서는 응답의 context 토큰 배열을 다음 턴에 그대로 넘겨
+    이전 대화를 다시 보내거나 다시 평가하지 않습니다.
+    다른 제공자에서는 지금까지의 대화 내용을 프롬프트 앞에 붙입니다.
+    """
+
+    def __init__(self, llm: LLM):
+        self.llm = llm
+        self.context: Optional[List[int]] = None  # Ollama가 돌려준 토큰 배열
+        self.history: List[Dict[str, str]] = []
+
+    def generate(self, prompt: str, temperature: float = 0.7,
+                 max_tokens: int = 500) -> str:
+        if self.llm.provider == "ollama":
+            text = self._ollama_turn(prompt, temperature, max_tokens)
+        else:
+            text = self.llm.generate(
+                self._with_history(prompt), temperature, max_tokens
+            )
+        self.history.append({"user": prompt, "assistant": text})
+        return text
+
+    def _ollama_turn(self, prompt: str, temperature: float, max_tokens: int) -> str:
+        """
+        generate와 같은 서킷 브레이커·재시도 예산·장애 전환을 거칩니다
+        다른 제공자로 넘어간 턴은 context 토큰을 이어받지 못하므로 context를 비우고,
+        context가 없는 동안에는 Ollama에도 대화 내용을 프롬프트 앞에 붙여 보냅니다.
+        """
+        def call(llm: LLM) -> Dict[str, Any]:
+            if llm.provider != "ollama":
+                return {"response": llm._request(self._with_history(prompt),
+                                                  temperature, max_tokens)}
+            turn_prompt = prompt if self.context else self._with_history(prompt)
+            return llm._ollama_call(llm._ollama_payload(
+                turn_prompt, temperature, max_tokens, False, context=self.context
+            ))
+
+        try:
+            data = self.llm._call_resilient(call)
+        except Exception as e:
+            return self.llm._format_error(e)
+        self.context = data.get("context")
+        return data["response"]
+
+    def _with_history(self, prompt: str) -> str:
+        if not self.history:
+            return prompt
+        turns = "\n".join(
+            f"사용자: {turn['user']}\n어시스턴트: {turn['assistant']}"
+            for turn in self.history
+        )
+        return f"{turns}\n사용자: {prompt}\n어시스턴트:"
+
+    def reset(self):
+        self.context = None
+        self.history.clear()
+
+
+def _ollama_chunk_text(chunk: Dict[str, Any]) -> str:
+    """Ollama 스트림 줄에서 토큰을 꺼냅니다 - 생성 도중 실패하면 Ollama는 200 응답 안에 error 줄을 보냅니다"""
+    if chunk.get('error'):
+        raise LLMBackendError("ollama", message=str(chunk['error']))
+    return chunk.get('response') or ""
+
+
+def _ollama_incomplete() -> LLMBackendError:
+    """done 줄 없이 끝난 스트림 (서버가 중간에 연결을 끊은 경우)"""
+    return LLMBackendError("ollama", message="스트림이 done 없이 끝났습니다")
+
+
+def _tag_provider(error: Exception, llm: LLM) -> Exception:
+    """오류에 실패한 제공자를 기록합니다 (장애 전환 뒤의 오류 메시지용, 먼저 기록된 값 유지)"""
+    if getattr(error, "failed_provider", None) is None:
+        error.failed_provider = llm.provider
+    return error
+
+
+def shared_llm(provider: str = "auto", model: str = None,
+               base_url: str = None) -> LLM:
+    """
+    같은 설정의 LLM 인스턴스를 프로세스 안에서 공유합니다
+    Agent, Planner, ToolManager, 4장 브리지처럼 LLM이 필요한 구성요소가
+    각자 LLM()을 만드는 대신 이 함수를 사용하면 감지와 커넥션 풀이 한 번으로 끝납니다.
+    """
+    registry = get_registry()
+    base_url = base_url or default_ollama_url()
+    if provider == "auto":
+        provider = registry.detect_provider(base_url)
+    key = ("llm", provider, model, base_url)
+    return registry.get_or_create(
+        key, lambda: LLM(provider=provider, model=model, base_url=base_url)
+    )
+
 # 사용 예제
 if __name__ == "__main__":
     # 자동 감지 모드
@@ -179,4 +855,10 @@ if __name__ == "__main__":
     response = llm.generate("파이썬의 장점을 간단히 설명해주세요.")
     print(f"\n응답: {response}")
 
+    # 스트리밍 테스트: 토큰이 도착하는 대로 출력
+    print("\n스트리밍 응답: ", end="")
+    for token in llm.generate_stream("파이썬의 장점을 간단히 설명해주세요."):
+        print(token, end="", flush=True)
+    print(f"\n지표: {llm.last_stream_metrics.to_dict()}")
+
 
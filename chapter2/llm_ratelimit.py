@@ -0,0 +1,376 @@
+"""
+클라이언트 측 속도 제한과 적응형 동시성 제어
+- 분당 요청 수(RPM)와 분당 토큰 수(TPM)를 토큰 버킷으로 제한합니다.
+- AIMD 방식으로 동시 요청 한도를 조절합니다:
+  성공하면 한도를 조금씩 올리고(additive increase), 429/5xx를 받으면 절반으로 줄입니다
+  (multiplicative decrease).
+- 한도에 걸린 호출은 바로 실패하지 않고 마감 시간까지 줄을 서서 기다리며,
+  기다린 시간은 별도 지표(queue wait)로 기록합니다.
+- 동기·비동기 호출이 하나의 FIFO 대기열을 함께 쓰고, 맨 앞 호출만 입장을 시도합니다.
+  비동기 호출은 주기적으로 확인하지 않고 슬롯이 반환될 때 자기 이벤트 루프에서 깨어납니다.
+- get_rate_limiter()로 얻은 제한기는 프로세스의 모든 LLM 인스턴스가 공유합니다.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, Optional
+
+from llm_transport import LLMBackendError
+
+
+class RateLimitTimeout(LLMBackendError):
+    """마감 시간 안에 속도 제한을 통과하지 못했을 때 발생하는 예외"""
+
+    def __init__(self, provider: str, waited: float):
+        self.waited = waited
+        super().__init__(provider, None,
+                         f"속도 제한 대기 시간 초과 ({waited:.1f}초 대기)")
+
+
+def is_backoff_error(error: BaseException) -> bool:
+    """동시성을 줄여야 하는 오류(429 또는 5xx)인지 확인합니다"""
+    status = getattr(error, "status_code", None)
+    return status is not None and (status == 429 or status >= 500)
+
+
+class TokenBucket:
+    """
+    분당 rate개가 채워지는 토큰 버킷 (RateLimiter의 잠금 안에서 사용합니다)
+    capacity를 넘게 쌓이지 않으므로 순간적으로 몰리는 양도 capacity로 제한됩니다.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0      # 초당 채워지는 양
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """amount만큼 꺼내려면 더 기다려야 하는 시간 (0이면 바로 가능)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)  # capacity보다 큰 요청도 언젠가는 통과
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount: float):
+        """예약보다 실제 사용량이 적으면 차이를 돌려놓습니다 (음수면 추가 차감)"""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class AIMDController:
+    """
+    동시 요청 한도를 AIMD로 조절하는 컨트롤러
+    한도는 min_limit과 max_limit 사이에서 움직입니다.
+    """
+
+    def __init__(self, initial_limit: int = 4, min_limit: int = 1,
+                 max_limit: int = 64, increase: float = 1.0,
+                 decrease_factor: float = 0.5):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+        self.backoffs = 0
+
+    @property
+    def available(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def on_success(self):
+        # 한도만큼 성공하면 한도가 increase만큼 늘어납니다 (TCP 혼잡 제어와 같은 방식)
+        self.limit = min(self.max_limit, self.limit + self.increase / max(self.limit, 1.0))
+
+    def on_backoff(self):
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        self.backoffs += 1
+
+
+class Permit:
+    """속도 제한을 통과한 호출 하나 - 실제 토큰 사용량을 알면 settle()로 보정합니다"""
+    __slots__ = ("limiter", "reserved_tokens", "queue_wait")
+
+    def __init__(self, limiter: "RateLimiter", reserved_tokens: int, queue_wait: float):
+        self.limiter = limiter
+        self.reserved_tokens = reserved_tokens
+        self.queue_wait = queue_wait
+
+    def settle(self, actual_tokens: Optional[int]):
+        if actual_tokens is None:
+            return
+        self.limiter._settle(self.reserved_tokens - actual_tokens)
+        self.reserved_tokens = actual_tokens
+
+
+class _Waiter:
+    """대기열에 선 호출 하나 - 비동기 호출은 자기 루프의 future로 깨웁니다"""
+    __slots__ = ("loop", "future")
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop                               # None이면 동기 호출 (Condition으로 깨움)
+        self.future: Optional[asyncio.Future] = None   # 비동기 호출이 지금 기다리는 future
+
+    def wake(self):
+        """잠금을 잡은 상태에서 호출 - 다른 스레드에서도 안전하게 깨웁니다"""
+        if self.future is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class RateLimiter:
+    """
+    RPM/TPM 토큰 버킷과 AIMD 동시성 한도를 함께 적용하는 제한기
+
+    사용 예:
+        limiter = get_rate_limiter("openai")
+        with limiter.slot(estimated_tokens=600) as permit:
+            response = client.chat.completions.create(...)
+            permit.settle(response.usage.total_tokens)
+    """
+
+    def __init__(self, provider: str = "openai",
+                 requests_per_minute: float = 500,
+                 tokens_per_minute: float = 200_000,
+                 burst_seconds: float = 10.0,
+                 initial_concurrency: int = 4, max_concurrency: int = 64,
+                 queue_timeout: float = 30.0):
+        self.provider = provider
+        self.queue_timeout = queue_timeout      # 기본 대기 마감 시간 (초)
+        # 1분 치를 한 번에 쏟아내지 않도록 순간 허용량은 burst_seconds 분량으로 제한합니다
+        burst = burst_seconds / 60.0
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute * burst)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute * burst)
+        self.concurrency = AIMDController(initial_limit=initial_concurrency,
+                                          max_limit=max_concurrency)
+        self._cond = threading.Condition()
+        # 입장을 기다리는 호출들 (동기·비동기 공통, 도착 순서대로 맨 앞만 입장 시도)
+        self._waiters: deque = deque()
+
+        # 지표
+        self.queue_waits = deque(maxlen=1000)   # 최근 호출들의 대기 시간 (초)
+        self.admitted = 0
+        self.throttled = 0                      # 한 번이라도 기다린 호출 수
+        self.timeouts = 0
+
+    # ------------------------------------------------------------------
+    # 입장
+    # ------------------------------------------------------------------
+    def _try_admit(self, estimated_tokens: int) -> Optional[float]:
+        """
+        잠금을 잡은 상태에서 호출 - 통과하면 0, 버킷이 차기를 기다려야 하면 그 시간,
+        동시성 한도가 찼으면 None (슬롯이 반환될 때 깨어납니다)
+        """
+        if not self.concurrency.available:
+            return None
+        now = time.monotonic()
+        wait = max(self.requests.wait_time(1, now),
+                   self.tokens.wait_time(estimated_tokens, now))
+        if wait > 0:
+            return wait
+        self.requests.take(1)
+        self.tokens.take(estimated_tokens)
+        self.concurrency.in_flight += 1
+        return 0.0
+
+    def acquire(self, estimated_tokens: int = 1,
+                timeout: Optional[float] = None) -> Permit:
+        """한도가 날 때까지 줄을 서서 기다립니다 (마감 시간을 넘기면 RateLimitTimeout)"""
+        timeout = self.queue_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        with self._cond:
+            if not self._waiters and self._try_admit(estimated_tokens) == 0:
+                return self._admitted(start, estimated_tokens, queued=False)
+            waiter = _Waiter()
+            self._waiters.append(waiter)
+            try:
+                while True:
+                    wait = None
+                    if self._waiters[0] is waiter:
+                        wait = self._try_admit(estimated_tokens)
+                        if wait == 0:
+                            return self._admitted(start, estimated_tokens, queued=True)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise RateLimitTimeout(self.provider, time.monotonic() - start)
+                    # 차례가 오거나 슬롯이 반환되면 notify로 깨어나고, 버킷은 계산한 시간 뒤에 다시 확인합니다
+                    self._cond.wait(remaining if wait is None else min(wait, remaining))
+            finally:
+                self._leave(waiter)
+
+    async def aacquire(self, estimated_tokens: int = 1,
+                       timeout: Optional[float] = None) -> Permit:
+        """acquire의 비동기 버전 (이벤트 루프를 막지 않고 기다립니다)"""
+        timeout = self.queue_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        with self._cond:
+            if not self._waiters and self._try_admit(estimated_tokens) == 0:
+                return self._admitted(start, estimated_tokens, queued=False)
+            waiter = _Waiter(asyncio.get_running_loop())
+            self._waiters.append(waiter)
+        try:
+            while True:
+                with self._cond:
+                    wait = None
+                    if self._waiters[0] is waiter:
+                        wait = self._try_admit(estimated_tokens)
+                        if wait == 0:
+                            return self._admitted(start, estimated_tokens, queued=True)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise RateLimitTimeout(self.provider, time.monotonic() - start)
+                    # 잠금 안에서 future를 바꿔 둬야 release()의 깨움을 놓치지 않습니다
+                    waiter.future = waiter.loop.create_future()
+                    future = waiter.future
+                await asyncio.wait((future,),
+                                   timeout=remaining if wait is None else min(wait, remaining))
+        finally:
+            with self._cond:
+                self._leave(waiter)
+
+    def _leave(self, waiter: _Waiter):
+        """잠금을 잡은 상태에서 호출 - 대기열에서 빠지고, 맨 앞이었다면 다음 호출에 차례를 넘깁니다"""
+        waiter.future = None
+        was_head = bool(self._waiters) and self._waiters[0] is waiter
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            return
+        if was_head:
+            self._wake_head()
+
+    def _wake_head(self):
+        """잠금을 잡은 상태에서 호출 - 대기열 맨 앞 호출을 깨웁니다"""
+        if not self._waiters:
+            return
+        head = self._waiters[0]
+        if head.loop is None:
+            self._cond.notify_all()
+        else:
+            try:
+                head.wake()
+            except RuntimeError:
+                # 이미 닫힌 루프의 호출 - 줄에서 빼고 다음 호출을 깨웁니다
+                self._waiters.popleft()
+                self._wake_head()
+
+    def _admitted(self, start: float, estimated_tokens: int, queued: bool) -> Permit:
+        queue_wait = time.monotonic() - start
+        self.admitted += 1
+        if queued:
+            self.throttled += 1
+        self.queue_waits.append(queue_wait)
+        return Permit(self, estimated_tokens, queue_wait)
+
+    # ------------------------------------------------------------------
+    # 반환
+    # ------------------------------------------------------------------
+    def release(self, error: Optional[BaseException] = None):
+        """호출이 끝나면 결과에 따라 동시성 한도를 조절하고 슬롯을 반환합니다"""
+        with self._cond:
+            self.concurrency.in_flight -= 1
+            if error is None:
+                self.concurrency.on_success()
+            elif is_backoff_error(error):
+                self.concurrency.on_backoff()
+            self._wake_head()
+
+    def _settle(self, unused_tokens: int):
+        with self._cond:
+            self.tokens.give_back(unused_tokens)
+            if unused_tokens > 0:
+                self._wake_head()
+
+    @contextmanager
+    def slot(self, estimated_tokens: int = 1, timeout: Optional[float] = None):
+        """acquire/release를 묶은 컨텍스트 매니저"""
+        permit = self.acquire(estimated_tokens, timeout)
+        try:
+            yield permit
+        except BaseException as e:
+            self.release(e)
+            raise
+        self.release()
+
+    @asynccontextmanager
+    async def aslot(self, estimated_tokens: int = 1, timeout: Optional[float] = None):
+        permit = await self.aacquire(estimated_tokens, timeout)
+        try:
+            yield permit
+        except BaseException as e:
+            self.release(e)
+            raise
+        self.release()
+
+    # ------------------------------------------------------------------
+    # 지표
+    # ------------------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            waits = sorted(self.queue_waits)
+            return {
+                "admitted": self.admitted,
+                "throttled": self.throttled,
+                "timeouts": self.timeouts,
+                "concurrency_limit": int(self.concurrency.limit),
+                "in_flight": self.concurrency.in_flight,
+                "backoffs": self.concurrency.backoffs,
+                "queue_wait_p50": waits[len(waits) // 2] if waits else 0.0,
+                "queue_wait_p95": (waits[min(len(waits) - 1, int(len(waits) * 0.95))]
+                                   if waits else 0.0),
+                "queue_wait_max": waits[-1] if waits else 0.0,
+            }
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """
+    TPM 예약에 쓸 대략적인 토큰 수
+    제공자는 max_tokens까지 포함해 한도를 계산하므로 프롬프트 추정치에 더합니다.
+    (한국어는 글자당 1토큰에 가깝고 영어는 4글자당 1토큰 정도라 그 사이 값을 씁니다)
+    """
+    return max(1, len(prompt) // 2) + max_tokens
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str = "openai") -> RateLimiter:
+    """
+    제공자별 프로세스 전역 제한기를 돌려줍니다
+    한도는 환경 변수로 바꿀 수 있습니다 (예: OPENAI_RPM=3500, OPENAI_TPM=90000).
+    """
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(provider)
+            if limiter is None:
+                prefix = provider.upper()
+                limiter = RateLimiter(
+                    provider,
+                    requests_per_minute=float(os.getenv(f"{prefix}_RPM", 500)),
+                    tokens_per_minute=float(os.getenv(f"{prefix}_TPM", 200_000)),
+                )
+                _limiters[provider] = limiter
+    return limiter
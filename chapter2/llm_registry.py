@@ -0,0 +1,188 @@
+"""
+프로세스 전역 LLM 제공자 레지스트리
+- 제공자 자동 감지를 프로세스당 한 번만 수행하고 결과를 캐시합니다.
+- 같은 설정의 LLM 인스턴스를 공유하여 구성요소가 늘어도 초기화 비용이 늘지 않습니다.
+- 제공자 상태는 생성자가 아니라 백그라운드 타이머에서 주기적으로 다시 확인합니다.
+"""
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import requests
+
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+
+
+def default_ollama_url() -> str:
+    """OLLAMA_HOST 환경 변수가 있으면 그 주소를, 없으면 기본 주소를 돌려줍니다"""
+    host = os.getenv("OLLAMA_HOST")
+    if not host:
+        return DEFAULT_OLLAMA_URL
+    return host if "://" in host else f"http://{host}"
+
+
+class ProviderRegistry:
+    """
+    제공자 감지 결과와 공유 LLM 인스턴스를 보관하는 레지스트리
+    get_registry()로 프로세스 전역 인스턴스를 얻어 사용합니다.
+    """
+
+    def __init__(self, probe_interval: float = 30.0, probe_timeout: float = 1.0):
+        self.probe_interval = probe_interval  # 백그라운드 상태 확인 주기 (초)
+        self.probe_timeout = probe_timeout    # Ollama 상태 확인 타임아웃 (초)
+
+        self._lock = threading.RLock()
+        self._session = requests.Session()
+        self._detected: Dict[str, str] = {}           # base_url -> 감지된 제공자
+        self._health: Dict[str, Dict[str, bool]] = {} # base_url -> 제공자별 상태
+        self._instances: Dict[Hashable, Any] = {}
+        self._creating: Dict[Hashable, threading.Lock] = {}
+
+        self._stop_event = threading.Event()
+        self._probe_thread: Optional[threading.Thread] = None
+        self.probe_count = 0
+
+    # ------------------------------------------------------------------
+    # 제공자 감지
+    # ------------------------------------------------------------------
+    def detect_provider(self, base_url: str = None) -> str:
+        """
+        사용 가능한 LLM 제공자를 돌려줍니다
+        우선순위: Ollama → OpenAI → Mock
+        base_url마다 처음 한 번만 실제로 확인하고, 이후에는 캐시를 사용합니다.
+        """
+        base_url = base_url or default_ollama_url()
+        with self._lock:
+            if base_url in self._detected:
+                return self._detected[base_url]
+
+            health = self.probe(base_url)
+            provider = self._choose(health)
+            self._detected[base_url] = provider
+            self._announce(provider)
+
+        self.start_health_checks()
+        return provider
+
+    def probe(self, base_url: str) -> Dict[str, bool]:
+        """각 제공자의 현재 상태를 확인하여 기록합니다"""
+        health = {
+            "ollama": self._probe_ollama(base_url),
+            "openai": bool(os.getenv("OPENAI_API_KEY")),
+            "mock": True,
+        }
+        with self._lock:
+            self._health[base_url] = health
+            self.probe_count += 1
+        return health
+
+    def is_healthy(self, provider: str, base_url: str = None) -> bool:
+        """마지막 상태 확인에서 제공자가 사용 가능했는지 돌려줍니다"""
+        base_url = base_url or default_ollama_url()
+        health = self._health.get(base_url)
+        if health is None:
+            return True  # 아직 확인 전이면 사용 가능하다고 가정합니다
+        return health.get(provider, False)
+
+    def _probe_ollama(self, base_url: str) -> bool:
+        try:
+            response = self._session.get(
+                f"{base_url}/api/tags", timeout=self.probe_timeout
+            )
+            return response.status_code == 200
+        except Exception:
+            return False
+
+    @staticmethod
+    def _choose(health: Dict[str, bool]) -> str:
+        for provider in ("ollama", "openai"):
+            if health.get(provider):
+                return provider
+        return "mock"
+
+    @staticmethod
+    def _announce(provider: str):
+        if provider == "ollama":
+            print("[LLM] Ollama 감지됨")
+        elif provider == "openai":
+            print("[LLM] OpenAI API 키 감지됨")
+        else:
+            print("[LLM] Ollama와 OpenAI가 없어 Mock 모드로 실행합니다.")
+            print("       - Ollama 설치: https://ollama.com")
+            print("       - OpenAI 설정: export OPENAI_API_KEY='your-key'")
+
+    # ------------------------------------------------------------------
+    # 공유 인스턴스
+    # ------------------------------------------------------------------
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """key에 해당하는 공유 인스턴스를 돌려주고, 없으면 factory로 한 번만 만듭니다"""
+        instance = self._instances.get(key)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            creating = self._creating.setdefault(key, threading.Lock())
+        # 키별 잠금으로 같은 인스턴스를 중복 생성하지 않으면서,
+        # 다른 키의 생성은 막지 않습니다
+        with creating:
+            instance = self._instances.get(key)
+            if instance is None:
+                instance = factory()
+                self._instances[key] = instance
+        return instance
+
+    # ------------------------------------------------------------------
+    # 백그라운드 상태 확인
+    # ------------------------------------------------------------------
+    def start_health_checks(self):
+        """주기적으로 제공자 상태를 다시 확인하는 데몬 스레드를 시작합니다"""
+        with self._lock:
+            if self._probe_thread is not None or self.probe_interval <= 0:
+                return
+            self._stop_event.clear()
+            self._probe_thread = threading.Thread(
+                target=self._health_loop, name="llm-health-probe", daemon=True
+            )
+            self._probe_thread.start()
+
+    def stop_health_checks(self):
+        self._stop_event.set()
+        thread = self._probe_thread
+        if thread is not None:
+            thread.join(timeout=self.probe_timeout + 1)
+        self._probe_thread = None
+
+    def _health_loop(self):
+        while not self._stop_event.wait(self.probe_interval):
+            for base_url in list(self._detected):
+                health = self.probe(base_url)
+                provider = self._choose(health)
+                with self._lock:
+                    previous = self._detected.get(base_url)
+                    self._detected[base_url] = provider
+                if provider != previous:
+                    print(f"[LLM] 제공자 상태 변경: {previous} → {provider}")
+
+    def reset(self):
+        """감지 결과와 공유 인스턴스를 모두 비웁니다 (테스트·벤치마크용)"""
+        self.stop_health_checks()
+        with self._lock:
+            self._detected.clear()
+            self._health.clear()
+            self._instances.clear()
+            self._creating.clear()
+            self.probe_count = 0
+
+
+_registry: Optional[ProviderRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ProviderRegistry:
+    """프로세스 전역 레지스트리를 돌려줍니다"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ProviderRegistry()
+    return _registry
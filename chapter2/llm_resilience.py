@@ -0,0 +1,231 @@
+"""
+LLM 백엔드 장애 대응 계층
+- 백엔드마다 서킷 브레이커(closed → open → half-open)를 두어,
+  연속으로 실패하는 백엔드는 기다리지 않고 바로 건너뜁니다.
+- 재시도는 프로세스 전역 예산(retry budget) 안에서만 허용하여
+  장애 중에 재시도가 부하를 몇 배로 키우지 않도록 합니다.
+- 상태 전이는 리스너와 최근 전이 기록으로 확인할 수 있습니다.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from llm_ratelimit import is_backoff_error
+from llm_transport import LLMBackendError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(LLMBackendError):
+    """서킷이 열려 있어 호출을 보내지 않았을 때 발생하는 예외"""
+
+    def __init__(self, name: str, retry_in: float):
+        self.retry_in = retry_in
+        super().__init__(name, None,
+                         f"{name} 서킷 열림 - {retry_in:.1f}초 후 다시 시도합니다")
+
+
+def counts_as_failure(error: BaseException) -> bool:
+    """
+    서킷 브레이커와 재시도에서 백엔드 장애로 볼 오류인지 판단합니다
+    연결 실패·타임아웃·429·5xx는 장애, 잘못된 요청(4xx)이나 로컬 오류는 장애가 아닙니다.
+    """
+    if isinstance(error, ImportError):
+        return False
+    if isinstance(error, LLMBackendError) or hasattr(error, "status_code"):
+        return is_backoff_error(error)
+    return True
+
+
+class CircuitBreaker:
+    """
+    백엔드 하나의 서킷 브레이커
+
+    - closed: 정상. 연속 실패가 failure_threshold에 이르면 open
+    - open: 호출을 바로 거절. recovery_timeout이 지나면 half-open
+    - half-open: 시험 호출을 half_open_max_calls개만 허용.
+      성공하면 closed, 실패하면 다시 open
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5,
+                 recovery_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+
+        self.listeners: List[Callable[[str, str, str], None]] = []
+        self.transitions = deque(maxlen=100)  # 최근 상태 전이 기록
+        self.rejected = 0                     # 열린 서킷이 거절한 호출 수
+
+    def add_listener(self, listener: Callable[[str, str, str], None]):
+        """상태가 바뀔 때 listener(이름, 이전 상태, 새 상태)를 호출합니다"""
+        self.listeners.append(listener)
+
+    def allow(self) -> bool:
+        """지금 이 백엔드로 호출을 보내도 되는지 확인합니다"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    self.rejected += 1
+                    return False
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    self.rejected += 1
+                    return False
+                self._half_open_calls += 1
+            return True
+
+    def retry_in(self) -> float:
+        """열린 서킷이 half-open으로 바뀌기까지 남은 시간 (초)"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED
+                and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def record_ignored(self):
+        """장애로 보지 않는 오류(잘못된 요청 등) - half-open 시험 호출 자리만 돌려줍니다"""
+        with self._lock:
+            if self.state == HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def _transition(self, new_state: str):
+        """잠금을 잡은 상태에서 호출합니다"""
+        old_state, self.state = self.state, new_state
+        self._half_open_calls = 0
+        self.transitions.append({"time": time.time(), "from": old_state, "to": new_state})
+        for listener in self.listeners:
+            try:
+                listener(self.name, old_state, new_state)
+            except Exception:
+                pass  # 관찰용 리스너의 오류가 호출 경로를 깨뜨리지 않도록 합니다
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "rejected": self.rejected,
+            "retry_in": round(self.retry_in(), 2),
+            "transitions": len(self.transitions),
+        }
+
+
+class RetryBudget:
+    """
+    최근 window초 동안의 요청 수에 비례해 재시도를 허용하는 예산
+    허용량 = min_retries_per_second × window + ratio × 요청 수
+    정상일 때는 가끔 있는 재시도를 모두 허용하고, 장애로 재시도가 몰리면 잘라냅니다.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_retries_per_second: float = 1.0,
+                 window: float = 10.0):
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.window = window
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _trim(self, now: float):
+        cutoff = now - self.window
+        for events in (self._requests, self._retries):
+            while events and events[0] < cutoff:
+                events.popleft()
+
+    def record_request(self):
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_spend(self) -> bool:
+        """재시도 하나를 예산에서 꺼냅니다 (예산이 없으면 False)"""
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            allowed = (self.min_retries_per_second * self.window
+                       + self.ratio * len(self._requests))
+            if len(self._retries) >= allowed:
+                self.rejected += 1
+                return False
+            self._retries.append(now)
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._trim(time.monotonic())
+            return {
+                "requests_in_window": len(self._requests),
+                "retries_in_window": len(self._retries),
+                "rejected": self.rejected,
+            }
+
+
+def _announce_transition(name: str, old_state: str, new_state: str):
+    print(f"[LLM] 서킷 상태 변경: {name} {old_state} → {new_state}")
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_retry_budget: Optional[RetryBudget] = None
+_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str, failure_threshold: int = 5,
+                        recovery_timeout: float = 30.0) -> CircuitBreaker:
+    """
+    백엔드 이름별 프로세스 전역 서킷 브레이커를 돌려줍니다
+    설정값은 처음 만들 때만 적용됩니다.
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, failure_threshold, recovery_timeout)
+                breaker.add_listener(_announce_transition)
+                _breakers[name] = breaker
+    return breaker
+
+
+def get_retry_budget() -> RetryBudget:
+    """프로세스 전역 재시도 예산"""
+    global _retry_budget
+    if _retry_budget is None:
+        with _lock:
+            if _retry_budget is None:
+                _retry_budget = RetryBudget()
+    return _retry_budget
+
+
+def reset_resilience():
+    """서킷 브레이커와 재시도 예산을 모두 초기화합니다 (벤치마크용)"""
+    global _retry_budget
+    with _lock:
+        _breakers.clear()
+        _retry_budget = None
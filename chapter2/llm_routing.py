@@ -0,0 +1,228 @@
+"""
+지연 시간 기반 적응형 라우터
+- 백엔드마다 지연 시간과 오류율의 이동 평균(EWMA)과 p95를 기록합니다.
+- 작업의 품질 등급을 만족하는 백엔드 중, 건강하고 지연 목표(SLO) 안에 있는 가장 싼 것
+  (품질 등급이 가장 낮은 것)을 고릅니다. 같은 등급 안에서는 빠른 것을 고릅니다.
+- 첫 백엔드가 p95(SLO가 있으면 SLO)를 넘기면 두 번째 백엔드에 중복(hedged) 요청을 보내고
+  먼저 온 답을 씁니다.
+"""
+import math
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class BackendStats:
+    """백엔드 하나의 지연 시간·오류율 통계"""
+
+    def __init__(self, alpha: float = 0.2, window: int = 200):
+        self.alpha = alpha                      # EWMA 가중치 (클수록 최근 값 반영이 빠름)
+        self.ewma_latency: Optional[float] = None
+        self.ewma_error_rate = 0.0
+        self.latencies = deque(maxlen=window)   # p95 계산용 최근 성공 지연
+        self.calls = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self.calls += 1
+            if ok:
+                self.latencies.append(latency)
+                if self.ewma_latency is None:
+                    self.ewma_latency = latency
+                else:
+                    self.ewma_latency += self.alpha * (latency - self.ewma_latency)
+            else:
+                self.errors += 1
+            self.ewma_error_rate += self.alpha * ((0.0 if ok else 1.0) - self.ewma_error_rate)
+
+    @property
+    def p95(self) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "ewma_latency": self.ewma_latency,
+            "p95_latency": self.p95,
+            "ewma_error_rate": round(self.ewma_error_rate, 3),
+        }
+
+
+@dataclass
+class Backend:
+    """라우팅 대상 백엔드"""
+    name: str
+    call: Callable[[str], str]   # 실패하면 예외를 던져야 합니다
+    quality: int = 0             # 품질 등급 (클수록 어려운 작업 가능, 그만큼 비싸다고 봅니다)
+    stats: BackendStats = field(default_factory=BackendStats)
+
+
+class AdaptiveRouter:
+    """
+    지연 시간과 오류율을 보고 백엔드를 고르는 라우터
+
+    사용 예:
+        router = AdaptiveRouter(latency_slo=5.0)
+        router.add_backend("local", local_fn, quality=0)
+        router.add_backend("cloud", cloud_fn, quality=1)
+        text, backend = router.route("질문", min_quality=0)   # 로컬이 건강하고 5초 안이면 로컬
+    """
+
+    def __init__(self, max_error_rate: float = 0.5, hedge: bool = True,
+                 initial_hedge_delay: float = 1.0, min_samples: int = 5,
+                 explore_every: int = 20, max_workers: int = 8,
+                 latency_slo: Optional[float] = None):
+        self.max_error_rate = max_error_rate          # 이보다 오류율이 높으면 비건강
+        # EWMA 지연이 이보다 길면 더 비싼 백엔드로 넘깁니다 (None이면 지연으로는 넘기지 않음)
+        self.latency_slo = latency_slo
+        self.hedge = hedge
+        self.initial_hedge_delay = initial_hedge_delay  # p95를 모를 때의 중복 요청 대기 (초)
+        self.min_samples = min_samples                # p95를 믿기 위한 최소 표본 수
+        # N번에 한 번은 2순위 백엔드를 1차로 보내 오래된 통계를 갱신합니다 (0이면 끔)
+        # 1순위보다 비싼 백엔드로는 탐색하지 않습니다 (비건강·느린 싼 백엔드의 회복 확인용)
+        self.explore_every = explore_every
+        self.backends: Dict[str, Backend] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="llm-router")
+        self._lock = threading.Lock()
+
+        # 튜닝용 통계
+        self.decisions = Counter()     # 1차로 선택된 백엔드별 횟수
+        self.hedges_fired = 0          # 중복 요청을 보낸 횟수
+        self.hedge_wins = 0            # 중복 요청이 먼저 답한 횟수
+        self.decision_log = deque(maxlen=100)
+        self._route_count = 0
+
+    def add_backend(self, name: str, call: Callable[[str], str], quality: int = 0):
+        self.backends[name] = Backend(name=name, call=call, quality=quality)
+
+    def candidates(self, min_quality: int = 0) -> List[Backend]:
+        """
+        품질 등급을 만족하는 백엔드를 선호 순서대로 돌려줍니다
+        건강하고 SLO 안에 있는 백엔드를 먼저, 그 안에서는 싼(품질 등급이 낮은) 순서,
+        같은 등급이면 EWMA 지연이 짧은 순서로 정렬합니다.
+        아직 측정값이 없는 백엔드는 같은 등급에서 측정된 백엔드 뒤에 두고 탐색으로 측정합니다.
+        """
+        eligible = [b for b in self.backends.values() if b.quality >= min_quality]
+
+        def sort_key(backend: Backend):
+            stats = backend.stats
+            unhealthy = stats.ewma_error_rate > self.max_error_rate
+            slow = (self.latency_slo is not None and stats.ewma_latency is not None
+                    and stats.ewma_latency > self.latency_slo)
+            latency = stats.ewma_latency if stats.ewma_latency is not None else math.inf
+            return (unhealthy or slow, backend.quality, latency, stats.ewma_error_rate)
+
+        return sorted(eligible, key=sort_key)
+
+    def route(self, prompt: str, min_quality: int = 0,
+              hedge: Optional[bool] = None) -> Tuple[str, str]:
+        """프롬프트를 가장 적합한 백엔드로 보내고 (응답, 응답한 백엔드 이름)을 돌려줍니다"""
+        ranked = self.candidates(min_quality)
+        if not ranked:
+            raise ValueError(f"품질 등급 {min_quality} 이상인 백엔드가 없습니다")
+
+        with self._lock:
+            self._route_count += 1
+            explore = (self.explore_every and len(ranked) > 1
+                       and ranked[1].quality <= ranked[0].quality
+                       and self._route_count % self.explore_every == 0)
+            if explore:
+                ranked[0], ranked[1] = ranked[1], ranked[0]
+            primary = ranked[0]
+            self.decisions[primary.name] += 1
+
+        hedge = self.hedge if hedge is None else hedge
+        pending = {self._submit(primary, prompt): primary}
+        remaining = ranked[1:]
+        hedged = False
+        last_error: Optional[Exception] = None
+
+        while pending:
+            timeout = None
+            if hedge and not hedged and remaining:
+                timeout = self._hedge_delay(primary)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # 1차 백엔드가 p95(또는 SLO)를 넘김 → 다음 백엔드에 중복 요청
+                backup = remaining.pop(0)
+                pending[self._submit(backup, prompt)] = backup
+                hedged = True
+                with self._lock:
+                    self.hedges_fired += 1
+                continue
+
+            for future in done:
+                backend = pending.pop(future)
+                try:
+                    text = future.result()
+                except Exception as e:
+                    last_error = e
+                    # 실패하면 아직 시도하지 않은 다음 백엔드로 넘어갑니다
+                    if not pending and remaining:
+                        fallback = remaining.pop(0)
+                        pending[self._submit(fallback, prompt)] = fallback
+                    continue
+                self._log(primary, backend, hedged, min_quality)
+                return text, backend.name
+
+        raise last_error
+
+    def _submit(self, backend: Backend, prompt: str):
+        def run():
+            start = time.perf_counter()
+            try:
+                result = backend.call(prompt)
+            except Exception:
+                backend.stats.record(time.perf_counter() - start, ok=False)
+                raise
+            backend.stats.record(time.perf_counter() - start, ok=True)
+            return result
+
+        return self._executor.submit(run)
+
+    def _hedge_delay(self, backend: Backend) -> float:
+        """중복 요청까지 기다릴 시간 - SLO가 있으면 SLO를 넘기 전에는 더 비싼 백엔드를 부르지 않습니다"""
+        stats = backend.stats
+        if len(stats.latencies) < self.min_samples:
+            delay = self.initial_hedge_delay
+        else:
+            delay = stats.p95
+        if self.latency_slo is not None:
+            delay = max(delay, self.latency_slo)
+        return delay
+
+    def _log(self, primary: Backend, winner: Backend, hedged: bool, min_quality: int):
+        with self._lock:
+            if hedged and winner is not primary:
+                self.hedge_wins += 1
+            self.decision_log.append({
+                "min_quality": min_quality,
+                "primary": primary.name,
+                "winner": winner.name,
+                "hedged": hedged,
+            })
+
+    def stats(self) -> Dict[str, Any]:
+        """라우팅 결정과 중복 요청 성과, 백엔드별 통계"""
+        return {
+            "decisions": dict(self.decisions),
+            "hedges_fired": self.hedges_fired,
+            "hedge_wins": self.hedge_wins,
+            "hedge_win_rate": (self.hedge_wins / self.hedges_fired
+                               if self.hedges_fired else 0.0),
+            "backends": {name: b.stats.to_dict() for name, b in self.backends.items()},
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,107 @@
+"""
+토큰 스트리밍 지원 도구
+- Ollama의 NDJSON 스트림을 한 줄씩 해석합니다.
+- 스트림마다 첫 토큰까지의 시간(TTFT), 토큰 간 지연, 총 토큰 수를 기록합니다.
+- 백엔드 오류는 토큰이 아니므로 지표에 세지 않고 error에 따로 남깁니다.
+"""
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Mock 스트림에서 응답을 토큰 단위로 자를 때 사용 (단어 + 뒤따르는 공백)
+_MOCK_TOKEN_PATTERN = re.compile(r"\S+\s*|\s+")
+
+
+@dataclass
+class StreamMetrics:
+    """스트림 하나의 지연 시간 지표"""
+    provider: str
+    model: str
+    started_at: float = field(default_factory=time.perf_counter)
+    first_token_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    token_times: List[float] = field(default_factory=list)
+    error: Optional[str] = None    # 스트림이 오류로 끝났으면 그 내용
+
+    def record_token(self):
+        """토큰 하나가 도착한 시각을 기록합니다"""
+        now = time.perf_counter()
+        if self.first_token_at is None:
+            self.first_token_at = now
+        self.token_times.append(now)
+
+    def record_error(self, error: BaseException):
+        """스트림을 끝낸 오류를 기록합니다 (실패한 스트림은 빠른 응답으로 보이면 안 됩니다)"""
+        self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def finish(self):
+        if self.finished_at is None:
+            self.finished_at = time.perf_counter()
+
+    @property
+    def total_tokens(self) -> int:
+        return len(self.token_times)
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        """요청 시작부터 첫 토큰까지 걸린 시간 (초)"""
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def inter_token_latencies(self) -> List[float]:
+        """연속한 두 토큰 사이의 간격 목록 (초)"""
+        times = self.token_times
+        return [b - a for a, b in zip(times, times[1:])]
+
+    @property
+    def mean_inter_token_latency(self) -> Optional[float]:
+        gaps = self.inter_token_latencies
+        return sum(gaps) / len(gaps) if gaps else None
+
+    @property
+    def total_time(self) -> Optional[float]:
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "time_to_first_token": self.time_to_first_token,
+            "mean_inter_token_latency": self.mean_inter_token_latency,
+            "total_tokens": self.total_tokens,
+            "total_time": self.total_time,
+            "error": self.error,
+        }
+
+
+def parse_ndjson_line(line) -> Optional[Dict[str, Any]]:
+    """NDJSON 한 줄을 딕셔너리로 변환합니다 (빈 줄은 None)"""
+    if isinstance(line, bytes):
+        line = line.decode("utf-8")
+    line = line.strip()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def iter_ndjson(lines: Iterable) -> Iterator[Dict[str, Any]]:
+    """줄 단위 이터레이터에서 NDJSON 객체를 차례로 꺼냅니다"""
+    for line in lines:
+        chunk = parse_ndjson_line(line)
+        if chunk is not None:
+            yield chunk
+
+
+def split_mock_tokens(text: str) -> List[str]:
+    """Mock 응답을 스트리밍용 토큰 조각으로 나눕니다"""
+    return _MOCK_TOKEN_PATTERN.findall(text)
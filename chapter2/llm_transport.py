@@ -0,0 +1,202 @@
+"""
+LLM 제공자 호출에 사용하는 HTTP 전송 계층
+- 제공자마다 커넥션 풀을 하나씩 두고 재사용하여 매 호출의 TCP 핸드셰이크 비용을 없앱니다.
+- 풀 크기, keep-alive, 타임아웃을 TransportConfig 하나로 설정합니다.
+- run_sync(): 동기 API가 코루틴을 실행할 때 쓰는 프로세스 공용 백그라운드 이벤트 루프
+"""
+import asyncio
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Any, Awaitable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+_sync_loop: Optional[asyncio.AbstractEventLoop] = None
+_sync_thread: Optional[threading.Thread] = None
+_sync_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """run_sync가 쓰는 이벤트 루프 (처음 쓸 때 데몬 스레드에서 시작해 프로세스가 끝날 때까지 둡니다)"""
+    global _sync_loop, _sync_thread
+    with _sync_lock:
+        if _sync_loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="run-sync-loop", daemon=True)
+            thread.start()
+            _sync_loop, _sync_thread = loop, thread
+        return _sync_loop
+
+
+def run_sync(coro: Awaitable) -> Any:
+    """
+    코루틴을 끝까지 실행하고 결과를 돌려줍니다 (동기 API용)
+    호출할 때마다 asyncio.run으로 새 루프를 만들면 httpx.AsyncClient도 루프마다 새로 생겨
+    커넥션 풀을 재사용하지 못하고 닫히지도 않으므로, 프로세스에 하나뿐인 백그라운드 루프에서 실행합니다.
+    노트북이나 비동기 서버처럼 이미 루프 안에서 불러도 동작하지만, 끝날 때까지 호출한 스레드는 기다립니다.
+    작업은 호출한 쪽의 콘텍스트 사본에서 실행되므로 출력 설정과 추적 구간이 이어집니다.
+    """
+    loop = _background_loop()
+    if threading.current_thread() is _sync_thread:
+        coro.close()
+        raise RuntimeError("run_sync로 실행 중인 코루틴 안에서는 비동기 API를 직접 await 하세요.")
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()   # 호출한 쪽이 중단되면(예: KeyboardInterrupt) 코루틴도 취소합니다
+        raise
+
+
+class LLMBackendError(Exception):
+    """제공자가 오류 응답을 돌려줬을 때 발생하는 예외"""
+
+    def __init__(self, provider: str, status_code: Optional[int] = None,
+                 message: Optional[str] = None):
+        self.provider = provider
+        self.status_code = status_code
+        super().__init__(message or str(status_code))
+
+
+@dataclass
+class TransportConfig:
+    """커넥션 풀과 타임아웃 설정"""
+    pool_connections: int = 4      # 호스트별로 유지할 풀의 수
+    pool_maxsize: int = 10         # 풀 하나에 유지할 최대 커넥션 수
+    keep_alive: bool = True        # False면 매 요청 후 연결을 닫습니다
+    keepalive_expiry: float = 30.0 # 유휴 커넥션을 유지할 시간 (초, httpx 클라이언트)
+    connect_timeout: float = 3.0   # 연결 수립 타임아웃 (초)
+    read_timeout: float = 60.0     # 응답 대기 타임아웃 (초)
+    max_retries: int = 0           # 연결 단계 재시도 횟수
+
+    @property
+    def timeout(self) -> tuple:
+        """requests에 전달할 (연결, 읽기) 타임아웃"""
+        return (self.connect_timeout, self.read_timeout)
+
+
+class HTTPTransport:
+    """
+    requests.Session 기반의 재사용 가능한 HTTP 전송 객체
+    세션과 httpx 클라이언트는 처음 사용할 때 만들어지므로,
+    호출하지 않는 제공자는 비용이 들지 않습니다.
+    """
+
+    def __init__(self, config: Optional[TransportConfig] = None):
+        self.config = config or TransportConfig()
+        self._session: Optional[requests.Session] = None
+        self._httpx_client = None
+        # httpx.AsyncClient는 이벤트 루프에 묶이므로 루프마다 하나씩 둡니다
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.request_count = 0
+
+    @property
+    def session(self) -> requests.Session:
+        """커넥션 풀이 설정된 공유 세션"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.config.pool_connections,
+            pool_maxsize=self.config.pool_maxsize,
+            max_retries=self.config.max_retries,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if not self.config.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def post(self, url: str, json: Optional[Dict[str, Any]] = None,
+             stream: bool = False, timeout: Any = None) -> requests.Response:
+        """풀의 커넥션으로 POST 요청을 보냅니다"""
+        self.request_count += 1
+        return self.session.post(
+            url, json=json, stream=stream,
+            timeout=timeout or self.config.timeout,
+        )
+
+    def get(self, url: str, timeout: Any = None) -> requests.Response:
+        """풀의 커넥션으로 GET 요청을 보냅니다"""
+        self.request_count += 1
+        return self.session.get(url, timeout=timeout or self.config.timeout)
+
+    def httpx_client(self):
+        """
+        OpenAI SDK에 넘겨줄 공유 httpx 클라이언트
+        OpenAI SDK가 내부적으로 httpx를 사용하므로 같은 풀 설정을 적용합니다.
+        """
+        if self._httpx_client is None:
+            with self._lock:
+                if self._httpx_client is None:
+                    import httpx  # openai 패키지의 의존성
+
+                    self._httpx_client = httpx.Client(
+                        limits=self._httpx_limits(httpx),
+                        timeout=httpx.Timeout(
+                            self.config.read_timeout,
+                            connect=self.config.connect_timeout,
+                        ),
+                    )
+        return self._httpx_client
+
+    def async_httpx_client(self):
+        """
+        현재 실행 중인 이벤트 루프에서 공유할 httpx.AsyncClient
+        같은 루프 안의 모든 비동기 호출이 하나의 커넥션 풀을 사용합니다.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            try:
+                import httpx
+            except ImportError as e:
+                raise ImportError(
+                    "비동기 호출에는 httpx 패키지가 필요합니다. `pip install httpx` 로 설치해 주세요."
+                ) from e
+
+            client = httpx.AsyncClient(
+                limits=self._httpx_limits(httpx),
+                timeout=httpx.Timeout(
+                    self.config.read_timeout,
+                    connect=self.config.connect_timeout,
+                ),
+            )
+            self._async_clients[loop] = client
+        return client
+
+    def _httpx_limits(self, httpx):
+        return httpx.Limits(
+            max_connections=self.config.pool_maxsize,
+            max_keepalive_connections=(
+                self.config.pool_maxsize if self.config.keep_alive else 0
+            ),
+            keepalive_expiry=self.config.keepalive_expiry,
+        )
+
+    def close(self):
+        """풀에 남아 있는 커넥션을 모두 닫습니다"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+            if self._httpx_client is not None:
+                self._httpx_client.close()
+                self._httpx_client = None
+            # 비동기 클라이언트는 자신의 루프에서만 닫을 수 있으므로 참조만 정리합니다
+            self._async_clients.clear()
+
+    async def aclose(self):
+        """현재 루프의 비동기 클라이언트를 닫습니다"""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
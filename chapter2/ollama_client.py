@@ -4,38 +4,84 @@ Ollama 로컬 LLM을 사용하는 클라이언트 예제
 - Ollama 설치: https://ollama.com
 - 모델 내려받기 예: `ollama pull llama3.2`
 """
+from typing import List, Optional, Tuple, Union
+
 import requests
 
 
 class OllamaClient:
     """Ollama를 사용하여 로컬 LLM을 실행하는 클라이언트"""
 
-    def __init__(self, base_url: str = "http://localhost:11434"):
+    def __init__(self, base_url: str = "http://localhost:11434",
+                 keep_alive: Optional[Union[str, int]] = None,
+                 warmup_models: Optional[List[str]] = None):
+        """
+        keep_alive: 요청 후 모델을 메모리에 유지할 시간 (예: "30m", -1은 계속 유지)
+        warmup_models: 생성 시점에 미리 불러올 모델 목록
+        """
         self.base_url = base_url
+        self.keep_alive = keep_alive
+        # 세션을 재사용하여 매 요청마다 새 연결을 맺지 않습니다
+        self.session = requests.Session()
+
+        if warmup_models:
+            self.warm_up(warmup_models)
 
     def generate(self, model: str, prompt: str) -> str:
         """로컬 모델로 텍스트 생성"""
+        text, _ = self.generate_with_context(model, prompt)
+        return text
+
+    def generate_with_context(self, model: str, prompt: str,
+                              context: Optional[List[int]] = None) -> Tuple[str, Optional[List[int]]]:
+        """
+        이전 턴의 context 토큰 배열을 넘겨 대화를 이어갑니다
+        돌려받은 context를 다음 호출에 넘기면 이전 대화를 다시 평가하지 않습니다.
+        """
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+        }
+        if context:
+            payload["context"] = context
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/generate",
-                json={
-                    "model": model,
-                    "prompt": prompt,
-                    "stream": False,
-                },
+                json=payload,
                 timeout=60,
             )
         except requests.exceptions.RequestException as e:
-            return f"Ollama 서버에 연결할 수 없습니다: {e}"
+            return f"Ollama 서버에 연결할 수 없습니다: {e}", context
 
         if response.status_code == 200:
-            return response.json()["response"]
-        return f"오류: {response.status_code}"
+            data = response.json()
+            return data["response"], data.get("context", context)
+        return f"오류: {response.status_code}", context
+
+    def warm_up(self, models: List[str]) -> dict:
+        """프롬프트 없이 요청을 보내 모델을 메모리에 미리 불러옵니다"""
+        loaded = {}
+        for model in models:
+            payload = {"model": model, "stream": False}
+            if self.keep_alive is not None:
+                payload["keep_alive"] = self.keep_alive
+            try:
+                response = self.session.post(
+                    f"{self.base_url}/api/generate", json=payload, timeout=120
+                )
+                loaded[model] = response.status_code == 200
+            except requests.exceptions.RequestException:
+                loaded[model] = False
+        return loaded
 
     def list_models(self) -> list:
         """설치된 모델 목록 확인"""
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
         except requests.exceptions.RequestException:
             return []
 
@@ -1,3 +1,10 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional
+
 try:
     import tiktoken
 except ImportError as _e:
@@ -5,46 +12,198 @@ except ImportError as _e:
         "tiktoken 패키지가 필요합니다. `pip install tiktoken` 으로 설치해 주세요."
     ) from _e
 
+
+# 프로세스 풀 작업자마다 한 번만 불러오는 인코딩
+_worker_encoding = None
+
+
+def _init_worker(encoding_name: str):
+    global _worker_encoding
+    _worker_encoding = tiktoken.get_encoding(encoding_name)
+
+
+def _count_chunk(texts: List[str]) -> List[int]:
+    """작업자 프로세스에서 실행 - 토큰 목록 대신 개수만 돌려보내 전송량을 줄입니다"""
+    return [len(tokens) for tokens in
+            _worker_encoding.encode_ordinary_batch(texts, num_threads=1)]
+
+
 class TokenAnalyzer:
     """
     텍스트의 토큰화를 분석하고 API 비용을 예측하는 도구
+    같은 텍스트의 토큰 수는 내용 해시를 키로 하는 LRU 캐시에서 바로 꺼냅니다.
     """
-    
-    def __init__(self):
+
+    def __init__(self, encoding_name: str = "cl100k_base", cache_size: int = 10000):
         # GPT 모델의 토큰화 방식
-        self.encoding = tiktoken.get_encoding("cl100k_base")
-        
+        self.encoding_name = encoding_name
+        self.encoding = tiktoken.get_encoding(encoding_name)
+
         # 토큰당 가격(1M토큰 기준, USD)
         self.price_per_1k = {
             "gpt-3.5-turbo": 1.5,
             "gpt-4o-mini": 0.6
         }
-    
+
+        # 내용 해시 → 토큰 수 LRU 캐시
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_size = 0
+
     def analyze(self, text: str) -> dict:
         """텍스트를 분석하여 토큰 정보를 반환합니다"""
-        # 토큰화
-        tokens = self.encoding.encode(text)
-        token_count = len(tokens)
-        
+        return self._summarize(text, self.count_tokens(text))
+
+    def analyze_many(self, texts: Iterable[str], **kwargs) -> List[dict]:
+        """여러 텍스트를 한 번에 분석합니다 (인자는 count_tokens_many와 같습니다)"""
+        texts = list(texts)
+        counts = self.count_tokens_many(texts, **kwargs)
+        return [self._summarize(text, count) for text, count in zip(texts, counts)]
+
+    def _summarize(self, text: str, token_count: int) -> dict:
         # 언어별 효율성 계산
         char_count = len(text)
         chars_per_token = char_count / token_count if token_count > 0 else 0
-        
+
         # 예상 비용 계산
         cost_gpt35 = (token_count / 1000000) * self.price_per_1k["gpt-3.5-turbo"]
         cost_gpt4 = (token_count / 1000000) * self.price_per_1k["gpt-4o-mini"]
-        
+
         return {
             "text": text[:50] + "..." if len(text) > 50 else text,
             "token_count": token_count,
             "character_count": char_count,
             "chars_per_token": round(chars_per_token, 1),
             "estimated_cost": {
-                "gpt-3.5": f"${cost_gpt35:.4f}", 
+                "gpt-3.5": f"${cost_gpt35:.4f}",
                 "gpt-4": f"${cost_gpt4:.4f}"
             }
         }
 
+    # ------------------------------------------------------------------
+    # 토큰 수 세기
+    # ------------------------------------------------------------------
+    def count_tokens(self, text: str) -> int:
+        """텍스트 하나의 토큰 수 (캐시 사용)"""
+        key = self._key(text)
+        count = self._cache_get(key)
+        if count is None:
+            count = len(self.encoding.encode_ordinary(text))
+            self._cache_put(key, count)
+        return count
+
+    def count_tokens_many(self, texts: Iterable[str], num_threads: Optional[int] = None,
+                          processes: int = 0, chunk_size: int = 2000) -> List[int]:
+        """
+        여러 텍스트의 토큰 수를 입력 순서대로 돌려줍니다
+        - 캐시에 있는 텍스트와 중복된 텍스트는 한 번만 인코딩합니다.
+        - 나머지는 tiktoken의 배치 API로 num_threads개 스레드에서 인코딩합니다
+          (None이면 CPU 코어 수, 최대 8개. 1이면 스레드 없이 차례로 인코딩).
+        - processes > 0이고 인코딩할 텍스트가 chunk_size보다 많으면
+          chunk_size개씩 나눠 프로세스 풀에 보냅니다 (대용량 코퍼스용).
+        """
+        texts = list(texts)
+        keys = [self._key(text) for text in texts]
+        counts: List[Optional[int]] = [self._cache_get(key) for key in keys]
+
+        # 캐시에 없는 텍스트를 내용 기준으로 중복 제거
+        pending = {}
+        for text, key, count in zip(texts, keys, counts):
+            if count is None and key not in pending:
+                pending[key] = text
+
+        if pending:
+            misses = list(pending.values())
+            if num_threads is None:
+                num_threads = min(8, os.cpu_count() or 1)
+            if processes > 0 and len(misses) > chunk_size:
+                fresh = self._count_in_processes(misses, processes, chunk_size)
+            elif num_threads <= 1:
+                fresh = [len(self.encoding.encode_ordinary(text)) for text in misses]
+            else:
+                fresh = [len(tokens) for tokens in
+                         self.encoding.encode_ordinary_batch(misses, num_threads=num_threads)]
+            computed = dict(zip(pending, fresh))
+            for key, count in computed.items():
+                self._cache_put(key, count)
+            counts = [count if count is not None else computed[key]
+                      for key, count in zip(keys, counts)]
+        return counts
+
+    def _count_in_processes(self, texts: List[str], processes: int,
+                            chunk_size: int) -> List[int]:
+        pool = self._get_pool(processes)
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        counts: List[int] = []
+        for chunk_counts in pool.map(_count_chunk, chunks):
+            counts.extend(chunk_counts)
+        return counts
+
+    def _get_pool(self, processes: int) -> ProcessPoolExecutor:
+        """프로세스 풀은 처음 필요할 때 만들어 재사용합니다 (작업자 시작 비용이 크기 때문)"""
+        if self._pool is None or self._pool_size != processes:
+            self.close()
+            self._pool = ProcessPoolExecutor(
+                max_workers=processes,
+                initializer=_init_worker,
+                initargs=(self.encoding_name,),
+            )
+            self._pool_size = processes
+        return self._pool
+
+    def close(self):
+        """프로세스 풀을 종료합니다"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    # ------------------------------------------------------------------
+    # LRU 캐시
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _key(text: str) -> bytes:
+        # 긴 텍스트를 그대로 키로 들고 있지 않도록 16바이트 해시를 사용합니다
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def _cache_get(self, key: bytes) -> Optional[int]:
+        with self._lock:
+            count = self._cache.get(key)
+            if count is None:
+                self.cache_misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return count
+
+    def _cache_put(self, key: bytes, count: int):
+        with self._lock:
+            self._cache[key] = count
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def cache_info(self) -> dict:
+        """캐시 적중률과 크기"""
+        total = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": self.cache_hits / total if total else 0.0,
+            "size": len(self._cache),
+            "max_size": self.cache_size,
+        }
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+            self.cache_hits = 0
+            self.cache_misses = 0
+
 if __name__ == "__main__":
     # 다양한 언어 테스트
     analyzer = TokenAnalyzer()
@@ -60,3 +219,8 @@ if __name__ == "__main__":
         print(f"\n{lang}: {text}")
         print(f"  토큰 수: {result['token_count']}")
         print(f"  문자당 토큰: {result['chars_per_token']}")
+
+    # 여러 텍스트를 한 번에 (중복 텍스트는 캐시에서)
+    counts = analyzer.count_tokens_many(list(texts.values()) * 3)
+    print(f"\n배치 토큰 수: {counts}")
+    print(f"캐시: {analyzer.cache_info()}")
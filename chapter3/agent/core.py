@@ -22,12 +22,15 @@ for _p in (
         sys.path.insert(0, _p)
 
 from planner import Planner          # 코드 3.2.1: 계획 수립
-from executor import Executor        # 코드 3.2.2: 계획 실행
+from executor import Executor, run_sync  # 코드 3.2.2: 계획 실행
+from plan_cache import PlanLibrary   # 계획 재사용
 from system import MemorySystem      # 코드 3.2.4: 기억 관리
+from storage import SQLiteMemoryStore  # 장기 기억 영속화 (선택)
 from base import ToolManager, BaseTool  # 코드 3.2.3: 도구 관리
+from tracing import Tracer, annotate, echo, span, verbosity  # 실행 추적과 출력 제어
 
 # 2장의 통합 LLM 인터페이스
-from llm_interface import LLM        # 코드 2-7~코드 2-9
+from llm_interface import shared_llm # 코드 2-7~코드 2-9
 
 class SimpleTool(BaseTool):
     """학습용 간단한 도구 — execute만 최소 구현"""
@@ -50,9 +53,15 @@ class Agent:
     에이전트는 이들을 조율하는 역할을 합니다.
     """
     
-    def __init__(self):
+    def __init__(self, memory_path: str = None, verbose: bool = True,
+                 tracer: Tracer = None):
         """
         네 가지 핵심 구성요소를 초기화하고 연결합니다.
+
+        memory_path를 주면 장기 기억을 그 SQLite 파일에 저장하여
+        프로세스를 다시 시작해도 이전 경험을 검색할 수 있습니다.
+        verbose=False면 이 에이전트가 처리하는 동안 구성요소의 진행 출력을 모두 끕니다.
+        요청마다 단계·LLM 호출·도구 호출 구간을 tracer(기본: 최근 100개 보관)에 기록합니다.
         
         초기화 순서가 중요합니다:
         1. LLM (다른 구성요소가 사용)
@@ -61,43 +70,52 @@ class Agent:
         4. Planner (LLM 사용)
         5. Executor (ToolManager와 Memory 사용)
         """
-        print("에이전트 초기화 시작...")
-        print("-" * 50)
-        
-        # 1. LLM 인터페이스 초기화
-        # 이것이 먼저 초기화되어야 다른 구성요소가 사용할 수 있습니다
-        print(" 1. LLM 인터페이스 설정...")
-        self.llm = LLM()  # Ollama, OpenAI, Mock 중 자동 선택
-        
-        # 2. 메모리 시스템 초기화
-        # 과거 경험을 저장하고 검색하는 역할
-        print(" 2. 메모리 시스템 초기화...")
-        self.memory = MemorySystem()
-        
-        # 3. 도구 관리자 초기화
-        # 에이전트가 사용할 도구들을 관리
-        print(" 3. ToolManager 초기화...")
-        self.tool_manager = ToolManager(llm=self.llm)
-        
-        # 4. 계획 수립기 초기화
-        # 사용자 요청을 실행 가능한 계획으로 변환
-        print(" 4. Planner 초기화...")
-        self.planner = Planner(llm=self.llm)
-        
-        # 5. 실행 엔진 초기화
-        # 계획을 실제로 실행하는 역할
-        print(" 5. Executor 초기화...")
-        self.executor = Executor(
-            tool_manager=self.tool_manager,
-            memory=self.memory
-        )
+        self.verbose = verbose
+        self.tracer = tracer if tracer is not None else Tracer()
+        with verbosity(verbose):
+            echo("에이전트 초기화 시작...")
+            echo("-" * 50)
+        
+            # 1. LLM 인터페이스 초기화
+            # 이것이 먼저 초기화되어야 다른 구성요소가 사용할 수 있습니다
+            echo(" 1. LLM 인터페이스 설정...")
+            # Ollama, OpenAI, Mock 중 자동 선택 (감지는 프로세스당 한 번, 인스턴스는 공유)
+            self.llm = shared_llm()
+        
+            # 2. 메모리 시스템 초기화
+            # 과거 경험을 저장하고 검색하는 역할
+            echo(" 2. 메모리 시스템 초기화...")
+            storage = SQLiteMemoryStore(memory_path) if memory_path else None
+            self.memory = MemorySystem(storage=storage)
+        
+            # 3. 도구 관리자 초기화
+            # 에이전트가 사용할 도구들을 관리
+            echo(" 3. ToolManager 초기화...")
+            self.tool_manager = ToolManager(llm=self.llm)
+        
+            # 4. 계획 수립기 초기화
+            # 사용자 요청을 실행 가능한 계획으로 변환
+            echo(" 4. Planner 초기화...")
+            self.planner = Planner(llm=self.llm)
+        
+            # 5. 실행 엔진 초기화
+            # 계획을 실제로 실행하는 역할
+            echo(" 5. Executor 초기화...")
+            self.executor = Executor(
+                tool_manager=self.tool_manager,
+                memory=self.memory
+            )
+            # 실행 이력에서 성공한 계획을 배워 비슷한 요청에 재사용합니다
+            self.planner.plan_library = PlanLibrary(self.executor.execution_history)
+            # 실행하며 관측한 도구별 소요 시간·실패율로 계획의 예상 시간을 계산합니다
+            self.planner.cost_model = self.executor.cost_model
         
-        # 6. 기본 도구들 등록
-        print(" 6. 기본 도구 등록...")
-        self._register_default_tools()
+            # 6. 기본 도구들 등록
+            echo(" 6. 기본 도구 등록...")
+            self._register_default_tools()
         
-        print("-" * 50)
-        print("에이전트 초기화 완료\n")
+            echo("-" * 50)
+            echo("에이전트 초기화 완료\n")
     
     def _register_default_tools(self):
         """
@@ -109,7 +127,11 @@ class Agent:
         """
         # 회의 준비에 필요한 도구들
         tools = [
-            SimpleTool(name="database", description="참석자 정보를 조회합니다"),
+            # 조회 도구는 같은 입력이면 5분 동안 결과를 재사용합니다.
+            # SimpleTool은 입력 전체(단계 번호, 선행 단계 결과 포함)를 결과에 담으므로
+            # cache_key를 따로 주지 않고 입력 전체를 키로 씁니다
+            SimpleTool(name="database", description="참석자 정보를 조회합니다",
+                       cacheable=True, cache_ttl=300),
             SimpleTool(name="calendar", description="일정과 회의실을 관리합니다"),  
             SimpleTool(name="email", description="이메일을 발송합니다"),
             SimpleTool(name="document", description="문서를 생성하고 편집합니다")
@@ -126,136 +148,168 @@ class Agent:
         이 메서드는 시퀀스 다이어그램의 5단계 프로세스를 
         정확히 구현합니다. 각 단계는 특정 구성요소를 호출하고,
         그 결과를 다음 단계로 전달합니다.
+        요청 하나가 self.tracer의 추적 하나가 됩니다.
+        aprocess_request를 동기 코드에서 호출하기 위한 래퍼입니다.
+        요청마다 루프를 새로 만들지 않고 프로세스 공용 백그라운드 루프(run_sync)에서 실행하므로
+        LLM의 비동기 커넥션 풀을 요청 사이에 재사용합니다. 이벤트 루프 안에서 호출하면
+        끝날 때까지 그 루프가 멈추므로, 비동기 코드에서는 aprocess_request를 직접 await 하세요.
+        """
+        return run_sync(self.aprocess_request(user_request))
+
+    async def aprocess_request(self, user_request: str) -> str:
+        """process_request의 비동기 버전 (LLM과 도구를 기다리는 동안 이벤트 루프를 막지 않습니다)"""
+        with verbosity(self.verbose), \
+                self.tracer.span("process_request", "request", request=user_request):
+            return await self._aprocess(user_request, self.memory, self.executor)
+
+    async def _aprocess(self, user_request: str, memory: MemorySystem,
+                        executor: Executor) -> str:
+        """
+        process_request의 본문 - 5단계를 각각 하나의 구간으로 기록합니다
+        기억과 실행기는 인자로 받으므로, AgentRuntime은 LLM·도구·계획 수립기를 공유하면서
+        세션마다 다른 기억으로 같은 본문을 실행합니다.
         """
-        print(f"\n{'='*60}")
-        print(f"사용자: {user_request}")
-        print(f"{'='*60}\n")
+        echo(f"\n{'='*60}")
+        echo(f"사용자: {user_request}")
+        echo(f"{'='*60}\n")
         
         try:
             # ==========================================
             # 1단계: 요청 수신과 기억 검색
             # 목적: 과거의 유사한 경험을 찾아 현재 작업에 활용
             # ==========================================
-            print("[1단계] 요청 수신과 기억 검색")
-            print("-" * 40)
+            with span("memory.retrieve"):
+                echo("[1단계] 요청 수신과 기억 검색")
+                echo("-" * 40)
             
-            # MemorySystem의 retrieve 메서드 호출
-            # 모든 메모리 타입(단기, 장기, 작업)에서 검색합니다
-            memories = self.memory.retrieve(
-                query=user_request,
-                memory_type='all',  # 모든 메모리 타입에서 검색
-                k=5  # 상위 5개의 관련 기억을 가져옴
-            )
+                # MemorySystem의 retrieve 메서드 호출
+                # 모든 메모리 타입(단기, 장기, 작업)에서 검색합니다
+                memories = memory.retrieve(
+                    query=user_request,
+                    memory_type='all',  # 모든 메모리 타입에서 검색
+                    k=5  # 상위 5개의 관련 기억을 가져옴
+                )
             
-            # 검색 결과 표시
-            if memories:
-                print(f" 관련 기억 {len(memories)}개 발견:")
-                # 처음 2개만 표시 (너무 많으면 출력이 복잡해짐)
-                for i, mem in enumerate(memories[:2], 1):  
-                    content = mem.get('content', '')[:50]
-                    print(f"    {i}. {content}...")
-            else:
-                print("  관련 기억 없음 (새로운 작업입니다)")
+                # 검색 결과 표시
+                if memories:
+                    echo(f" 관련 기억 {len(memories)}개 발견:")
+                    # 처음 2개만 표시 (너무 많으면 출력이 복잡해짐)
+                    for i, mem in enumerate(memories[:2], 1):  
+                        content = mem.get('content', '')[:50]
+                        echo(f"    {i}. {content}...")
+                else:
+                    echo("  관련 기억 없음 (새로운 작업입니다)")
             
             # ==========================================
             # 2단계: 계획 수립
             # 목적: 요청을 실행 가능한 작은 단계들로 분해
             # ==========================================
-            print("\n[2단계] 계획 수립")
-            print("-" * 40)
+            with span("plan"):
+                echo("\n[2단계] 계획 수립")
+                echo("-" * 40)
             
-            # 계획 수립을 위한 콘텍스트 준비
-            # 이 정보들이 더 나은 계획을 만드는 데 도움이 됩니다
-            context = {
-                'memories': memories,  # 과거 경험
-                'timestamp': datetime.now(),  # 현재 시간
-                'user_preferences': self._get_user_preferences()  # 사용자 선호
-            }
-            print(f" 컨텍스트 준비 완료")
+                # 계획 수립을 위한 콘텍스트 준비
+                # 이 정보들이 더 나은 계획을 만드는 데 도움이 됩니다
+                context = {
+                    'memories': memories,  # 과거 경험
+                    'timestamp': datetime.now(),  # 현재 시간
+                    'user_preferences': self._get_user_preferences()  # 사용자 선호
+                }
+                echo(f" 컨텍스트 준비 완료")
             
-            # 사용 가능한 도구 목록 가져오기
-            available_tools = self.tool_manager.list_tools()
-            print(f" 사용 가능한 도구: {available_tools}")
+                # 사용 가능한 도구 목록 가져오기
+                available_tools = self.tool_manager.list_tools()
+                echo(f" 사용 가능한 도구: {available_tools}")
             
-            # Planner에게 계획 수립 요청
-            plan = self.planner.create_plan(
-                user_request=user_request,
-                available_tools=available_tools,
-                context=context
-            )
+                # Planner에게 계획 수립 요청
+                # 기억을 보고 만든 계획은 이 실행기의 범위(AgentRuntime에서는 세션)에만 저장됩니다
+                plan = await self.planner.acreate_plan(
+                    user_request=user_request,
+                    available_tools=available_tools,
+                    context=context,
+                    cache_scope=executor.cache_scope
+                )
             
-            # 생성된 계획을 보기 좋게 출력
-            self._display_plan(plan)
+                annotate(steps=len(plan.get('steps', [])))
+                if plan.get('estimate'):
+                    annotate(estimated_seconds=plan['estimate']['critical_path_seconds'],
+                             success_probability=plan['estimate']['success_probability'])
+
+                # 생성된 계획을 보기 좋게 출력
+                self._display_plan(plan)
             
             # ==========================================
             # 3단계: 계획 실행
             # 목적: 각 단계를 순서대로(또는 병렬로) 실행
             # ==========================================
-            print("\n [3단계] 계획 실행")
-            print("-" * 40)
+            with span("execute"):
+                echo("\n [3단계] 계획 실행")
+                echo("-" * 40)
             
-            print("  실행 루프 시작...")
-            print("  (의존성 확인 → 도구 실행 → 결과 저장)")
+                echo("  실행 루프 시작...")
+                echo("  (의존성 확인 → 도구 실행 → 결과 저장)")
             
-            # Executor가 계획을 실행
-            # 내부적으로 복잡한 처리가 일어나지만,
-            # Agent는 결과만 받으면 됩니다
-            results = self.executor.execute_plan(plan)
+                # Executor가 계획을 실행
+                # 내부적으로 복잡한 처리가 일어나지만,
+                # Agent는 결과만 받으면 됩니다
+                results = await executor.aexecute_plan(plan)
             
-            print(f"  실행 완료: {len(results)}개 작업 처리")
+                echo(f"  실행 완료: {len(results)}개 작업 처리")
             
             # ==========================================
             # 4단계: 경험 저장
             # 목적: 이번 작업을 경험으로 저장하여 학습
             # ==========================================
-            print("\n[4단계] 경험 저장")
-            print("-" * 40)
+            with span("memory.store"):
+                echo("\n[4단계] 경험 저장")
+                echo("-" * 40)
             
-            # 전체 작업 경험을 하나의 데이터로 구성
-            experience = {
-                'content': f"요청: {user_request}",  # 간단한 설명
-                'request': user_request,  # 원본 요청
-                'plan': plan,  # 수립된 계획
-                'results': results,  # 실행 결과
-                'timestamp': datetime.now(),  # 처리 시간
-                'is_important': self._is_important_experience(results)  # 중요도
-            }
+                # 전체 작업 경험을 하나의 데이터로 구성
+                experience = {
+                    'content': f"요청: {user_request}",  # 간단한 설명
+                    'request': user_request,  # 원본 요청
+                    'plan': plan,  # 수립된 계획
+                    'results': results,  # 실행 결과
+                    'timestamp': datetime.now(),  # 처리 시간
+                    'is_important': self._is_important_experience(results)  # 중요도
+                }
             
-            # Memory에 경험 저장
-            self.memory.store(
-                information=experience,
-                memory_type='short'  # 일단 단기 기억에 저장
-            )
+                # Memory에 경험 저장
+                memory.store(
+                    information=experience,
+                    memory_type='short'  # 일단 단기 기억에 저장
+                )
 
-            # 중요한 경험은 자동으로 장기 기억으로 승격됩니다
-            if experience['is_important']:
-                print("  중요 경험으로 표시 → 장기 기억 승격 가능")
-            else:
-                print("  일반 경험으로 단기 기억에 저장")
+                # 중요한 경험은 자동으로 장기 기억으로 승격됩니다
+                if experience['is_important']:
+                    echo("  중요 경험으로 표시 → 장기 기억 승격 가능")
+                else:
+                    echo("  일반 경험으로 단기 기억에 저장")
             
             # ==========================================
             # 5단계: 응답 생성
             # 목적: 복잡한 내부 처리를 간단한 메시지로 변환
             # ==========================================
-            print("\n[5단계] 응답 생성")
-            print("-" * 40)
+            with span("respond"):
+                echo("\n[5단계] 응답 생성")
+                echo("-" * 40)
             
-            # 결과를 분석하여 사용자 친화적 메시지 생성
-            response = self._generate_response(results, user_request)
+                # 결과를 분석하여 사용자 친화적 메시지 생성
+                response = self._generate_response(results, user_request)
 
-            print(f"\n{'='*60}")
-            print(f"에이전트: {response}")
-            print(f"{'='*60}")
+                echo(f"\n{'='*60}")
+                echo(f"에이전트: {response}")
+                echo(f"{'='*60}")
             
-            return response
+                return response
             
         except Exception as e:
             # 오류 처리도 중요한 부분입니다
             error_msg = f"오류 발생: {str(e)}"
-            print(f"\n{error_msg}")
+            echo(f"\n{error_msg}")
             
             # 오류도 경험으로 저장합니다 (학습을 위해)
-            self.memory.store({
+            memory.store({
                 'content': f"오류: {user_request} - {str(e)}",
                 'type': 'error',
                 'timestamp': datetime.now()
@@ -271,8 +325,8 @@ class Agent:
         어떤 작업이 언제 실행될 수 있는지 명확하게 보여줍니다.
         """
         steps = plan.get('steps', [])
-        print(f" {len(steps)}단계 계획 생성 완료")
-        print("\n 계획 내용:")
+        echo(f" {len(steps)}단계 계획 생성 완료")
+        echo("\n 계획 내용:")
         
         for step in steps:
             step_num = step.get('step_number', '?')
@@ -288,8 +342,15 @@ class Agent:
             else:
                 deps_str = "[즉시 실행 가능]"
             
-            print(f"    단계 {step_num}: {desc}")
-            print(f"           도구: {tool} {deps_str}")
+            echo(f"    단계 {step_num}: {desc}")
+            echo(f"           도구: {tool} {deps_str}")
+
+        # 실행 이력으로 추정한 시간 (호출한 쪽은 p90을 마감 시간의 기준으로 쓸 수 있습니다)
+        estimate = plan.get('estimate')
+        if estimate:
+            echo(f" 예상 소요 시간: {estimate['critical_path_seconds']:.2f}초 "
+                 f"(p90 {estimate['p90_seconds']:.2f}초, "
+                 f"성공 확률 {estimate['success_probability']:.0%})")
     
     def _generate_response(self, results: Dict, request: str) -> str:
         """
@@ -386,23 +447,24 @@ class Agent:
         이를 통해 여러 작업을 순차적으로 처리할 때
         각 작업이 독립적인 콘텍스트를 가질 수 있습니다.
         """
-        # 이전 작업 기억 정리
-        # 새 작업을 시작하기 전에 깨끗한 상태로 만듭니다
-        self.memory.clear_working_memory()
-        
-        # 새 작업 정보를 작업 기억에 저장
-        task_info = {
-            'key': 'current_task',
-            'task': task_name,
-            'started_at': datetime.now()
-        }
-        self.memory.store(
-            information=task_info,
-            memory_type='working'  # 작업 기억에 저장
-        )
+        with verbosity(self.verbose):
+            # 이전 작업 기억 정리
+            # 새 작업을 시작하기 전에 깨끗한 상태로 만듭니다
+            self.memory.clear_working_memory()
         
-        print(f"새 작업 시작: {task_name}")
-        print(f" 시작 시간: {task_info['started_at'].strftime('%H:%M:%S')}")
+            # 새 작업 정보를 작업 기억에 저장
+            task_info = {
+                'key': 'current_task',
+                'task': task_name,
+                'started_at': datetime.now()
+            }
+            self.memory.store(
+                information=task_info,
+                memory_type='working'  # 작업 기억에 저장
+            )
+        
+            echo(f"새 작업 시작: {task_name}")
+            echo(f" 시작 시간: {task_info['started_at'].strftime('%H:%M:%S')}")
     
     def end_task(self):
         """
@@ -411,28 +473,29 @@ class Agent:
         작업 요약을 단기 기억에 저장하고,
         작업 기억을 정리하여 다음 작업을 위한 준비를 합니다.
         """
-        # 현재 작업 정보 가져오기
-        working_data = self.memory.working_memory.get('current_task')
+        with verbosity(self.verbose):
+            # 현재 작업 정보 가져오기
+            working_data = self.memory.working_memory.get('current_task')
         
-        if working_data:
-            # 작업 소요 시간 계산
-            duration = datetime.now() - working_data['started_at']
+            if working_data:
+                # 작업 소요 시간 계산
+                duration = datetime.now() - working_data['started_at']
             
-            # 작업 요약을 만들어 단기 기억에 저장
-            summary = {
-                'content': f"작업 완료: {working_data['task']}",
-                'task': working_data['task'],
-                'duration': str(duration),  # 문자열로 변환하여 저장
-                'completed_at': datetime.now()
-            }
-            self.memory.store(summary, memory_type='short')
+                # 작업 요약을 만들어 단기 기억에 저장
+                summary = {
+                    'content': f"작업 완료: {working_data['task']}",
+                    'task': working_data['task'],
+                    'duration': str(duration),  # 문자열로 변환하여 저장
+                    'completed_at': datetime.now()
+                }
+                self.memory.store(summary, memory_type='short')
             
-            print(f" 작업 종료: {working_data['task']}")
-            print(f" 소요 시간: {duration}")
+                echo(f" 작업 종료: {working_data['task']}")
+                echo(f" 소요 시간: {duration}")
         
-        # 작업 기억 초기화
-        self.memory.clear_working_memory()
-        print(" 작업 기억이 초기화되었습니다")
+            # 작업 기억 초기화
+            self.memory.clear_working_memory()
+            echo(" 작업 기억이 초기화되었습니다")
     
     def get_status(self) -> Dict:
         """
@@ -448,6 +511,13 @@ class Agent:
             'long_term': len(self.memory.long_term_memory),
             'working': len(self.memory.working_memory)
         }
+        long_term = self.memory.long_term_stats()
+        memory_status['long_term_bytes'] = long_term['bytes']
+        memory_status['long_term_budget'] = long_term['budget_bytes']
+        memory_status['evicted'] = long_term['evicted']
+        memory_status['compacted'] = long_term['compacted']
+        if self.memory.storage is not None:
+            memory_status['persisted'] = len(self.memory.storage)
         
         # 현재 작업 정보
         current_task = self.memory.working_memory.get('current_task')
@@ -465,7 +535,11 @@ class Agent:
             'tools': self.tool_manager.list_tools(),
             'tool_count': len(self.tool_manager.tools),
             'current_task': task_info,
-            'llm_provider': self.llm.__class__.__name__
+            'llm_provider': self.llm.__class__.__name__,
+            'planning': self.planner.plan_stats(),
+            'tool_routing': self.tool_manager.router.stats(),
+            'tool_cache': self.tool_manager.cache_stats(),
+            'tool_costs': self.executor.cost_model.stats()
         }
         
         return status
@@ -0,0 +1,328 @@
+"""
+여러 사용자를 한 프로세스에서 처리하는 에이전트 런타임
+
+Agent 하나는 기억 하나를 가지므로 사용자마다 Agent를 만들면
+LLM 연결, ToolManager, 계획 캐시까지 사용자 수만큼 생깁니다.
+AgentRuntime은 상태가 없는 구성요소(LLM, Planner, ToolManager, 작업 스레드)를 하나만 두고,
+세션마다 기억(MemorySystem)과 그 기억에 단계 결과를 쓰는 Executor만 따로 둡니다.
+
+- 살아 있는 세션은 max_live_sessions개까지 LRU로 메모리에 두고,
+  넘치면 가장 오래 쓰이지 않은 유휴 세션의 기억을 세션 저장소(SQLite)로 내립니다.
+  내린 세션에 요청이 오면 저장소에서 읽어 되살립니다.
+  저장소 읽기·쓰기와 기억 직렬화는 작업 스레드에서 하므로 이벤트 루프를 막지 않습니다.
+- process_request는 코루틴이므로 수천 개 세션의 요청이 한 이벤트 루프에서 동시에 진행됩니다.
+  같은 세션의 요청은 작업 기억이 섞이지 않도록 도착 순서대로 하나씩 처리합니다.
+"""
+import asyncio
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+_CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if _CURRENT_DIR not in sys.path:
+    sys.path.insert(0, _CURRENT_DIR)
+
+from core import Agent                   # 공유 구성요소와 5단계 처리 본문
+from executor import Executor
+from storage import SQLiteSessionStore   # 유휴 세션 보관
+from system import MemorySystem
+from tracing import Tracer, echo, verbosity
+from vector_store import HashingEmbedder, InMemoryVectorStore
+
+
+class Session:
+    """세션 하나의 상태 - 기억, 그 기억을 쓰는 Executor, 요청 직렬화용 잠금"""
+
+    def __init__(self, session_id: str, memory: MemorySystem, executor: Executor):
+        self.session_id = session_id
+        self.memory = memory
+        self.executor = executor
+        self.lock = asyncio.Lock()
+        self.active = 0        # 처리 중이거나 기다리는 요청 수 (0이어야 내릴 수 있습니다)
+        self.requests = 0
+        self.last_used = time.monotonic()
+
+
+class AgentRuntime:
+    """
+    멀티 세션 에이전트 런타임
+
+    runtime = AgentRuntime(max_live_sessions=1000)
+    response = await runtime.process_request("user-42", "내일 팀 회의를 준비해줘")
+
+    - LLM, Planner(계획 캐시·라이브러리 포함), ToolManager, Tracer는 모든 세션이 공유합니다.
+      계획 캐시와 PlanLibrary도 세션 id를 범위로 씁니다. 세션의 기억을 보고 만든 계획은 그 세션만
+      재사용하고, 기억 없이 만든 계획만 다른 사용자의 비슷한 요청에 나눠 줍니다.
+      도구 결과 캐시는 저장소 하나를 쓰되 키에 세션 id를 넣어, 한 사용자의 결과가 다른 세션에 나가지 않습니다.
+    - 세션 기억은 session_memory_budget 바이트까지 장기 기억을 보관합니다.
+    - session_store를 주지 않으면 프로세스 메모리 안의 SQLite에 내립니다.
+      파일 경로의 SQLiteSessionStore를 넘기면 재시작 후에도 세션 기억이 이어집니다.
+    """
+
+    def __init__(self, max_live_sessions: int = 1000,
+                 session_store: Optional[SQLiteSessionStore] = None,
+                 session_memory_budget: Optional[int] = 1024 * 1024,
+                 max_workers: int = 16, verbose: bool = False,
+                 tracer: Optional[Tracer] = None):
+        self.max_live_sessions = max_live_sessions
+        self.session_store = session_store if session_store is not None else SQLiteSessionStore()
+        self.session_memory_budget = session_memory_budget
+        self.verbose = verbose
+
+        # 공유 구성요소 (Agent 자신의 기억과 Executor는 쓰지 않습니다)
+        self.agent = Agent(verbose=verbose, tracer=tracer)
+        self.llm = self.agent.llm
+        self.planner = self.agent.planner
+        self.tool_manager = self.agent.tool_manager
+        self.tracer = self.agent.tracer
+        self.plan_library = self.planner.plan_library
+        # 모든 세션의 실행 관측이 하나의 비용 모델에 모여 계획 추정에 쓰입니다
+        self.cost_model = self.planner.cost_model
+        # 동기 도구는 세션 수와 관계없이 이 스레드들에서만 실행합니다
+        self._thread_pool = ThreadPoolExecutor(max_workers=max_workers,
+                                               thread_name_prefix="runtime-step")
+        self._step_workers = self.agent.executor.max_workers
+        self._embedder = HashingEmbedder()   # 상태가 없으므로 모든 세션의 벡터 저장소가 나눠 씁니다
+
+        self._live: Dict[str, Session] = {}
+        # 처리 중인 요청이 없는 세션 (마지막으로 쓰인 순서). 내릴 세션은 항상 맨 앞에 있습니다
+        self._idle: "OrderedDict[str, Session]" = OrderedDict()
+        # 작업 스레드에서 저장소로 내리거나 저장소에서 되살리는 중인 세션 -> 그 작업
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.sessions_created = 0
+        self.sessions_restored = 0
+        self.sessions_spilled = 0
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def process_request(self, session_id: str, user_request: str) -> str:
+        """
+        세션의 요청을 처리합니다 (Agent.process_request와 같은 5단계)
+        같은 세션의 요청은 차례로, 다른 세션의 요청은 동시에 처리됩니다.
+        """
+        session = await self._checkout(session_id)
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            async with session.lock:
+                with verbosity(self.verbose), \
+                        self.tracer.span("process_request", "request",
+                                         session=session_id, request=user_request):
+                    response = await self.agent._aprocess(
+                        user_request, session.memory, session.executor
+                    )
+                self._learn(session.executor)
+                session.requests += 1
+                self.requests += 1
+                return response
+        finally:
+            self.in_flight -= 1
+            self._release(session)
+            await self._spill_idle()
+
+    async def _checkout(self, session_id: str) -> Session:
+        """
+        살아 있는 세션을 꺼내거나, 저장소에서 되살리거나, 새로 만듭니다
+        같은 세션을 내리거나 되살리는 중이면 그 작업이 끝난 뒤 다시 찾습니다.
+        """
+        while True:
+            session = self._live.get(session_id)
+            if session is not None:
+                break
+            pending = self._pending.get(session_id) or self._start_restore(session_id)
+            # 기다리던 요청이 취소되어도 되살린 세션은 완료 콜백이 등록합니다
+            await asyncio.shield(pending)
+        self._idle.pop(session_id, None)
+        session.active += 1
+        return session
+
+    def _start_restore(self, session_id: str) -> asyncio.Future:
+        """작업 스레드에서 세션 상태를 읽어 기억을 되살리고, 끝나면 루프에서 세션을 등록합니다"""
+        loop = asyncio.get_running_loop()
+        job = loop.run_in_executor(self._thread_pool, self._load_memory, session_id)
+        self._pending[session_id] = job
+
+        def done(job: asyncio.Future):
+            del self._pending[session_id]
+            if job.cancelled() or job.exception() is not None:
+                return   # 기다리는 요청이 예외를 받습니다
+            memory, restored = job.result()
+            with verbosity(self.verbose):
+                if restored is not None:
+                    self.sessions_restored += 1
+                    echo(f"[Runtime] 세션 {session_id} 복원 (기억 {restored}개)")
+                else:
+                    self.sessions_created += 1
+            session = self._new_session(session_id, memory)
+            self._live[session_id] = session
+            self._idle[session_id] = session
+        job.add_done_callback(done)
+        return job
+
+    def _load_memory(self, session_id: str) -> Tuple[MemorySystem, Optional[int]]:
+        """(세션 기억, 되살린 기억 수 - 저장소에 없던 새 세션이면 None) - 작업 스레드에서 실행됩니다"""
+        memory = self._new_memory()
+        state = self.session_store.pop(session_id)
+        if state is None:
+            return memory, None
+        memory.load_state(state)
+        return memory, len(state['records'])
+
+    def _new_session(self, session_id: str, memory: MemorySystem) -> Session:
+        # 단계 입력에는 세션의 선행 결과가 들어 있으므로 도구 결과 캐시는 세션별로 나눕니다
+        executor = Executor(self.tool_manager, memory, max_workers=self._step_workers,
+                            thread_pool=self._thread_pool, cost_model=self.cost_model,
+                            cache_scope=session_id)
+        return Session(session_id, memory, executor)
+
+    def _new_memory(self) -> MemorySystem:
+        """
+        세션 기억 - 세션 대부분은 장기 기억이 몇 개뿐이므로
+        벡터 저장소를 작게 시작하고(필요하면 두 배씩 늘어납니다) 임베딩 캐시도 작게 둡니다
+        """
+        vector_store = InMemoryVectorStore(embedder=self._embedder, initial_capacity=16,
+                                           cache_size=64)
+        return MemorySystem(vector_store=vector_store,
+                            long_term_budget=self.session_memory_budget)
+
+    def _release(self, session: Session):
+        session.active -= 1
+        session.last_used = time.monotonic()
+        if session.active == 0:
+            self._idle[session.session_id] = session
+
+    async def _spill_idle(self):
+        """
+        살아 있는 세션이 max_live_sessions개를 넘으면 오래 쓰이지 않은 유휴 세션부터 내립니다
+        요청을 처리 중인 세션은 내리지 않으므로, 모두 바쁘면 잠시 한도를 넘을 수 있습니다.
+        내릴 세션은 await 없이 한 번에 골라 _pending에 올리므로, 저장이 끝나기 전에 온
+        같은 세션의 요청은 저장을 기다렸다가 저장소에서 되살립니다.
+        """
+        victims = []
+        while len(self._live) > self.max_live_sessions and self._idle:
+            session_id, session = self._idle.popitem(last=False)
+            del self._live[session_id]
+            victims.append(session)
+        if not victims:
+            return
+        loop = asyncio.get_running_loop()
+        job = loop.run_in_executor(self._thread_pool, self._save_sessions, victims)
+        for session in victims:
+            self._pending[session.session_id] = job
+
+        def done(job: asyncio.Future):
+            failed = victims if job.cancelled() or job.exception() else job.result()
+            for session in victims:
+                del self._pending[session.session_id]
+            self.sessions_spilled += len(victims) - len(failed)
+            # 저장하지 못한 세션은 기억을 잃지 않도록 다시 살아 있는 세션으로 둡니다
+            for session in failed:
+                self._live[session.session_id] = session
+                self._idle[session.session_id] = session
+                self._idle.move_to_end(session.session_id, last=False)
+        job.add_done_callback(done)
+        await asyncio.shield(job)
+
+    def _save_sessions(self, sessions: List[Session]) -> List[Session]:
+        """세션 기억을 내보내 저장소에 씁니다 (작업 스레드에서 실행, 저장하지 못한 세션 목록을 돌려줍니다)"""
+        failed = []
+        for session in sessions:
+            try:
+                self.session_store.save(session.session_id, session.memory.export_state())
+            except Exception as e:
+                failed.append(session)
+                with verbosity(self.verbose):
+                    echo(f"[Runtime] 세션 {session.session_id}을 내리지 못함: {e}")
+        return failed
+
+    def _learn(self, executor: Executor):
+        """
+        세션 실행 이력을 계획 라이브러리에 넘기고 비웁니다 (세션마다 이력이 쌓이지 않도록)
+        계획은 plan['scope'] 범위에 들어가므로 세션 기억으로 만든 계획은 그 세션에만 남습니다.
+        """
+        if self.plan_library is not None:
+            for entry in executor.execution_history:
+                self.plan_library.learn(entry)
+        executor.execution_history.clear()
+
+    async def get_session_memory(self, session_id: str) -> Optional[MemorySystem]:
+        """살아 있는 세션의 기억 (내려간 세션이면 되살립니다, 없는 세션이면 None)"""
+        loop = asyncio.get_running_loop()
+        if session_id not in self._live and session_id not in self._pending and \
+                not await loop.run_in_executor(self._thread_pool,
+                                               self.session_store.__contains__, session_id):
+            return None
+        session = await self._checkout(session_id)
+        self._release(session)
+        await self._spill_idle()
+        return session.memory
+
+    async def close_session(self, session_id: str) -> bool:
+        """세션의 기억을 메모리와 저장소에서 모두 지웁니다"""
+        while session_id in self._pending:
+            await asyncio.shield(self._pending[session_id])
+        session = self._live.get(session_id)
+        if session is not None and session.active:
+            raise RuntimeError(f"세션 {session_id}의 요청이 처리 중입니다")
+        removed = self._live.pop(session_id, None) is not None
+        self._idle.pop(session_id, None)
+        loop = asyncio.get_running_loop()
+        deleted = await loop.run_in_executor(self._thread_pool,
+                                             self.session_store.delete, session_id)
+        return deleted or removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'live_sessions': len(self._live),
+            'spilled_sessions': len(self.session_store),
+            'created': self.sessions_created,
+            'restored': self.sessions_restored,
+            'spilled': self.sessions_spilled,
+            'requests': self.requests,
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'planning': self.planner.plan_stats(),
+            'tool_cache': self.tool_manager.cache_stats(),
+            'tool_costs': self.cost_model.stats(),
+        }
+
+    def close(self):
+        """
+        살아 있는 세션을 모두 저장소로 내리고 작업 스레드를 정리합니다
+        이벤트 루프 밖에서, 처리 중인 요청이 모두 끝난 뒤 호출합니다.
+        """
+        sessions = list(self._idle.values())
+        self._idle.clear()
+        for session in sessions:
+            del self._live[session.session_id]
+        failed = self._save_sessions(sessions)
+        self.sessions_spilled += len(sessions) - len(failed)
+        self._thread_pool.shutdown(wait=True)
+        self.tool_manager.close()
+
+
+# 사용 예제: 세션 200개의 요청을 한 이벤트 루프에서 동시에 처리
+if __name__ == "__main__":
+    async def main():
+        runtime = AgentRuntime(max_live_sessions=50)
+        requests = ["내일 팀 회의를 준비해줘", "분기 보고서 초안을 작성해줘"]
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(
+            runtime.process_request(f"user-{i}", requests[i % len(requests)])
+            for i in range(200)
+        ))
+        elapsed = time.perf_counter() - start
+        print(f"요청 200개 처리: {elapsed:.2f}초, 첫 응답: {responses[0]}")
+
+        # 내려간 세션에 다시 요청하면 저장소에서 기억을 되살립니다
+        await runtime.process_request("user-0", "회의 참석자에게 알림을 보내줘")
+        memory = await runtime.get_session_memory("user-0")
+        print(f"user-0 단기 기억: {len(memory.short_term_memory)}개")
+        print(runtime.stats())
+        runtime.close()
+
+    asyncio.run(main())
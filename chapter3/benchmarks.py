@@ -0,0 +1,1322 @@
+"""
+3장 에이전트 구성요소 성능 측정 스크립트
+- 실제 LLM 없이 Mock 제공자와 지연을 흉내 낸 도구만으로 실행됩니다.
+
+실행:
+    python chapter3/benchmarks.py        # 모든 시나리오
+    python chapter3/benchmarks.py dag    # 특정 시나리오만
+"""
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict
+
+import numpy as np
+
+_CHAPTER3_DIR = os.path.dirname(os.path.abspath(__file__))
+_REPO_ROOT = os.path.dirname(_CHAPTER3_DIR)
+for _p in (
+    os.path.join(_CHAPTER3_DIR, "agent"),
+    os.path.join(_CHAPTER3_DIR, "core"),
+    os.path.join(_CHAPTER3_DIR, "memory"),
+    os.path.join(_CHAPTER3_DIR, "tools"),
+    os.path.join(_REPO_ROOT, "chapter2"),
+):
+    if _p not in sys.path:
+        sys.path.insert(0, _p)
+
+from base import BaseTool, RetryPolicy, ToolManager, is_cancelled
+from core import Agent
+from executor import Executor
+from fake_ollama_server import FakeOllamaServer
+from plan_cache import PlanCache, PlanLibrary
+from plan_stream import IncrementalStepParser
+from planner import Planner
+from llm_interface import LLM, shared_llm
+from record import MemoryRecord
+from router import ToolRouter
+from runtime import AgentRuntime
+from storage import SQLiteMemoryStore, decode_record
+from system import MemorySystem
+from tracing import Tracer
+from vector_store import HashingEmbedder, InMemoryVectorStore
+
+
+class SleepTool(BaseTool):
+    """지정한 시간만큼 걸리는 도구 (I/O 대기를 흉내 냅니다)"""
+
+    def __init__(self, name: str, delay: float):
+        super().__init__(name=name, description=f"{delay * 1000:.0f}ms 걸리는 작업")
+        self.delay = delay
+
+    def execute(self, input_data: Dict[str, Any]) -> Any:
+        time.sleep(self.delay)
+        return super().execute(input_data)
+
+
+class FlakyTool(BaseTool):
+    """처음 failures번은 실패하고 그 뒤로 성공하는 도구"""
+
+    def __init__(self, name: str, failures: int, retry_policy: RetryPolicy):
+        super().__init__(name=name, description="가끔 실패하는 외부 API",
+                         retry_policy=retry_policy)
+        self.remaining_failures = failures
+
+    def execute(self, input_data: Dict[str, Any]) -> Any:
+        if self.remaining_failures > 0:
+            self.remaining_failures -= 1
+            raise ConnectionError("일시적 오류")
+        return super().execute(input_data)
+
+
+class HangingTool(BaseTool):
+    """응답이 오지 않는 도구 - 취소 신호를 확인하며 기다립니다"""
+
+    def __init__(self, name: str, timeout: float):
+        super().__init__(name=name, description="응답 없는 외부 API", timeout=timeout,
+                         retry_policy=RetryPolicy(max_attempts=2, base_delay=0.05))
+        self.cancelled_calls = 0
+
+    def execute(self, input_data: Dict[str, Any]) -> Any:
+        deadline = time.perf_counter() + 5.0
+        while time.perf_counter() < deadline:
+            if is_cancelled():
+                self.cancelled_calls += 1
+                raise TimeoutError("취소됨")
+            time.sleep(0.01)
+        return super().execute(input_data)
+
+
+class StuckTool(BaseTool):
+    """취소 신호를 확인하지 않는 도구 - 시간 초과 뒤에도 hold초 동안 작업 스레드를 차지합니다"""
+
+    def __init__(self, name: str, timeout: float, hold: float):
+        super().__init__(name=name, description="취소를 모르는 외부 API", timeout=timeout,
+                         retry_policy=RetryPolicy(max_attempts=3, base_delay=0.05))
+        self.hold = hold
+        self.calls = 0
+
+    def execute(self, input_data: Dict[str, Any]) -> Any:
+        self.calls += 1
+        time.sleep(self.hold)
+        return super().execute(input_data)
+
+
+def _quiet():
+    """구성요소의 진행 출력을 숨깁니다"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _tool_manager(*tools: BaseTool) -> ToolManager:
+    with _quiet():
+        manager = ToolManager(llm=shared_llm(provider="mock"))
+        for tool in tools:
+            manager.register_tool(tool)
+    return manager
+
+
+def _wide_plan(width: int) -> Dict:
+    """준비 → width개의 독립 단계 → 취합. 취합 단계는 일부러 목록 맨 앞에 둡니다"""
+    collect = width + 2
+    steps = [{"step_number": collect, "description": "결과 취합", "tool_required": "io",
+              "expected_output": "보고서", "dependencies": list(range(2, width + 2))},
+             {"step_number": 1, "description": "준비", "tool_required": "io",
+              "expected_output": "입력", "dependencies": []}]
+    for num in range(2, width + 2):
+        steps.append({"step_number": num, "description": f"조사 {num - 1}",
+                      "tool_required": "io", "expected_output": "자료",
+                      "dependencies": [1]})
+    return {"steps": steps}
+
+
+def bench_dag(width: int = 8, delay: float = 0.1):
+    """넓은 계획을 순차 실행(max_workers=1)과 병렬 실행했을 때의 전체 시간"""
+    plan = _wide_plan(width)
+    print(f"\n[dag] 준비 → 독립 단계 {width}개 → 취합, 단계당 {delay * 1000:.0f}ms")
+    tool_manager = _tool_manager(SleepTool("io", delay))
+
+    for workers in (1, width):
+        executor = Executor(tool_manager, MemorySystem(), max_workers=workers)
+        with _quiet():
+            start = time.perf_counter()
+            results = executor.execute_plan(plan)
+            elapsed = time.perf_counter() - start
+        critical = executor.critical_path_time(plan)
+        assert len(results) == len(plan["steps"]), "실행되지 않은 단계가 있습니다"
+        print(f"  동시 실행 {workers:>2}: 전체 {elapsed * 1000:6.0f}ms, "
+              f"임계 경로 {critical * 1000:4.0f}ms, 단계 {len(results)}개 완료")
+
+    timings = executor.step_timings
+    first_wave = sorted(timings[num]["start"] for num in range(2, width + 2))
+    print(f"  병렬 실행의 조사 단계 시작 시각: "
+          f"{first_wave[0] * 1000:.0f}~{first_wave[-1] * 1000:.0f}ms")
+
+    # 노트북이나 비동기 서버처럼 이벤트 루프 안에서 부른 동기 execute_plan도 끝까지 실행됩니다
+    async def inside_loop():
+        with _quiet():
+            return executor.execute_plan(plan)
+
+    assert len(asyncio.run(inside_loop())) == len(plan["steps"])
+    print("  이벤트 루프 안에서 부른 execute_plan: 단계 모두 완료")
+
+
+def bench_retry(chain: int = 4, delay: float = 0.1):
+    """
+    한 단계가 재시도 대기 중일 때 다른 단계들이 계속 진행되는지,
+    응답 없는 도구가 제한 시간 뒤 취소되는지 확인
+    """
+    print(f"\n[retry] 두 번 실패하는 단계 1개 + 독립된 {chain}단계 체인 ({delay * 1000:.0f}ms씩)")
+    flaky = FlakyTool("flaky", failures=2,
+                      retry_policy=RetryPolicy(max_attempts=3, base_delay=0.2))
+    hanging = HangingTool("hang", timeout=0.2)
+    tool_manager = _tool_manager(SleepTool("io", delay), flaky, hanging)
+
+    steps = [{"step_number": 1, "description": "불안정한 API 호출", "tool_required": "flaky",
+              "expected_output": "응답", "dependencies": []}]
+    for num in range(2, chain + 2):
+        steps.append({"step_number": num, "description": f"처리 {num - 1}",
+                      "tool_required": "io", "expected_output": "결과",
+                      "dependencies": [num - 1] if num > 2 else []})
+    plan = {"steps": steps}
+
+    executor = Executor(tool_manager, MemorySystem(), max_workers=2)
+    with _quiet():
+        start = time.perf_counter()
+        results = executor.execute_plan(plan)
+        elapsed = time.perf_counter() - start
+    timings = executor.step_timings
+    print(f"  전체 {elapsed * 1000:.0f}ms - 불안정 단계 {timings[1]['attempts']}회 시도, "
+          f"{timings[1]['end'] * 1000:.0f}ms에 완료 / 체인 마지막 단계 "
+          f"{timings[chain + 1]['end'] * 1000:.0f}ms에 완료")
+    assert all(isinstance(r, dict) and r.get('success') for r in results.values())
+
+    plan = {"steps": [{"step_number": 1, "description": "응답 없는 API", "tool_required": "hang",
+                       "expected_output": "응답", "dependencies": []}]}
+    with _quiet():
+        start = time.perf_counter()
+        results = executor.execute_plan(plan)
+        elapsed = time.perf_counter() - start
+    time.sleep(0.05)  # 작업 스레드가 취소 신호를 확인할 시간
+    print(f"  응답 없는 도구 (제한 0.2초, {executor.step_timings[1]['attempts']}회 시도): "
+          f"{elapsed * 1000:.0f}ms 후 실패 처리, "
+          f"취소된 호출 {hanging.cancelled_calls}개 - {results[1]['error']}")
+
+    # 취소 신호를 확인하지 않는 도구는 앞선 호출이 스레드를 놓기 전까지 다시 부르지 않습니다
+    stuck = StuckTool("stuck", timeout=0.1, hold=0.5)
+    with _quiet():
+        tool_manager.register_tool(stuck)
+        results = executor.execute_plan({"steps": [dict(plan["steps"][0], tool_required="stuck")]})
+    held = tool_manager.stuck_calls("stuck")
+    assert results[1]['success'] is False and stuck.calls == 1 and held == 1, (stuck.calls, held)
+    time.sleep(stuck.hold)
+    assert tool_manager.stuck_calls("stuck") == 0
+    print(f"  취소를 모르는 도구 (제한 0.1초, 3회 정책): 호출 {stuck.calls}번 뒤 재시도 안 함, "
+          f"묶인 스레드 {held}개 → 호출이 끝난 뒤 {tool_manager.stuck_calls('stuck')}개")
+
+    # 마지막 시도가 실패하면 백오프 없이 바로 실패 결과를 돌려줍니다
+    broken = FlakyTool("broken", failures=10**9,
+                       retry_policy=RetryPolicy(max_attempts=1, base_delay=5.0, max_delay=5.0))
+    with _quiet():
+        tool_manager.register_tool(broken)
+        start = time.perf_counter()
+        results = executor.execute_plan({"steps": [dict(plan["steps"][0], tool_required="broken")]})
+        elapsed = time.perf_counter() - start
+    assert results[1]['success'] is False and elapsed < 1.0, elapsed
+    try:
+        RetryPolicy(max_attempts=0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("max_attempts=0이 허용되었습니다")
+    print(f"  한 번만 시도하는 정책 (백오프 최대 5초): {elapsed * 1000:.0f}ms 후 실패 처리")
+
+
+_TOPICS = ["배송", "환불", "결제", "회원가입", "쿠폰", "리뷰", "재고", "교환"]
+
+
+def _linear_retrieve(memory: MemorySystem, query: str, k: int = 5):
+    """색인 도입 전의 retrieve - 모든 기억을 문자열로 바꿔 부분 문자열을 찾습니다"""
+    results = [m for m in list(memory.working_memory.values())
+               + list(memory.short_term_memory) + memory.long_term_memory
+               if query.lower() in str(m).lower()]
+    return sorted(results, key=lambda x: x.get('timestamp', datetime.min),
+                  reverse=True)[:k]
+
+
+def bench_memory(sizes=(1000, 10000, 100000), queries: int = 200):
+    """기억이 늘어날 때 retrieve 지연 시간 - 역색인 vs 전체 훑기"""
+    print(f"\n[memory] 장기 기억을 {sizes[-1]:,}개까지 늘리며 retrieve 지연 측정")
+    rng = random.Random(7)
+    memory = MemorySystem(long_term_budget=None)
+    stored = 0
+    for size in sizes:
+        before = stored
+        start = time.perf_counter()
+        with _quiet():
+            while stored < size:
+                topic = _TOPICS[stored % len(_TOPICS)]
+                memory.store({"content": f"고객 c{stored} {topic} 문의를 처리했습니다",
+                              "is_important": True})
+                stored += 1
+        store_us = (time.perf_counter() - start) / (size - before) * 1e6
+
+        indexed = []
+        for _ in range(queries):
+            cid = rng.randrange(size)
+            query = f"c{cid} {_TOPICS[cid % len(_TOPICS)]}"
+            start = time.perf_counter()
+            found = memory.retrieve(query, k=5)
+            indexed.append(time.perf_counter() - start)
+            assert found and f"c{cid} " in found[0]["content"], query
+
+        linear = []
+        for _ in range(3):
+            cid = rng.randrange(size)
+            start = time.perf_counter()
+            _linear_retrieve(memory, f"c{cid} ")
+            linear.append(time.perf_counter() - start)
+
+        print(f"  {size:>7,}개: 역색인 p50 {statistics.median(indexed) * 1e6:6.0f}µs "
+              f"/ p95 {sorted(indexed)[int(len(indexed) * 0.95)] * 1e6:6.0f}µs, "
+              f"전체 훑기 {statistics.median(linear) * 1000:7.1f}ms, "
+              f"저장 {store_us:.0f}µs/개")
+
+    # 단기 기억 deque에서 밀려난 항목은 색인에서도 빠져야 합니다
+    short_only = MemorySystem()
+    for i in range(short_only.short_term_memory.maxlen + 50):
+        short_only.store({"content": f"대화 d{i}"})
+    assert not short_only.retrieve("d0", memory_type='short')
+    assert short_only.retrieve("d149", memory_type='short')
+    assert len(short_only._index) == short_only.short_term_memory.maxlen
+
+
+class _RandomEmbedder:
+    """임베딩 모델 대신 정규화된 난수 벡터를 돌려줍니다 (검색 속도 측정용)"""
+
+    def __init__(self, dim: int, seed: int = 0):
+        self.dim = dim
+        self.rng = np.random.default_rng(seed)
+        self.calls = 0
+
+    def __call__(self, texts):
+        self.calls += 1
+        vectors = self.rng.standard_normal((len(texts), self.dim), dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def bench_vectors(sizes=(10000, 100000, 1000000), dim: int = 128, queries: int = 20):
+    """장기 기억 벡터 저장소의 top-k 검색 지연 (argpartition vs 전체 정렬)"""
+    print(f"\n[vectors] {dim}차원 float32 행렬, 최대 {sizes[-1]:,}개에서 top-5 검색")
+    store = InMemoryVectorStore(embedder=_RandomEmbedder(dim), cache_size=1000)
+    now = time.time()
+    for size in sizes:
+        start = time.perf_counter()
+        for begin in range(len(store), size, 10000):
+            store.add_many([(f"m{i}", f"기억 {i}", {"n": i}, (i % 10) / 10, now - i)
+                            for i in range(begin, min(size, begin + 10000))])
+        fill = time.perf_counter() - start
+
+        latencies = []
+        for q in range(queries):
+            start = time.perf_counter()
+            hits = store.search(f"질문 {q}", k=5)
+            latencies.append(time.perf_counter() - start)
+            assert len(hits) == 5 and hits[0]["score"] >= hits[-1]["score"]
+
+        scores = store._vectors[:size] @ store._embed(["정렬 비교"])[0]
+        start = time.perf_counter()
+        np.argsort(scores)[::-1][:5]
+        full_sort = time.perf_counter() - start
+        start = time.perf_counter()
+        np.argpartition(scores, size - 5)[size - 5:]
+        partition = time.perf_counter() - start
+
+        print(f"  {size:>9,}개: 검색 p50 {statistics.median(latencies) * 1000:6.2f}ms "
+              f"(top-k 선택 argpartition {partition * 1000:5.2f}ms vs 전체 정렬 "
+              f"{full_sort * 1000:6.2f}ms), 행렬 {store.stats()['matrix_bytes'] / 2**20:.0f}MB, "
+              f"적재 {fill:.1f}초")
+
+    # 같은 내용을 다시 저장하면 임베딩을 다시 계산하지 않습니다
+    embedder = HashingEmbedder()
+    calls = []
+    store = InMemoryVectorStore(embedder=lambda texts: calls.append(len(texts)) or embedder(texts))
+    notes = ["고객 c1 배송 지연 문의", "고객 c2 환불 요청 처리", "고객 c3 쿠폰 적용 오류"]
+    for round_ in range(3):
+        for i, text in enumerate(notes):
+            store.add(f"note{round_}-{i}", text, {"content": text}, importance=0.8)
+    best = store.search("환불 요청", k=1)[0]
+    print(f"  같은 기억 3회 저장: 임베딩 {sum(calls) - 1}회 계산 (캐시 적중 {store.cache_hits}회), "
+          f"'환불 요청' → {best['item']['content']}")
+    assert sum(calls) - 1 == len(notes) and "환불" in best["item"]["content"]
+
+    # 장기 기억 검색은 겹치는 내용이 없는 기억을 최근·중요하다는 이유만으로 돌려주지 않습니다
+    memory = MemorySystem()
+    with _quiet():
+        for i in range(3):
+            memory.store(_experience(i))
+    assert len(memory.long_term_memory) == 3
+    unrelated = memory.retrieve("주간 날씨 예보", memory_type='long', k=3)
+    related = memory.retrieve("환불 문의", memory_type='long', k=3)
+    assert not unrelated and related and "환불" in related[0]["request"], related
+    print(f"  장기 기억 3개: 관련 없는 질문 → {len(unrelated)}개, '환불 문의' → {len(related)}개")
+
+
+def _rss_mb() -> float:
+    """현재 프로세스의 상주 메모리 (MB, 리눅스 /proc 기준)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def _cold_start(path: str, size: int, eager: bool) -> Dict[str, float]:
+    """새 프로세스에서 저장소를 열고 시작 시간과 늘어난 상주 메모리를 잽니다"""
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    store = SQLiteMemoryStore(path)
+    if eager:
+        everything = [decode_record(payload) for (payload,) in
+                      store._conn.execute("SELECT payload FROM memories")]
+        assert len(everything) == size
+    result = {"seconds": time.perf_counter() - start, "rss_mb": _rss_mb() - rss_before,
+              "index_mb": store.stats()["index_bytes"] / 2**20}
+    assert len(store) == size
+
+    rng = random.Random(3)
+    latencies = []
+    for _ in range(200):
+        seq = rng.randrange(1, size + 1)
+        t = time.perf_counter()
+        record = store.get(seq)
+        latencies.append(time.perf_counter() - t)
+        assert record["id"] == str(uuid.UUID(int=seq - 1))
+    result["get_us"] = statistics.median(latencies) * 1e6
+
+    cid = size // 2
+    t = time.perf_counter()
+    hits = store.search(f"c{cid} {_TOPICS[cid % len(_TOPICS)]}", k=5)
+    result["search_ms"] = (time.perf_counter() - t) * 1000
+    assert hits and hits[0]["content"].startswith(f"고객 c{cid} ")
+    store.close()
+    return result
+
+
+def bench_persistence(size: int = 1000000, chunk: int = 10000):
+    """
+    SQLite WAL 저장소에 기억 size개를 쓴 뒤, 다시 열 때(cold start)의
+    시간과 메모리를 전체 적재 방식과 비교
+    """
+    print(f"\n[persistence] 장기 기억 {size:,}개 SQLite(WAL) 저장 → 재시작")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "memory.db")
+        store = SQLiteMemoryStore(path)
+        start = time.perf_counter()
+        for begin in range(0, size, chunk):
+            store.append_many([{
+                "content": f"고객 c{i} {_TOPICS[i % len(_TOPICS)]} 문의를 처리했습니다",
+                "id": str(uuid.UUID(int=i)), "timestamp": datetime.now(),
+                "is_important": True,
+            } for i in range(begin, min(size, begin + chunk))], importance=1.0)
+        queued = time.perf_counter() - start
+        store.flush()
+        written = time.perf_counter() - start
+        stats = store.stats()
+        store.close()
+        print(f"  쓰기: 대기열 적재 {queued:.1f}초, 디스크 반영까지 {written:.1f}초 "
+              f"({size / written:,.0f}건/초, 배치 {stats['batches_written']}회), "
+              f"파일 {os.path.getsize(path) / 2**20:.0f}MB")
+
+        # 재시작을 흉내 내기 위해 새 프로세스에서 열어 메모리를 깨끗하게 잽니다
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            lazy = pool.submit(_cold_start, path, size, False).result()
+            eager = pool.submit(_cold_start, path, size, True).result()
+        print(f"  지연 로딩 시작: {lazy['seconds']:.2f}초, 메모리 +{lazy['rss_mb']:.0f}MB "
+              f"(색인 {lazy['index_mb']:.0f}MB), 단건 읽기 p50 {lazy['get_us']:.0f}µs, "
+              f"검색 {lazy['search_ms']:.1f}ms")
+        print(f"  전체 적재 시작: {eager['seconds']:.2f}초, 메모리 +{eager['rss_mb']:.0f}MB")
+
+        # MemorySystem을 다시 만들어도 이전 장기 기억을 찾습니다
+        path = os.path.join(tmp, "agent.db")
+        with _quiet():
+            memory = MemorySystem(storage=SQLiteMemoryStore(path))
+            memory.store({"content": "고객 c42 환불 계좌는 반드시 기억", "is_important": True})
+            memory.close()
+            restarted = MemorySystem(storage=SQLiteMemoryStore(path))
+        found = restarted.retrieve("c42 환불", k=3)
+        restarted.close()
+        assert found and found[0]["content"].startswith("고객 c42")
+        assert isinstance(found[0]["timestamp"], datetime)
+        print(f"  재시작 후 검색: '{found[0]['content']}'")
+
+        # 같은 id를 다시 저장하면 예전 기록은 메모리 색인과 FTS에서도 사라집니다
+        store = SQLiteMemoryStore(os.path.join(tmp, "replace.db"))
+        store.append({"id": "m1", "content": "회의실 A 예약"})
+        store.flush()
+        store.append_many([{"id": "m1", "content": "회의실 B 예약"},
+                           {"id": "m1", "content": "회의실 C 예약"}])
+        store.flush()
+        contents = [record["content"] for record in store.search("예약", k=5)]
+        entries = store.stats()["entries"]
+        store.close()
+        assert entries == 1 and contents == ["회의실 C 예약"], (entries, contents)
+        print(f"  같은 id 세 번 저장: 기록 {entries}개, 검색 결과 {contents}")
+
+
+def _experience(i: int) -> Dict[str, Any]:
+    """Agent.process_request가 저장하는 것과 같은 모양의 경험 (계획·결과 포함)"""
+    topic = _TOPICS[i % len(_TOPICS)]
+    request = f"{topic} 문의 처리해줘"
+    steps = [{"step_number": n, "description": f"{topic} 처리 {n}단계 - 고객 c{i}",
+              "tool_required": "search", "expected_output": "결과 " * 20,
+              "dependencies": [n - 1] if n > 1 else []} for n in range(1, 6)]
+    return {
+        "content": f"요청: {request}",
+        "request": request,
+        "plan": {"steps": steps},
+        "results": {n: {"success": True, "output": f"{topic} 결과 {i}-{n} " * 10}
+                    for n in range(1, 6)},
+        "is_important": True,
+    }
+
+
+def bench_budget(entries: int = 10000, budget_mb: float = 4.0):
+    """오래 실행되는 에이전트의 장기 기억 - 제한 없음 vs 바이트 예산 + 요약"""
+    print(f"\n[budget] 중요 경험 {entries:,}개 저장 (계획·결과 포함), 예산 {budget_mb}MB")
+    for budget in (None, int(budget_mb * 1024 * 1024)):
+        memory = MemorySystem(long_term_budget=budget)
+        vip_id = None
+        tracemalloc.start()
+        with _quiet():
+            for i in range(entries):
+                experience = _experience(i)
+                if i == 10:
+                    experience["content"] += " VIP 고객 계약 조건"
+                record = memory.store(experience)
+                if i == 10:
+                    vip_id = record.id
+                if i > 10 and i % 100 == 0:
+                    memory.retrieve("VIP 계약", k=1)  # 자주 찾는 기억
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        stats = memory.long_term_stats()
+        label = "제한 없음" if budget is None else f"예산 {budget_mb}MB"
+        print(f"  {label:>10}: 장기 기억 {stats['entries']:>6,}개 / 추정 {stats['bytes'] / 2**20:5.1f}MB, "
+              f"실제 할당 {current / 2**20:5.1f}MB (최대 {peak / 2**20:5.1f}MB), "
+              f"내보냄 {stats['evicted']:,} / 요약으로 합침 {stats['compacted']:,}")
+        if budget is not None:
+            assert stats["bytes"] <= budget
+            assert any(m.id == vip_id for m in memory.long_term_memory), "자주 찾는 기억이 지워짐"
+            summaries = [m for m in memory.long_term_memory if m.get("type") == "summary"]
+            print(f"  요약 기록 {len(summaries)}개, 예: {summaries[-1]['content'][:40]}...")
+
+
+def _step_payload(i: int) -> Dict[str, Any]:
+    """Executor가 단계마다 저장하는 것과 같은 모양의 내용"""
+    return {"step": i % 8 + 1, "action": f"조사 {i % 8 + 1}",
+            "result": {"status": "success", "tool": "search", "input": {"query": f"q{i}"}}}
+
+
+def bench_records(count: int = 100000):
+    """기억 한 건의 표현 - 시각·uuid를 덧붙인 딕셔너리 vs 슬롯 MemoryRecord"""
+    print(f"\n[records] 단계 결과 {count:,}건 - 기록당 추가 메모리(내용 제외)와 생성 속도")
+
+    legacy_doc_ids: Dict[str, int] = {}
+
+    def legacy(i):
+        # 이전 MemorySystem은 uuid → 역색인 문서 번호 표도 기록마다 따로 두었습니다
+        information = _step_payload(i)
+        information["timestamp"] = datetime.now()
+        information["id"] = str(uuid.uuid4())
+        legacy_doc_ids[information["id"]] = i
+        return information
+
+    ids = iter(range(1, count + 1))
+
+    def slotted(i):
+        return MemoryRecord(next(ids), time.time(), "step", _step_payload(i))
+
+    def measure(build):
+        tracemalloc.start()
+        kept = [build(i) for i in range(count)]
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del kept
+        return size
+
+    payload_only = measure(_step_payload)
+    overhead = {}
+    for label, build in (("딕셔너리 + datetime + uuid", legacy), ("MemoryRecord", slotted)):
+        ids = iter(range(1, count + 1))
+        size = measure(build)
+        legacy_doc_ids.clear()
+        ids = iter(range(1, count + 1))
+        start = time.perf_counter()
+        for i in range(count):
+            build(i)
+        elapsed = time.perf_counter() - start
+        legacy_doc_ids.clear()
+        overhead[label] = (size - payload_only) / count
+        print(f"  {label:>24}: 기록당 추가 {overhead[label]:5.0f}바이트, "
+              f"생성 {elapsed / count * 1e9:5.0f}ns/건")
+    assert overhead["MemoryRecord"] < overhead["딕셔너리 + datetime + uuid"]
+
+    memory = MemorySystem()
+    start = time.perf_counter()
+    for i in range(count):
+        memory.store(_step_payload(i), kind="step")
+    elapsed = time.perf_counter() - start
+    record = memory.short_term_memory[-1]
+    print(f"  MemorySystem.store (단기 기억 + 역색인): {count / elapsed:,.0f}건/초, "
+          f"record['result']['tool']={record['result']['tool']}, kind={record.kind}")
+
+
+class PlanningLLM:
+    """계획 JSON을 latency초 뒤에 돌려주는 가짜 LLM (호출 수를 셉니다)"""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.calls = 0
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        self.calls += 1
+        time.sleep(self.latency)
+        return self._plan_json()
+
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self._plan_json()
+
+    def _plan_json(self) -> str:
+        return json.dumps({"steps": [
+            {"step_number": 1, "description": "자료 조사", "tool_required": "search",
+             "expected_output": "자료", "dependencies": []},
+            {"step_number": 2, "description": "초안 작성", "tool_required": "search",
+             "expected_output": "초안", "dependencies": [1]},
+        ]}, ensure_ascii=False)
+
+
+def _request_stream(count: int, seed: int = 11):
+    """자주 오는 요청이 반복되고, 문장부호·공백·표현이 조금씩 다른 요청 흐름"""
+    rng = random.Random(seed)
+    topics = ["주간 회의", "분기 실적", "신규 채용", "고객 만족도", "보안 점검", "마케팅 예산"]
+    variants = ["{t} 보고서 작성해줘", "{t} 보고서 작성해줘!", "  {t}   보고서 작성해줘",
+                "{t} 보고서 빨리 작성해줘", "{t} 보고서 작성 부탁해"]
+    for _ in range(count):
+        topic = topics[min(int(rng.expovariate(0.6)), len(topics) - 1)]
+        yield rng.choice(variants).format(t=topic)
+
+
+def bench_planning(count: int = 200, latency: float = 0.05):
+    """계획 캐시와 계획 라이브러리가 줄이는 LLM 호출 수"""
+    print(f"\n[planning] 요청 {count}개 (반복·변형 포함), 계획 LLM 호출 {latency * 1000:.0f}ms")
+    requests = list(_request_stream(count))
+    tools = ["search"]
+    for label in ("캐시 없음", "캐시", "캐시 + 라이브러리"):
+        llm = PlanningLLM(latency)
+        executor = Executor(_tool_manager(SleepTool("search", 0.0)), MemorySystem())
+        planner = Planner(llm=llm, plan_cache=PlanCache(max_size=0 if label == "캐시 없음" else 256))
+        if label.endswith("라이브러리"):
+            planner.plan_library = PlanLibrary(executor.execution_history)
+        planning = 0.0
+        with _quiet():
+            for request in requests:
+                start = time.perf_counter()
+                plan = planner.create_plan(request, tools)
+                planning += time.perf_counter() - start
+                executor.execute_plan(plan)
+        stats = planner.plan_stats()
+        library = stats["library"]
+        print(f"  {label:>12}: LLM 호출 {llm.calls:>3}회, 계획 시간 합계 {planning:5.2f}초, "
+              f"캐시 적중률 {stats['cache']['hit_rate']:.0%}"
+              + (f", 라이브러리 적중률 {library['hit_rate']:.0%}" if library else ""))
+        assert llm.calls == stats["llm_calls"]
+
+    # Agent의 기본 도구 결과({"status": "success", ...})도 성공으로 세므로, 성공한 계획을 배워 재사용합니다
+    with _quiet():
+        agent = Agent(verbose=False)
+        agent.planner.llm = MeetingPlanLLM(latency=0.0)
+        response = agent.process_request("내일 팀 회의를 준비해줘")
+        agent.process_request("내일 팀 회의를 준비해줘 빨리")
+    history = agent.executor.execution_history[0]
+    stats = agent.planner.plan_stats()
+    assert "모든 작업이 성공" in response and history["failure_count"] == 0
+    assert stats["library"]["hits"] == 1 and stats["llm_calls"] == 1
+    print(f"  Agent: 첫 요청 성공 {history['success_count']}/{history['total_steps']}단계, "
+          f"비슷한 두 번째 요청은 계획 라이브러리에서 재사용 (LLM 호출 {stats['llm_calls']}회)")
+
+
+class StreamingPlanLLM:
+    """계획 JSON을 chunk_size글자씩 token_delay초 간격으로 내보내는 가짜 LLM"""
+
+    def __init__(self, plan: Dict, token_delay: float = 0.004, chunk_size: int = 4):
+        self.text = "계획입니다:\n```json\n" + json.dumps(plan, ensure_ascii=False, indent=2) + "\n```"
+        self.token_delay = token_delay
+        self.chunk_size = chunk_size
+
+    def _chunks(self):
+        return [self.text[i:i + self.chunk_size]
+                for i in range(0, len(self.text), self.chunk_size)]
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        time.sleep(self.token_delay * len(self._chunks()))
+        return self.text
+
+    async def agenerate_stream(self, prompt: str, **kwargs):
+        for chunk in self._chunks():
+            await asyncio.sleep(self.token_delay)
+            yield chunk
+
+
+def _diamond_plan() -> Dict:
+    """독립 단계 3개 → 부분 취합 2개 → 최종 보고. 단계 설명은 LLM 출력처럼 길게 둡니다"""
+    deps = {1: [], 2: [], 3: [], 4: [1, 2], 5: [3], 6: [4, 5]}
+    return {"steps": [
+        {"step_number": num,
+         "description": f"{num}단계: 앞 단계 결과를 바탕으로 필요한 자료를 찾아 정리합니다",
+         "tool_required": "io", "expected_output": "정리된 자료 (출처 포함)",
+         "dependencies": dep} for num, dep in deps.items()
+    ], "estimated_time": "1분", "potential_risks": ["자료 부족"]}
+
+
+def bench_streaming(token_delay: float = 0.004, delay: float = 0.2):
+    """계획을 다 받은 뒤 실행 vs 단계가 완성되는 대로 실행 (계획 생성과 실행을 겹침)"""
+    plan = _diamond_plan()
+    llm = StreamingPlanLLM(plan, token_delay=token_delay)
+    tool_manager = _tool_manager(SleepTool("io", delay))
+    generation = token_delay * len(llm._chunks())
+    print(f"\n[streaming] 계획 6단계 (생성 {generation * 1000:.0f}ms), 단계당 {delay * 1000:.0f}ms")
+
+    # 파서가 조각 경계와 관계없이 단계를 모두 꺼내는지 한 글자씩 넣어 확인합니다
+    parser = IncrementalStepParser()
+    emitted = [step for char in llm.text for step in parser.feed(char)]
+    assert emitted == plan["steps"] and parser.done and not parser.errors
+
+    def planner():
+        return Planner(llm=llm, plan_cache=PlanCache(max_size=0))
+
+    executor = Executor(tool_manager, MemorySystem(), max_workers=4)
+    with _quiet():
+        start = time.perf_counter()
+        full = planner().create_plan("보고서 작성", ["io"])
+        results = executor.execute_plan(full)
+        sequential = time.perf_counter() - start
+    assert len(results) == 6
+    print(f"  계획 후 실행: 전체 {sequential * 1000:5.0f}ms")
+
+    async def overlapped():
+        streaming_planner = planner()
+        steps = streaming_planner.astream_plan("보고서 작성", ["io"])
+        start = time.perf_counter()
+        results = await executor.aexecute_stream(steps, request="보고서 작성")
+        return time.perf_counter() - start, results, streaming_planner.last_plan
+
+    with _quiet():
+        elapsed, results, last_plan = asyncio.run(overlapped())
+    assert len(results) == 6 and last_plan["steps"] == plan["steps"]
+    first_start = min(timing["start"] for timing in executor.step_timings.values())
+    print(f"  스트리밍 실행: 전체 {elapsed * 1000:5.0f}ms "
+          f"(첫 단계 시작 {first_start * 1000:.0f}ms, 생성 완료 전), "
+          f"{(1 - elapsed / sequential):.0%} 단축")
+    assert first_start < generation and elapsed < sequential
+
+
+_TOOL_CATALOG = [
+    ("weather", "지역의 현재 날씨와 일기 예보를 조회합니다", "날씨 예보"),
+    ("calendar", "일정을 조회하고 회의 시간을 예약합니다", "회의 일정"),
+    ("email", "이메일을 작성해 보냅니다", "이메일 발송"),
+    ("translate", "문서를 다른 언어로 번역합니다", "번역"),
+    ("stock", "주식 시세와 종목 정보를 조회합니다", "주식 시세"),
+    ("exchange", "환율을 조회하고 통화를 환산합니다", "환율 환산"),
+    ("map", "두 장소 사이의 길찾기 경로를 안내합니다", "길찾기 경로"),
+    ("flight", "항공권을 검색하고 예약합니다", "항공권 예약"),
+    ("hotel", "숙소를 검색하고 객실을 예약합니다", "숙소 객실"),
+    ("news", "최신 뉴스 기사를 검색합니다", "뉴스 기사"),
+    ("crm", "고객 정보와 상담 이력을 조회합니다", "고객 상담"),
+    ("invoice", "청구서와 세금계산서를 발행합니다", "청구서 발행"),
+    ("payroll", "직원 급여를 계산하고 명세서를 만듭니다", "급여 명세서"),
+    ("inventory", "창고 재고 수량을 확인합니다", "재고 수량"),
+    ("shipping", "택배 배송 상태를 추적합니다", "배송 추적"),
+    ("summarize", "긴 문서를 요약합니다", "문서 요약"),
+    ("chart", "데이터로 차트와 그래프를 그립니다", "차트 그래프"),
+    ("sql", "데이터베이스에 SQL 쿼리를 실행합니다", "쿼리 실행"),
+    ("slack", "슬랙 채널에 메시지를 보냅니다", "슬랙 메시지"),
+    ("drive", "클라우드 드라이브에 파일을 업로드합니다", "파일 업로드"),
+    ("ocr", "이미지 속 글자를 인식해 텍스트로 추출합니다", "글자 인식"),
+    ("calculator", "수식을 계산합니다", "수식 계산"),
+    ("recipe", "요리 레시피를 찾아 줍니다", "요리 레시피"),
+    ("contract", "계약서 조항을 검토합니다", "계약서 조항"),
+]
+
+
+class SelectionLLM:
+    """정답 도구를 아는 가짜 LLM - 호출마다 latency초 + 프롬프트 글자당 per_char초가 걸립니다"""
+
+    def __init__(self, answers: Dict[str, str], latency: float = 0.02, per_char: float = 2e-5):
+        self.answers = answers
+        self.latency = latency
+        self.per_char = per_char
+        self.calls = 0
+        self.prompt_chars = 0
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        self.calls += 1
+        self.prompt_chars += len(prompt)
+        time.sleep(self.latency + self.per_char * len(prompt))
+        task = prompt.split("작업:", 1)[1].split("\n", 1)[0].strip()
+        return self.answers.get(task, "")
+
+
+def _routing_tasks(count: int, seed: int = 5):
+    """(작업 설명, 정답 도구) - 도구 키워드에 요청 표현을 붙이고 자주 쓰는 작업은 반복됩니다"""
+    rng = random.Random(seed)
+    templates = ["{k} 해줘", "{k} 좀 부탁해", "오늘 {k} 필요해", "{k} 처리", "급하게 {k} 해 주세요"]
+    for _ in range(count):
+        name, _, keywords = _TOOL_CATALOG[min(int(rng.expovariate(0.15)), len(_TOOL_CATALOG) - 1)]
+        yield rng.choice(templates).format(k=keywords), name
+
+
+def bench_routing(count: int = 300):
+    """도구 선택 - 매번 전체 목록으로 LLM 호출 vs 임베딩 라우터 (애매할 때만 LLM)"""
+    tasks = list(_routing_tasks(count))
+    answers = dict(tasks)
+    print(f"\n[routing] 도구 {len(_TOOL_CATALOG)}개, 작업 {count}개 (반복 포함)")
+    for label in ("LLM 매번", "라우터"):
+        llm = SelectionLLM(answers)
+        if label == "LLM 매번":
+            # 라우터 도입 전과 같이 캐시 없이 매번 전체 도구 목록으로 묻습니다
+            router = ToolRouter(min_score=float("inf"), candidates=len(_TOOL_CATALOG),
+                                cache_size=0)
+        else:
+            router = ToolRouter()
+        with _quiet():
+            manager = ToolManager(llm=llm, router=router)
+            for name, description, _ in _TOOL_CATALOG:
+                manager.register_tool(BaseTool(name=name, description=description))
+            start = time.perf_counter()
+            correct = sum(manager.select_best_tool(task).name == answer
+                          for task, answer in tasks)
+            elapsed = time.perf_counter() - start
+        stats = router.stats()
+        print(f"  {label:>6}: LLM 호출 {llm.calls:>3}회 (프롬프트 평균 "
+              f"{llm.prompt_chars / max(llm.calls, 1):4.0f}자), 전체 {elapsed:5.2f}초, "
+              f"정확도 {correct / count:.0%}, 캐시 적중 {stats['cache_hits']}회")
+        assert correct / count >= 0.95, "도구 선택 정확도가 낮습니다"
+
+
+class AsyncSleepTool(BaseTool):
+    """비동기 I/O 도구 - 기다리는 동안 스레드를 차지하지 않습니다 (동시 실행 수를 기록합니다)"""
+
+    def __init__(self, name: str, delay: float, max_concurrency: int = None):
+        super().__init__(name=name, description=f"{delay * 1000:.0f}ms 걸리는 비동기 API",
+                         max_concurrency=max_concurrency)
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+
+    async def aexecute(self, input_data: Dict[str, Any]) -> Any:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return {"success": True, "tool": self.name, "data": "응답"}
+
+
+class HashTool(BaseTool):
+    """CPU만 쓰는 도구 - 해시를 rounds번 반복합니다"""
+
+    def __init__(self, name: str, rounds: int, cpu_bound: bool = False):
+        super().__init__(name=name, description="CPU 작업", cpu_bound=cpu_bound)
+        self.rounds = rounds
+
+    def execute(self, input_data: Dict[str, Any]) -> Any:
+        digest = str(input_data.get("seed", "")).encode()
+        for _ in range(self.rounds):
+            digest = hashlib.sha256(digest).digest()
+        return {"success": True, "tool": self.name, "data": digest.hex()[:16]}
+
+
+def bench_tools(io_calls: int = 40, cpu_calls: int = 4, delay: float = 0.1,
+                rounds: int = 150000, limit: int = 10):
+    """
+    I/O 도구와 CPU 도구가 섞인 작업 - 모두 동기 도구를 스레드 4개로 실행 vs
+    비동기 I/O 도구(이벤트 루프, 동시 limit개 제한) + CPU 도구(프로세스 풀)
+    """
+    print(f"\n[tools] I/O 호출 {io_calls}개 ({delay * 1000:.0f}ms) + CPU 호출 {cpu_calls}개, "
+          f"CPU {os.cpu_count()}개")
+
+    async def run(manager: ToolManager, thread_pool):
+        # 이벤트 루프가 얼마나 늦게 깨어나는지(지연)를 10ms 간격 심장박동으로 잽니다
+        lags = []
+
+        async def heartbeat():
+            while True:
+                tick = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lags.append(time.perf_counter() - tick - 0.01)
+
+        beat = asyncio.create_task(heartbeat())
+        start = time.perf_counter()
+        calls = [manager.aexecute_tool("io", {"n": i}, thread_pool=thread_pool)
+                 for i in range(io_calls)]
+        calls += [manager.aexecute_tool("cpu", {"seed": i}, thread_pool=thread_pool)
+                  for i in range(cpu_calls)]
+        results = await asyncio.gather(*calls)
+        elapsed = time.perf_counter() - start
+        beat.cancel()
+        assert all(result["success"] for result in results)
+        return elapsed, max(lags, default=0.0)
+
+    for label in ("동기 + 스레드 4개", "비동기 + 프로세스 풀"):
+        with _quiet():
+            if label.startswith("동기"):
+                io_tool = SleepTool("io", delay)
+                manager = _tool_manager(io_tool, HashTool("cpu", rounds))
+            else:
+                io_tool = AsyncSleepTool("io", delay, max_concurrency=limit)
+                manager = _tool_manager(io_tool, HashTool("cpu", rounds, cpu_bound=True))
+                # 작업 프로세스 시작 비용은 측정에서 뺍니다
+                asyncio.run(manager.aexecute_tool("cpu", {"seed": "warm"}))
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            elapsed, lag = asyncio.run(run(manager, pool))
+        if manager.get_tool("cpu").cpu_bound:
+            # 피클할 수 없는 입력은 호출마다 미리 확인하지 않고, 풀에서 실패했을 때 알려 줍니다
+            try:
+                asyncio.run(manager.aexecute_tool("cpu", {"seed": lambda: None}))
+            except TypeError as e:
+                assert "피클" in str(e), e
+            else:
+                raise AssertionError("피클할 수 없는 입력이 프로세스로 전달되었습니다")
+        manager.close()
+        peak = f", I/O 최대 동시 {io_tool.peak}개" if isinstance(io_tool, AsyncSleepTool) else ""
+        print(f"  {label:>14}: 전체 {elapsed * 1000:5.0f}ms, "
+              f"이벤트 루프 최대 지연 {lag * 1000:4.0f}ms{peak}")
+        if isinstance(io_tool, AsyncSleepTool):
+            assert io_tool.peak == limit
+
+
+class LookupTool(BaseTool):
+    """delay초 걸리는 조회 도구 (실제로 실행된 횟수를 셉니다)"""
+
+    def __init__(self, name: str, delay: float, **cache_options):
+        super().__init__(name=name, description="참석자 정보를 조회합니다", **cache_options)
+        self.delay = delay
+        self.calls = 0
+
+    def execute(self, input_data: Dict[str, Any]) -> Any:
+        self.calls += 1
+        time.sleep(self.delay)
+        return {"success": True, "tool": self.name,
+                "data": f"{input_data.get('description')} 결과 ({self.calls})"}
+
+
+class AsyncLookupTool(BaseTool):
+    """aexecute만 구현한 조회 도구 - 동시에 실행된 최대 호출 수를 기록합니다"""
+
+    def __init__(self, name: str, delay: float, **options):
+        super().__init__(name=name, description="참석자 정보를 조회합니다", **options)
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+
+    async def aexecute(self, input_data: Dict[str, Any]) -> Any:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return {"success": True, "tool": self.name, "data": input_data.get("description")}
+
+
+def _lookup_plan(lookups: int) -> Dict:
+    """조회 lookups개 → 정리 1개"""
+    steps = [{"step_number": n, "description": f"참석자 {n} 조회", "tool_required": "database",
+              "expected_output": "참석자 정보", "dependencies": []}
+             for n in range(1, lookups + 1)]
+    steps.append({"step_number": lookups + 1, "description": "참석자 명단 정리",
+                  "tool_required": "database", "expected_output": "명단",
+                  "dependencies": list(range(1, lookups + 1))})
+    return {"steps": steps}
+
+
+def bench_tool_cache(runs: int = 20, lookups: int = 3, delay: float = 0.05):
+    """같은 조회가 반복되는 계획 - 캐시 없음 vs 결과 캐시 vs 짧은 TTL + stale-while-revalidate"""
+    plan = _lookup_plan(lookups)
+    print(f"\n[toolcache] 같은 계획 {runs}회 실행 (조회 {lookups}개 + 정리, 조회당 {delay * 1000:.0f}ms)")
+    key = lambda data: data.get("description")
+    options = {
+        "캐시 없음": {},
+        "캐시 (TTL 300초)": {"cacheable": True, "cache_ttl": 300, "cache_key": key},
+        "TTL 0초 + 갱신": {"cacheable": True, "cache_ttl": 0, "stale_ttl": 300, "cache_key": key},
+    }
+    for label, cache_options in options.items():
+        tool = LookupTool("database", delay, **cache_options)
+        manager = _tool_manager(tool)
+        executor = Executor(manager, MemorySystem(), max_workers=4)
+        latencies = []
+        with _quiet():
+            for _ in range(runs):
+                start = time.perf_counter()
+                results = executor.execute_plan(plan)
+                latencies.append(time.perf_counter() - start)
+                assert len(results) == lookups + 1
+        manager.close()  # 갱신 스레드가 끝날 때까지 기다립니다
+        stats = manager.cache_stats()["tools"].get("database", {})
+        print(f"  {label:>14}: 계획당 중앙값 {statistics.median(latencies) * 1000:5.1f}ms, "
+              f"도구 실행 {tool.calls:>3}회, 적중 {stats.get('hits', 0):>3}회, "
+              f"오래된 결과 {stats.get('stale_hits', 0):>3}회 (뒤에서 갱신 {stats.get('refreshes', 0)}회)")
+        if cache_options:
+            assert statistics.median(latencies) < delay
+
+    # 뒤에서 하는 갱신도 일반 호출과 같은 경로를 타므로 max_concurrency를 넘지 않습니다
+    tool = AsyncLookupTool("database", delay, max_concurrency=1, cacheable=True,
+                           cache_ttl=0, stale_ttl=300, cache_key=key)
+    manager = _tool_manager(tool)
+    executor = Executor(manager, MemorySystem(), max_workers=4)
+    with _quiet():
+        executor.execute_plan(plan)
+        executor.execute_plan(plan)   # 모두 오래된 결과 → 갱신 스레드 2개가 동시에 갱신
+    manager.close()
+    refreshes = manager.cache_stats()["tools"]["database"].get("refreshes", 0)
+    assert refreshes >= 2 and tool.peak == 1, (refreshes, tool.peak)
+    print(f"  비동기 도구 (max_concurrency=1): 갱신 {refreshes}회, 최대 동시 실행 {tool.peak}개")
+
+    # Agent의 기본 조회 도구는 입력 전체가 키이므로, 설명이 같아도 선행 단계 결과가 다르면
+    # 예전 결과를 돌려주지 않습니다
+    with _quiet():
+        agent = Agent(verbose=False)
+        first = {"description": "참석자 조회", "step_number": 2,
+                 "dependency_results": {1: {"data": "A팀"}}}
+        second = dict(first, step_number=3, dependency_results={1: {"data": "B팀"}})
+        agent.tool_manager.execute_tool("database", first)
+        result = agent.tool_manager.execute_tool("database", second)
+        again = agent.tool_manager.execute_tool("database", second)
+    assert result["input"] == second and again == result
+    print("  Agent 기본 database 도구: 선행 결과가 다른 같은 설명의 단계는 캐시를 함께 쓰지 않습니다")
+
+
+class MeetingPlanLLM(PlanningLLM):
+    """Agent의 기본 도구(database, calendar, email)를 쓰는 3단계 계획을 돌려주는 가짜 LLM"""
+
+    def _plan_json(self) -> str:
+        return json.dumps({"steps": [
+            {"step_number": 1, "description": "참석자 조회", "tool_required": "database",
+             "expected_output": "참석자", "dependencies": []},
+            {"step_number": 2, "description": "회의실 예약", "tool_required": "calendar",
+             "expected_output": "예약", "dependencies": [1]},
+            {"step_number": 3, "description": "초대 메일 발송", "tool_required": "email",
+             "expected_output": "발송", "dependencies": [1, 2]},
+        ]}, ensure_ascii=False)
+
+
+def bench_tracing(count: int = 300):
+    """Agent.process_request 처리량 - 진행 출력과 추적의 비용, 단계별 시간 분포"""
+    print(f"\n[tracing] process_request {count}회 (계획은 캐시됨, 출력은 os.devnull로)")
+    configs = [("출력 + 추적", True, True), ("출력 끔 + 추적", False, True),
+               ("출력 끔, 추적 끔", False, False)]
+    for label, verbose, traced in configs:
+        with _quiet():
+            agent = Agent(verbose=verbose, tracer=Tracer(capacity=count, enabled=traced))
+            agent.planner.llm = MeetingPlanLLM(latency=0.0)
+        with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+            start = time.perf_counter()
+            for i in range(count):
+                agent.process_request(f"내일 팀 회의를 준비해줘 ({i % 5})")
+            elapsed = time.perf_counter() - start
+        print(f"  {label:>12}: 요청당 {elapsed / count * 1000:6.2f}ms ({count / elapsed:5.0f}건/초)")
+
+        if traced and not verbose:
+            traces = agent.tracer.traces()
+            assert len(traces) == count
+            totals: Dict[str, float] = {}
+            for trace in traces:
+                for span in trace["spans"]:
+                    if span["category"] in ("stage", "step"):
+                        name = span["name"] if span["category"] == "stage" else "  (단계 실행)"
+                        totals[name] = totals.get(name, 0.0) + span["duration"]
+            breakdown = ", ".join(f"{name.strip()} {total / count * 1000:.2f}ms"
+                                  for name, total in totals.items())
+            print(f"    구간별 평균: {breakdown}")
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "trace.json")
+                agent.tracer.export_chrome_trace(path, traces=traces[-10:])
+                with open(path, encoding="utf-8") as f:
+                    events = json.load(f)["traceEvents"]
+            assert all(event["ph"] in ("X", "M") for event in events)
+            print(f"    Chrome trace 내보내기: 요청 10개, 이벤트 {len(events)}개")
+
+    # 이벤트 루프 안에서 부른 동기 process_request도 응답을 돌려줍니다
+    async def inside_loop():
+        with _quiet():
+            return agent.process_request("내일 팀 회의를 준비해줘 (0)")
+
+    assert isinstance(asyncio.run(inside_loop()), str)
+    print("  이벤트 루프 안에서 부른 process_request: 응답 완료")
+
+    # 동기 process_request는 요청마다 새 이벤트 루프를 만들지 않으므로 비동기 커넥션 풀을 재사용합니다
+    with FakeOllamaServer() as server, _quiet():
+        agent = Agent(verbose=False)
+        agent.planner.llm = LLM(provider="ollama", base_url=server.base_url)
+        agent.planner.plan_cache.max_size = 0
+        agent.planner.plan_library = None
+        server.reset_stats()
+        for i in range(5):
+            agent.process_request(f"요청 {i}번을 처리해줘")
+        connections, calls = server.connection_count, server.request_count
+    assert calls == 5 and connections == 1
+    print(f"  Ollama 대역 서버에 동기 process_request {calls}회: TCP 연결 {connections}개")
+
+
+def bench_sessions(users: int = 2000, baseline_users: int = 100, latency: float = 0.02,
+                   max_live: int = 500):
+    """사용자마다 Agent를 만드는 방식과 AgentRuntime(공유 구성요소 + 세션별 기억) 비교"""
+    print(f"\n[sessions] 사용자별 요청 1건, 계획 LLM 지연 {latency * 1000:.0f}ms "
+          f"(메모리는 tracemalloc으로 따로 측정)")
+    llm = MeetingPlanLLM(latency=latency)
+
+    def request(i: int) -> str:
+        return f"{i}번 사용자의 내일 팀 회의를 준비해줘"
+
+    def per_user_agents(count: int) -> list:
+        agents = []
+        with _quiet():
+            for i in range(count):
+                agent = Agent(verbose=False)
+                agent.planner.llm = llm
+                agent.process_request(request(i))
+                agents.append(agent)
+        return agents
+
+    def new_runtime() -> AgentRuntime:
+        with _quiet():
+            runtime = AgentRuntime(max_live_sessions=max_live)
+        runtime.planner.llm = llm
+        return runtime
+
+    async def serve(runtime: AgentRuntime, count: int, offset: int = 0):
+        return await asyncio.gather(*(
+            runtime.process_request(f"user-{i}", request(i + offset)) for i in range(count)
+        ))
+
+    def traced_bytes(run) -> int:
+        tracemalloc.start()
+        kept = run()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del kept
+        return size
+
+    start = time.perf_counter()
+    per_user_agents(baseline_users)
+    elapsed = time.perf_counter() - start
+    per_agent = traced_bytes(lambda: per_user_agents(20)) / 20
+    print(f"  사용자별 Agent ({baseline_users}명, 순차): {baseline_users / elapsed:6.0f}건/초, "
+          f"사용자당 메모리 {per_agent / 1024:6.1f}KB (ToolManager·계획 캐시도 사용자마다)")
+
+    def runtime_memory():
+        runtime = new_runtime()
+        asyncio.run(serve(runtime, max_live))
+        return runtime
+    per_session = traced_bytes(runtime_memory) / max_live
+
+    runtime = new_runtime()
+    start = time.perf_counter()
+    responses = asyncio.run(serve(runtime, users))
+    elapsed = time.perf_counter() - start
+    assert len(responses) == users and runtime.stats()["live_sessions"] == max_live
+    print(f"  AgentRuntime ({users}세션, 동시): {users / elapsed:6.0f}건/초, "
+          f"세션당 메모리 {per_session / 1024:6.1f}KB, 동시 처리 최대 {runtime.peak_in_flight}건")
+
+    # 두 번째 요청: 내려간 세션은 저장소에서 기억을 되살려 처리합니다
+    start = time.perf_counter()
+    asyncio.run(serve(runtime, users, offset=users))
+    elapsed = time.perf_counter() - start
+    stats = runtime.stats()
+    memory = asyncio.run(runtime.get_session_memory("user-0"))
+    assert memory.retrieve(request(0), memory_type="short", k=1)
+    assert stats["restored"] >= users - max_live and stats["live_sessions"] == max_live
+    store = runtime.session_store.stats()
+    print(f"  두 번째 요청: {users / elapsed:6.0f}건/초, 살아 있는 세션 {stats['live_sessions']}개, "
+          f"복원 {stats['restored']}회, 내림 {stats['spilled']}회 "
+          f"(세션당 {store['bytes_written'] / store['saves']:,.0f}바이트)")
+    runtime.close()
+
+    # 세션 저장소는 내린 상태를 그대로 돌려줍니다 (단계 결과의 정수 키, datetime 포함)
+    state = memory.export_state()
+    assert any(isinstance(key, int) for data in state["records"] for key in data.get("results", {}))
+    runtime.session_store.save("roundtrip", state)
+    assert runtime.session_store.load("roundtrip") == state
+    print("  세션 저장소: 내린 상태와 읽은 상태가 같음 (정수 키·datetime 유지)")
+
+    # 도구 결과 캐시는 세션별로 나뉩니다: 같은 요청이라도 다른 세션의 결과를 돌려받지 않습니다
+    runtime = new_runtime()
+
+    async def same_request(*session_ids):
+        return await asyncio.gather(*(runtime.process_request(sid, request(0))
+                                      for sid in session_ids))
+    asyncio.run(same_request("alice", "bob"))
+    shared = runtime.tool_manager.cache_stats()["tools"]["database"]["hits"]
+    asyncio.run(same_request("alice"))
+    own = runtime.tool_manager.cache_stats()["tools"]["database"]["hits"] - shared
+    assert shared == 0 and own > 0
+    print(f"  도구 결과 캐시: 다른 세션 간 적중 {shared}회, 같은 세션의 반복 요청 적중 {own}회")
+    runtime.close()
+
+    # 세션 기억을 보고 만든 계획은 그 세션만 재사용하고, 기억 없이 만든 계획은 나눠 씁니다
+    runtime = new_runtime()
+
+    def planned(session_id: str, text: str) -> int:
+        before = runtime.planner.llm_calls
+        asyncio.run(runtime.process_request(session_id, text))
+        return runtime.planner.llm_calls - before
+
+    private = "내일 팀 회의 자료를 정리해줘"
+    planned("alice", request(0))                  # alice에게 기억이 생깁니다
+    assert planned("alice", private) == 1         # 기억을 보고 만든 계획 -> alice 범위
+    assert planned("bob", private) == 1           # alice의 계획을 받지 않습니다 (bob은 기억 없음 -> 공유)
+    assert planned("carol", private) == 0         # bob의 공유 계획은 재사용합니다
+    assert planned("alice", private) == 0
+    print("  계획 캐시: 세션 기억으로 만든 계획은 그 세션에서만, 기억 없이 만든 계획은 모든 세션에서 재사용")
+    runtime.close()
+
+
+class UnreliableTool(BaseTool):
+    """delay초 걸리고 failure_rate 확률로 실패하는 도구 (재시도 1회)"""
+
+    def __init__(self, name: str, delay: float, failure_rate: float, seed: int):
+        super().__init__(name=name, description=f"{delay * 1000:.0f}ms, 실패율 {failure_rate:.0%}",
+                         retry_policy=RetryPolicy(max_attempts=2, base_delay=0.02))
+        self.delay = delay
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+
+    def execute(self, input_data: Dict[str, Any]) -> Any:
+        time.sleep(self.delay)
+        if self.rng.random() < self.failure_rate:
+            raise ConnectionError("일시적 오류")
+        return super().execute(input_data)
+
+
+class CandidatePlanLLM:
+    """
+    낮은 온도에서는 불안정한 미러(mirror)로, 높은 온도에서는 느리지만 안정적인
+    원본(archive)으로 자료를 받는 계획을 돌려주는 가짜 LLM
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt: str, temperature: float = 0.3, **kwargs) -> str:
+        self.calls += 1
+        source = "mirror" if temperature <= 0.3 else "archive"
+        return json.dumps({"steps": [
+            {"step_number": 1, "description": "자료 받기", "tool_required": source,
+             "expected_output": "자료", "dependencies": []},
+            {"step_number": 2, "description": "색인 조회", "tool_required": "lookup",
+             "expected_output": "색인", "dependencies": []},
+            {"step_number": 3, "description": "요약", "tool_required": "summarize",
+             "expected_output": "요약", "dependencies": [1, 2]},
+        ]}, ensure_ascii=False)
+
+
+def bench_cost_model(requests: int = 40):
+    """
+    실행 이력의 소요 시간·실패율로 계획을 고를 때와 첫 계획을 계속 쓸 때 비교
+    (미러: 60ms, 원본: 120ms·실패율 0%, 실패한 요청은 성공할 때까지 다시 실행)
+    - 후보 2개: 미러 실패율 60%. 처음 고른 계획과 함께 보관한 후보를 최신 관측값으로 다시 비교합니다.
+    - 미러 장애: 실패율 90%. 캐시된 계획의 성공 확률이 떨어지면 새 계획을 만들어 비교합니다.
+    """
+    print(f"\n[costmodel] 같은 요청 {requests}개, 실패한 계획은 성공할 때까지 다시 실행")
+
+    def tools(mirror_failure: float):
+        return [UnreliableTool("mirror", 0.06, mirror_failure, seed=3),
+                UnreliableTool("archive", 0.12, 0.0, seed=4),
+                SleepTool("lookup", 0.03), SleepTool("summarize", 0.03)]
+
+    def succeeded(results: Dict) -> bool:
+        return all(isinstance(r, dict) and r.get("success") for r in results.values())
+
+    configs = [("첫 계획 고정", 0.6, False, 1), ("비용 모델 + 후보 2개", 0.6, True, 2),
+               ("장애, 첫 계획 고정", 0.9, False, 1), ("장애, 비용 모델", 0.9, True, 1)]
+    for label, mirror_failure, use_costs, candidates in configs:
+        manager = _tool_manager(*tools(mirror_failure))
+        executor = Executor(manager, MemorySystem(), max_workers=4)
+        planner = Planner(llm=CandidatePlanLLM(),
+                          cost_model=executor.cost_model if use_costs else None)
+        errors, within_p90, runs, plans = [], 0, 0, {}
+        start = time.perf_counter()
+        with _quiet():
+            for _ in range(requests):
+                while True:
+                    plan = planner.create_plan("보고서 자료를 모아 요약해줘", manager.list_tools(),
+                                               candidates=candidates)
+                    run_start = time.perf_counter()
+                    results = executor.execute_plan(plan)
+                    wall = time.perf_counter() - run_start
+                    runs += 1
+                    source = plan["steps"][0]["tool_required"]
+                    plans[source] = plans.get(source, 0) + 1
+                    estimate = plan.get("estimate")
+                    if estimate and not estimate["unobserved_tools"]:
+                        errors.append(abs(estimate["critical_path_seconds"] - wall) / wall)
+                        within_p90 += wall <= estimate["p90_seconds"]
+                    if succeeded(results):
+                        break
+        elapsed = time.perf_counter() - start
+        manager.close()
+        used = ", ".join(f"{name} {count}회" for name, count in sorted(plans.items()))
+        print(f"  {label:>14}: 요청당 {elapsed / requests * 1000:5.0f}ms, 실행 {runs:>3}회 "
+              f"(사용한 계획: {used}), LLM 호출 {planner.llm.calls}회")
+        if errors:
+            print(f"    추정 오차(임계 경로 평균 vs 실제) {statistics.median(errors):.0%}, "
+                  f"p90 추정 이내로 끝난 실행 {within_p90 / len(errors):.0%}")
+            assert plans.get("archive", 0) > plans.get("mirror", 0)
+            stats = executor.cost_model.stats()
+            print(f"    관측 실패율: mirror {stats['mirror']['failure_rate']:.0%}, "
+                  f"archive {stats['archive']['failure_rate']:.0%}")
+
+
+SCENARIOS = {
+    "dag": bench_dag,
+    "retry": bench_retry,
+    "memory": bench_memory,
+    "vectors": bench_vectors,
+    "persistence": bench_persistence,
+    "budget": bench_budget,
+    "records": bench_records,
+    "planning": bench_planning,
+    "streaming": bench_streaming,
+    "routing": bench_routing,
+    "tools": bench_tools,
+    "toolcache": bench_tool_cache,
+    "tracing": bench_tracing,
+    "sessions": bench_sessions,
+    "costmodel": bench_cost_model,
+}
+
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(SCENARIOS)
+    for name in selected:
+        SCENARIOS[name]()
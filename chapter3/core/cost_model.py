@@ -0,0 +1,194 @@
+"""
+실행 이력 기반 비용 모델
+Executor가 단계를 끝낼 때마다 도구별(단계에 step_type이 있으면 도구 + 종류별) 소요 시간과
+실패 여부를 지수 이동 평균으로 갱신합니다. Planner는 이 값으로 계획의 임계 경로 시간과
+성공 확률을 추정하고, 계획 후보가 여럿이면 성공까지의 기대 시간이 짧은 계획을 고릅니다.
+"""
+import math
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 관측값이 없는 도구의 사전 추정값
+DEFAULT_LATENCY = 1.0
+DEFAULT_FAILURE_RATE = 0.05
+P90_Z = 1.2816   # 정규분포 90백분위수
+
+
+def step_key(step: Dict) -> Tuple[str, Optional[str]]:
+    """(도구 이름, 단계 종류) - 종류는 계획에 step_type이 있을 때만 씁니다"""
+    return step.get('tool_required'), step.get('step_type')
+
+
+def critical_path(steps: List[Dict], durations: Dict[Any, float]) -> Tuple[float, List[Any]]:
+    """
+    의존성 그래프에서 가장 오래 걸리는 경로 (길이, 단계 번호 목록)
+    durations에 없는 단계는 0초로 보고, 순환 의존이나 없는 단계에 의존하는 단계는 건너뜁니다.
+    """
+    by_number = {step['step_number']: step for step in steps}
+    indegree = {num: 0 for num in by_number}
+    children: Dict[Any, List[Any]] = {num: [] for num in by_number}
+    for num, step in by_number.items():
+        for dep in set(step.get('dependencies', [])):
+            indegree[num] += 1
+            if dep in children:
+                children[dep].append(num)
+
+    finish: Dict[Any, float] = {}
+    previous: Dict[Any, Any] = {}
+    ready = [num for num in by_number if indegree[num] == 0]
+    while ready:
+        num = ready.pop(0)
+        deps = [dep for dep in by_number[num].get('dependencies', []) if dep in finish]
+        start = 0.0
+        if deps:
+            slowest = max(deps, key=finish.get)
+            start = finish[slowest]
+            previous[num] = slowest
+        finish[num] = start + durations.get(num, 0.0)
+        for child in children[num]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                ready.append(child)
+
+    if not finish:
+        return 0.0, []
+    last = max(finish, key=finish.get)
+    path = [last]
+    while path[-1] in previous:
+        path.append(previous[path[-1]])
+    return finish[last], path[::-1]
+
+
+class RollingStat:
+    """지수 이동 평균으로 관리하는 소요 시간(평균·분산)과 실패율"""
+
+    __slots__ = ("count", "mean", "variance", "failure_rate")
+
+    def __init__(self, failure_rate: float = DEFAULT_FAILURE_RATE):
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+        self.failure_rate = failure_rate
+
+    def update(self, duration: float, failed: bool, alpha: float):
+        if self.count == 0:
+            self.mean = duration
+        else:
+            delta = duration - self.mean
+            self.mean += alpha * delta
+            self.variance = (1 - alpha) * (self.variance + alpha * delta * delta)
+        self.failure_rate += alpha * ((1.0 if failed else 0.0) - self.failure_rate)
+        self.count += 1
+
+    @property
+    def p90(self) -> float:
+        return self.mean + P90_Z * math.sqrt(self.variance)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"count": self.count, "mean": self.mean, "p90": self.p90,
+                "failure_rate": self.failure_rate}
+
+
+class ToolCostModel:
+    """
+    도구(와 단계 종류)별 소요 시간·실패율 추정기
+
+    - observe(): 단계 하나의 관측값 (재시도와 백오프를 포함한 단계 전체 시간)을 반영합니다.
+      alpha가 클수록 최근 관측을 더 빨리 따라갑니다.
+    - estimate_plan(): 계획의 임계 경로 시간(평균, p90)과 모든 단계가 성공할 확률
+    - expected_seconds(): 실패하면 계획을 다시 실행한다고 볼 때 성공까지의 기대 시간.
+      계획 후보를 비교하는 기준입니다.
+    - 단계 종류별 관측이 min_samples개 미만이면 도구 전체의 값을,
+      도구 관측도 없으면 관측한 도구들의 평균 소요 시간과 default_failure_rate를 씁니다
+      (아무것도 관측하지 않았으면 default_latency). 처음 보는 도구를 지나치게 비싸게 보면
+      느리거나 자주 실패하는 도구를 대신할 도구가 한 번도 선택되지 않기 때문입니다.
+    """
+
+    def __init__(self, alpha: float = 0.2, min_samples: int = 3,
+                 default_latency: float = DEFAULT_LATENCY,
+                 default_failure_rate: float = DEFAULT_FAILURE_RATE):
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.default_latency = default_latency
+        self.default_failure_rate = default_failure_rate
+        self._stats: Dict[Tuple[str, Optional[str]], RollingStat] = {}
+        self._lock = threading.Lock()
+        self.observations = 0
+
+    def observe(self, step: Dict, duration: float, failed: bool):
+        tool, kind = step_key(step)
+        keys = [(tool, None)] if kind is None else [(tool, None), (tool, kind)]
+        with self._lock:
+            for key in keys:
+                stat = self._stats.get(key)
+                if stat is None:
+                    stat = self._stats[key] = RollingStat(self.default_failure_rate)
+                stat.update(duration, failed, self.alpha)
+            self.observations += 1
+
+    def lookup(self, step: Dict) -> Optional[RollingStat]:
+        """단계에 쓸 관측값 (없으면 None)"""
+        tool, kind = step_key(step)
+        with self._lock:
+            if kind is not None:
+                stat = self._stats.get((tool, kind))
+                if stat is not None and stat.count >= self.min_samples:
+                    return stat
+            return self._stats.get((tool, None))
+
+    def estimate_plan(self, plan: Dict,
+                      available_tools: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        계획의 예상 소요 시간과 성공 확률
+        available_tools를 주면 없는 도구를 쓰는 단계는 반드시 실패하는 것으로 봅니다.
+        """
+        steps = [step for step in plan.get('steps', []) if isinstance(step, dict)]
+        available = set(available_tools) if available_tools is not None else None
+        means: Dict[Any, float] = {}
+        p90s: Dict[Any, float] = {}
+        success = 1.0
+        unobserved = set()
+        prior_latency = self._prior_latency()
+        for step in steps:
+            num = step.get('step_number')
+            stat = self.lookup(step)
+            if stat is None:
+                unobserved.add(step.get('tool_required'))
+                means[num] = p90s[num] = prior_latency
+                failure = self.default_failure_rate
+            else:
+                means[num], p90s[num] = stat.mean, stat.p90
+                failure = stat.failure_rate
+            if available is not None and step.get('tool_required') not in available:
+                failure = 1.0
+            success *= 1.0 - failure
+
+        seconds, path = critical_path(steps, means)
+        p90_seconds, _ = critical_path(steps, p90s)
+        return {
+            'critical_path_seconds': round(seconds, 4),
+            'p90_seconds': round(p90_seconds, 4),
+            'success_probability': round(success, 4),
+            'critical_path': path,
+            'unobserved_tools': sorted(str(tool) for tool in unobserved),
+        }
+
+    def _prior_latency(self) -> float:
+        """처음 보는 도구의 소요 시간 추정 (관측한 도구들의 평균)"""
+        with self._lock:
+            means = [stat.mean for (_, kind), stat in self._stats.items() if kind is None]
+        return sum(means) / len(means) if means else self.default_latency
+
+    @staticmethod
+    def expected_seconds(estimate: Dict[str, Any]) -> float:
+        """성공까지의 기대 시간 = 임계 경로 시간 / 성공 확률 (성공할 수 없으면 무한대)"""
+        success = estimate['success_probability']
+        return estimate['critical_path_seconds'] / success if success > 0 else math.inf
+
+    def stats(self) -> Dict[str, Any]:
+        """도구별(와 '도구/종류'별) 관측값"""
+        with self._lock:
+            return {
+                (tool if kind is None else f"{tool}/{kind}"): stat.to_dict()
+                for (tool, kind), stat in self._stats.items()
+            }
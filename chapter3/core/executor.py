@@ -1,61 +1,328 @@
+import asyncio
+import os
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any
+from typing import Any, AsyncIterable, Dict, Iterable, List, Optional, Union
+
+# 도구의 재시도 정책을 쓰기 위해 tools 폴더를 경로에 추가합니다.
+_TOOLS_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, "tools")
+)
+if _TOOLS_DIR not in sys.path:
+    sys.path.insert(0, _TOOLS_DIR)
+# 동기 API는 2장의 전송 계층과 같은 백그라운드 루프에서 실행합니다 (비동기 커넥션 풀 재사용)
+_CHAPTER2_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, "chapter2")
+)
+if _CHAPTER2_DIR not in sys.path:
+    sys.path.insert(0, _CHAPTER2_DIR)
+
+from base import RetryPolicy
+from cost_model import ToolCostModel, critical_path
+from tracing import echo, span
+from llm_transport import run_sync  # 동기 래퍼(execute_plan, Agent.process_request)가 씁니다
+
 
 class Executor:
     """
     계획을 실제로 실행하는 클래스
     오류 처리, 재시도, 진행 상황 추적을 담당합니다
+    의존성이 충족된 단계들은 동시에 실행합니다 (의존성 그래프 기반 스케줄링)
     """
     
-    def __init__(self, tool_manager, memory):
+    def __init__(self, tool_manager, memory, max_workers: int = 4,
+                 thread_pool: Optional[ThreadPoolExecutor] = None,
+                 cost_model: Optional[ToolCostModel] = None,
+                 cache_scope: Optional[str] = None):
         self.tool_manager = tool_manager
         self.memory = memory
         self.execution_history = []
-        self.max_retries = 3
+        self.max_retries = 3            # 도구에 재시도 정책이 없을 때의 최대 시도 횟수
+        self.max_workers = max_workers  # 동시에 실행할 최대 단계 수
+        # 시간 초과 뒤에도 끝나지 않은 동기 도구 호출이 이만큼 남아 있으면 그 도구를 다시 부르지 않습니다
+        # (is_cancelled()를 확인하지 않는 도구를 재시도할 때마다 작업 스레드가 하나씩 묶이는 것을 막습니다)
+        self.max_stuck_calls = 1
+        # 동기 도구를 실행할 작업 스레드 (처음 필요할 때 max_workers 크기로 만듭니다)
+        # 여러 Executor가 스레드를 나눠 쓰려면 같은 thread_pool을 넘깁니다 (예: AgentRuntime의 세션들)
+        self._thread_pool: Optional[ThreadPoolExecutor] = thread_pool
+
+        # 마지막 실행의 단계별 시작/종료 시각 (계획 시작 기준, 초)
+        self.step_timings: Dict[Any, Dict[str, float]] = {}
+        # 도구별 소요 시간·실패율 (Planner가 계획 시간을 추정할 때 같은 객체를 씁니다)
+        self.cost_model = cost_model if cost_model is not None else ToolCostModel()
+        # 도구 결과 캐시를 나눠 쓸 범위 (ToolManager를 공유하는 세션마다 다르게 줍니다)
+        self.cache_scope = cache_scope
     
     def execute_plan(self, plan: Dict) -> Dict:
         """
         전체 계획을 실행합니다
+        aexecute_plan을 동기 코드에서 호출하기 위한 래퍼입니다 (이벤트 루프 안에서도 동작).
+        비동기 코드에서는 루프를 막지 않도록 aexecute_plan을 직접 await 하세요.
+        """
+        return run_sync(self.aexecute_plan(plan))
+
+    async def aexecute_plan(self, plan: Dict) -> Dict:
+        """
+        의존성 그래프에 따라 계획을 실행합니다
+        - 선행 단계가 모두 끝난 단계는 목록 순서와 관계없이 바로 시작합니다.
+        - 동시에 실행하는 단계 수는 max_workers로 제한합니다.
+        - 선행 단계가 실패했거나, 없는 단계에 의존하거나, 순환 의존이 있는 단계는 건너뜁니다.
         """
+        steps = plan['steps']
+        by_number = {step['step_number']: step for step in steps}
+        order = self.topological_order(steps)
+        ordered = set(order)
+        # 위상 순서에 없는 단계(순환·없는 단계 의존)도 넘겨야 의존성 미충족으로 보고됩니다
+        queue = [by_number[num] for num in order]
+        queue += [step for num, step in by_number.items() if num not in ordered]
+        return await self._aexecute_steps(queue, plan, total_steps=len(steps))
+
+    async def aexecute_stream(self, steps: AsyncIterable[Dict],
+                              request: Optional[str] = None) -> Dict:
+        """
+        단계가 도착하는 대로 실행합니다 (예: Planner.astream_plan의 출력)
+        계획이 다 만들어지기 전에 선행 단계가 없는 단계부터 시작하므로
+        계획 생성 시간과 실행 시간이 겹칩니다.
+        아직 도착하지 않은 단계에 의존하는 단계는 그 단계가 도착해 끝날 때까지 기다리고,
+        스트림이 끝난 뒤에도 실행할 수 없는 단계는 의존성 미충족으로 보고됩니다.
+        """
+        plan = {'steps': [], 'request': request}
+        return await self._aexecute_steps(steps, plan, total_steps=None)
+
+    async def _aexecute_steps(self, steps: Union[Iterable[Dict], AsyncIterable[Dict]],
+                              plan: Dict, total_steps: Optional[int]) -> Dict:
+        """
+        단계 목록(또는 비동기 스트림)을 의존성 그래프에 따라 실행하는 공통 스케줄러
+        plan['steps']가 비어 있으면 도착한 단계를 도착 순서대로 채웁니다.
+        """
+        collect = not plan['steps']
+        by_number: Dict[Any, Dict] = {}
+        # 아직 시작하지 않은 단계 → 끝나지 않은 선행 단계
+        waiting: Dict[Any, set] = {}
         results = {}
-        total_steps = len(plan['steps'])
-        
-        for step in plan['steps']:
-            step_num = step['step_number']
-            
-            # 의존성 확인
-            if not self.check_dependencies(step, results):
-                print(f"단계 {step_num}: 의존성 미충족")
-                continue
-            
-            print(f"\n단계 {step_num}/{total_steps}: {step['description']}")
-
-            # 재시도 로직이 포함된 실행
-            for attempt in range(self.max_retries):
+        self.step_timings = {}
+        semaphore = asyncio.Semaphore(self.max_workers)
+        plan_start = time.perf_counter()
+        running: Dict[asyncio.Task, Any] = {}
+
+        def launch(num):
+            task = asyncio.create_task(self._arun_step(
+                by_number[num], total_steps, results, semaphore, plan_start
+            ))
+            running[task] = num
+
+        def try_launch(num):
+            if waiting[num]:
+                return
+            del waiting[num]
+            # 선행 단계가 실패했으면 시작하지 않습니다 (마지막에 의존성 미충족으로 보고)
+            if self.check_dependencies(by_number[num], results):
+                launch(num)
+
+        def arrive(step):
+            num = step['step_number']
+            if num in by_number:
+                echo(f"단계 {num}: 중복된 단계 번호, 무시합니다")
+                return
+            by_number[num] = step
+            if collect:
+                plan['steps'].append(step)
+            waiting[num] = {dep for dep in step.get('dependencies', []) if dep not in results}
+            try_launch(num)
+
+        next_step = None
+        if hasattr(steps, '__aiter__'):
+            iterator = steps.__aiter__()
+            next_step = asyncio.ensure_future(iterator.__anext__())
+        else:
+            for step in steps:
+                arrive(step)
+
+        while running or next_step is not None:
+            pending = set(running)
+            if next_step is not None:
+                pending.add(next_step)
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+            if next_step in done:
                 try:
-                    result = self.execute_single_step(step, results)
-                    results[step_num] = result
+                    step = next_step.result()
+                except StopAsyncIteration:
+                    next_step = None
+                except Exception as e:
+                    echo(f"단계 스트림 오류: {e}")
+                    next_step = None
+                else:
+                    next_step = asyncio.ensure_future(iterator.__anext__())
+                    arrive(step)
+
+            for task in done:
+                if task not in running:
+                    continue
+                num = running.pop(task)
+                results[num] = task.result()
+                # 이 단계를 기다리던 단계 중 준비된 것을 바로 시작합니다
+                for child in [child for child, deps in waiting.items() if num in deps]:
+                    waiting[child].discard(num)
+                    try_launch(child)
+
+        for num in by_number:
+            if num not in results:
+                echo(f"단계 {num}: 의존성 미충족")
+
+        return self.compile_results(results, wall_time=time.perf_counter() - plan_start,
+                                    plan=plan)
+
+    async def _arun_step(self, step: Dict, total_steps: Optional[int], results: Dict,
+                         semaphore: asyncio.Semaphore, plan_start: float) -> Any:
+        """단계 하나를 재시도와 함께 실행하고 시작/종료 시각을 기록합니다"""
+        step_num = step['step_number']
+        tool = self.tool_manager.get_tool(step['tool_required'])
+        policy = self._retry_policy(tool)
+        timeout = getattr(tool, 'timeout', None)
+        started_at = None
+        attempts = 0
+
+        # 재시도 로직이 포함된 실행 (동시에 도는 단계는 추적에서 각자 다른 레인에 그립니다)
+        with span(f"step {step_num}", "step", concurrent=True,
+                  tool=step['tool_required']) as current:
+            for attempt in range(policy.max_attempts):
+                async with semaphore:
+                    if started_at is None:
+                        started_at = time.perf_counter()
+                        progress = f"{step_num}/{total_steps}" if total_steps else f"{step_num}"
+                        echo(f"\n단계 {progress}: {step['description']}")
+                    stuck = self.tool_manager.stuck_calls(step['tool_required'])
+                    if stuck >= self.max_stuck_calls:
+                        error = RuntimeError(
+                            f"{step['tool_required']}: 시간 초과된 호출 {stuck}개가 아직 끝나지 않아 "
+                            f"다시 실행하지 않습니다"
+                        )
+                        echo(f"시도 {attempt + 1} 건너뜀: {error}")
+                        if attempt == 0:
+                            result = self.handle_failure(step, error)
+                        break
+                    attempts += 1
+                    try:
+                        result = await self._acall_step(step, dict(results), timeout)
                     
-                    # 성공 시 메모리에 저장
-                    self.memory.store({
-                        'step': step_num,
-                        'action': step['description'],
-                        'result': result,
-                        'timestamp': datetime.now()
-                    })
+                        # 성공 시 메모리에 저장
+                        self.memory.store({
+                            'step': step_num,
+                            'action': step['description'],
+                            'result': result,
+                        }, kind='step')
                     
-                    print(f" 단계 {step_num} 완료")
-                    break
+                        echo(f" 단계 {step_num} 완료")
+                        break
                     
-                except Exception as e:
-                    print(f"시도 {attempt + 1} 실패: {e}")
-                    if attempt == self.max_retries - 1:
-                        results[step_num] = self.handle_failure(step, e)
-                    else:
-                        time.sleep(2 ** attempt)  # 지수 백오프
-        
-        return self.compile_results(results)
+                    except Exception as e:
+                        echo(f"시도 {attempt + 1} 실패: {e}")
+                        result = self.handle_failure(step, e)
+                # 마지막 시도가 실패했으면 더 기다리지 않고 실패 결과를 돌려줍니다
+                if attempt + 1 < policy.max_attempts:
+                    # 대기하는 동안에는 실행 슬롯을 양보하므로 다른 단계는 계속 진행됩니다
+                    await asyncio.sleep(policy.backoff(attempt))  # 지수 백오프 + full jitter
+            if current is not None:
+                current.attrs['attempts'] = attempts
+
+        finished_at = time.perf_counter()
+        self.step_timings[step_num] = {
+            'start': started_at - plan_start,
+            'end': finished_at - plan_start,
+            'duration': finished_at - started_at,
+            'attempts': attempts,
+        }
+        failed = isinstance(result, dict) and result.get('success') is False
+        self.cost_model.observe(step, finished_at - started_at, failed)
+        return result
+
+    def _retry_policy(self, tool) -> RetryPolicy:
+        """도구에 정의된 재시도 정책, 없으면 max_retries를 쓰는 기본 정책 (적어도 한 번은 시도)"""
+        policy = getattr(tool, 'retry_policy', None)
+        return policy or RetryPolicy(max_attempts=max(1, self.max_retries))
+
+    async def _acall_step(self, step: Dict, previous_results: Dict,
+                          timeout: Optional[float]) -> Any:
+        """
+        단계를 한 번 실행합니다
+        도구 종류에 따라 이벤트 루프(비동기 도구), 작업 스레드(동기 도구),
+        프로세스 풀(CPU 작업 도구)에서 실행합니다 (ToolManager.aexecute_tool).
+        제한 시간을 넘기면 기다리기를 멈추고 취소 신호를 보냅니다.
+        (비동기 도구는 바로 취소되지만 스레드는 강제로 멈출 수 없으므로,
+        동기 도구는 is_cancelled()를 확인해 스스로 멈춥니다)
+        """
+        tool_name = step['tool_required']
+        if not self.tool_manager.get_tool(tool_name):
+            raise ValueError(f"도구를 찾을 수 없음: {tool_name}")
+
+        # 이전 결과를 참조하여 입력 준비
+        tool_input = self.prepare_tool_input(step, previous_results)
+
+        cancel_event = threading.Event()
+        call = self.tool_manager.aexecute_tool(
+            tool_name, tool_input,
+            thread_pool=self._get_thread_pool(), cancel_event=cancel_event,
+            cache_scope=self.cache_scope
+        )
+        try:
+            result = await (call if timeout is None else asyncio.wait_for(call, timeout))
+        except asyncio.TimeoutError:
+            cancel_event.set()
+            raise TimeoutError(
+                f"{tool_name} 시간 초과 ({timeout}초)"
+            ) from None
+
+        # 결과 검증
+        if not self.validate_result(result, step['expected_output']):
+            raise ValueError(f"예상과 다른 결과: {result}")
+        return result
+
+    def _get_thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="executor-step"
+            )
+        return self._thread_pool
+
+    def topological_order(self, steps: List[Dict]) -> List[Any]:
+        """
+        의존성을 만족하는 실행 순서 (단계 번호 목록)
+        같은 순위의 단계는 계획에 적힌 순서를 유지합니다.
+        순환 의존이나 없는 단계에 대한 의존이 있는 단계는 목록에서 빠집니다.
+        """
+        by_number = {step['step_number']: step for step in steps}
+        indegree = {num: 0 for num in by_number}
+        children: Dict[Any, List[Any]] = {num: [] for num in by_number}
+        for num, step in by_number.items():
+            for dep in set(step.get('dependencies', [])):
+                indegree[num] += 1
+                if dep in children:
+                    children[dep].append(num)
+
+        order = []
+        ready = [num for num in by_number if indegree[num] == 0]
+        while ready:
+            num = ready.pop(0)
+            order.append(num)
+            for child in children[num]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    ready.append(child)
+        return order
+
+    def critical_path_time(self, plan: Dict,
+                           timings: Optional[Dict[Any, Dict[str, float]]] = None) -> float:
+        """
+        단계별 소요 시간으로 계산한 임계 경로 길이 (초)
+        병렬 실행의 전체 시간은 이 값에 가까워야 합니다.
+        """
+        timings = timings if timings is not None else self.step_timings
+        durations = {num: timing['duration'] for num, timing in timings.items()}
+        return critical_path(plan['steps'], durations)[0]
     
     def execute_single_step(self, step: Dict, previous_results: Dict) -> Any:
         """
@@ -153,29 +420,35 @@ class Executor:
             'timestamp': datetime.now()
         }
 
-    def compile_results(self, results: Dict) -> Dict:
+    def compile_results(self, results: Dict, wall_time: Optional[float] = None,
+                        plan: Optional[Dict] = None) -> Dict:
         """
         모든 단계의 결과를 최종 결과로 컴파일합니다.
+        실행 이력에는 계획과 요청도 남겨 PlanLibrary가 성공한 계획을 재사용할 수 있게 합니다.
         """
-        # 성공/실패 통계 계산
+        # 성공/실패 통계 계산 (단계를 검증할 때와 같은 기준: 실패 결과는 success=False)
+        expected = {step.get('step_number'): step.get('expected_output')
+                    for step in (plan or {}).get('steps', []) if isinstance(step, dict)}
         success_count = 0
         failure_count = 0
 
         for step_id, result in results.items():
-            if isinstance(result, dict):
-                if result.get('success', False) or 'data' in result:
-                    success_count += 1
-                else:
-                    failure_count += 1
+            if self.validate_result(result, expected.get(step_id)):
+                success_count += 1
             else:
-                success_count += 1  # 결과가 있으면 성공으로 간주
+                failure_count += 1
 
         # 실행 이력에 추가
         self.execution_history.append({
             'timestamp': datetime.now(),
             'total_steps': len(results),
             'success_count': success_count,
-            'failure_count': failure_count
+            'failure_count': failure_count,
+            'wall_time': wall_time,
+            'step_timings': dict(self.step_timings),
+            'plan': plan,
+            'request': plan.get('request') if plan else None,
+            'estimate': plan.get('estimate') if plan else None,  # 실행 전 추정 (wall_time과 비교)
         })
 
         return results
@@ -0,0 +1,209 @@
+"""
+계획 재사용 계층
+- PlanCache: (정규화한 요청, 정렬한 도구 목록)을 키로 하는 TTL + LRU 캐시
+- PlanLibrary: Executor.execution_history에서 성공한 계획을 모아 두고,
+  요청이 충분히 비슷하면 가장 가까운 과거 계획을 돌려줍니다
+둘 중 하나라도 맞으면 Planner는 LLM을 호출하지 않습니다.
+
+둘 다 범위(scope, 예: 세션 id)별로 계획을 나눠 둡니다. 세션의 기억을 보고 만든 계획은
+그 세션 범위에만 두고, 범위가 None인 공유 계획은 모든 범위에서 찾을 수 있습니다.
+"""
+import copy
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+# 요청 유사도에 기억 검색과 같은 단어 분리를 쓰기 위해 memory 폴더를 경로에 추가합니다.
+_MEMORY_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, "memory")
+)
+if _MEMORY_DIR not in sys.path:
+    sys.path.insert(0, _MEMORY_DIR)
+
+from inverted_index import tokenize
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_request(request: str) -> str:
+    """대소문자, 문장부호, 공백 차이를 없앱니다 ("내일 회의 준비해줘!" == "내일  회의 준비해줘")"""
+    return _SPACE_RE.sub(" ", _PUNCT_RE.sub(" ", request.lower())).strip()
+
+
+def plan_key(request: str, tools: Iterable[str]) -> Tuple[str, Tuple[str, ...]]:
+    return normalize_request(request), tuple(sorted(set(tools)))
+
+
+def plan_scope(plan: Dict) -> Optional[Hashable]:
+    """계획이 속한 범위 (Planner가 세션 기억을 보고 만든 계획에 plan['scope']로 남깁니다)"""
+    return plan.get('scope')
+
+
+def lookup_scopes(scope: Optional[Hashable]) -> Tuple[Optional[Hashable], ...]:
+    """찾을 범위 순서 - 자기 범위, 그다음 공유 범위(None)"""
+    return (None,) if scope is None else (scope, None)
+
+
+def plan_tools(plan: Dict) -> set:
+    """계획이 사용하는 도구 이름 집합"""
+    return {step.get('tool_required') for step in plan.get('steps', [])}
+
+
+class PlanCache:
+    """
+    같은 요청 + 같은 도구 구성의 계획을 ttl초 동안 max_size개까지 보관합니다
+    꺼낼 때는 사본을 돌려주므로 실행 중에 계획이 바뀌어도 캐시는 그대로입니다.
+    scope를 주면 그 범위의 계획을 먼저, 없으면 공유 계획을 찾습니다.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, request: str, tools: Iterable[str],
+            scope: Optional[Hashable] = None) -> Optional[Dict]:
+        base = plan_key(request, tools)
+        now = time.monotonic()
+        with self._lock:
+            for candidate in lookup_scopes(scope):
+                key = (candidate, base)
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] < now:
+                    del self._entries[key]
+                    self.expired += 1
+                    entry = None
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    plan = entry[1]
+                    break
+            else:
+                self.misses += 1
+                return None
+        return copy.deepcopy(plan)
+
+    def put(self, request: str, tools: Iterable[str], plan: Dict,
+            scope: Optional[Hashable] = None):
+        key = (scope, plan_key(request, tools))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(plan))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
+
+
+class PlanLibrary:
+    """
+    실행 이력에서 배우는 계획 모음
+    history는 Executor.execution_history 목록 자체를 넘기며, 찾을 때마다 새로 쌓인 이력만 읽습니다.
+    모든 단계가 성공한 계획만 모으고, 요청 단어의 자카드 유사도가 threshold 이상이며
+    필요한 도구가 지금 모두 있는 계획 중 가장 비슷한 것을 돌려줍니다.
+    계획은 plan_scope(plan)의 범위에 모으고, find(scope=...)는 그 범위와 공유 범위에서만 찾습니다.
+    max_plans는 모든 범위를 합친 수이며, 넘치면 가장 오래 쓰이지 않은 계획부터 버립니다.
+    """
+
+    def __init__(self, history: Optional[List[Dict]] = None, threshold: float = 0.6,
+                 max_plans: int = 500):
+        self.history = history if history is not None else []
+        self.threshold = threshold
+        self.max_plans = max_plans
+        # 범위 -> {정규화한 요청: (요청 단어, 계획)}, 전체 LRU 순서는 _order에 둡니다
+        self._plans: Dict[Optional[Hashable], Dict[str, Tuple[set, Dict]]] = {}
+        self._order: "OrderedDict[tuple, None]" = OrderedDict()
+        self._synced = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _sync(self):
+        """아직 읽지 않은 실행 이력에서 성공한 계획을 모읍니다 (잠금을 잡은 상태에서 호출)"""
+        for entry in self.history[self._synced:]:
+            self.learn(entry)
+        self._synced = len(self.history)
+
+    def learn(self, entry: Dict) -> bool:
+        """
+        실행 이력 항목 하나에서 배웁니다 (모든 단계가 성공한 계획만 추가)
+        history 목록을 공유할 수 없는 곳(예: 세션마다 Executor가 다른 AgentRuntime)에서 직접 넘깁니다.
+        """
+        plan = entry.get('plan')
+        request = entry.get('request')
+        if (not plan or not request or entry.get('failure_count', 1) > 0
+                or entry.get('total_steps') != len(plan.get('steps', []))):
+            return False
+        self.add(request, plan, plan_scope(plan))
+        return True
+
+    def add(self, request: str, plan: Dict, scope: Optional[Hashable] = None):
+        """성공한 계획을 직접 추가합니다 (같은 범위의 같은 요청이면 최신 계획으로 바꿉니다)"""
+        key = normalize_request(request)
+        self._plans.setdefault(scope, {})[key] = (tokenize(key), copy.deepcopy(plan))
+        self._order[(scope, key)] = None
+        self._order.move_to_end((scope, key))
+        while len(self._order) > self.max_plans:
+            old_scope, old_key = self._order.popitem(last=False)[0]
+            plans = self._plans[old_scope]
+            del plans[old_key]
+            if not plans:
+                del self._plans[old_scope]
+
+    def find(self, request: str, tools: Iterable[str],
+             scope: Optional[Hashable] = None) -> Optional[Tuple[float, Dict]]:
+        """(유사도, 계획 사본) 또는 None - scope와 공유 범위의 계획만 비교합니다"""
+        terms = tokenize(normalize_request(request))
+        available = set(tools)
+        with self._lock:
+            self._sync()
+            best_score, best_plan = 0.0, None
+            for candidate in lookup_scopes(scope):
+                for plan_terms, plan in self._plans.get(candidate, {}).values():
+                    union = len(terms | plan_terms)
+                    score = len(terms & plan_terms) / union if union else 0.0
+                    if score > best_score and plan_tools(plan) <= available:
+                        best_score, best_plan = score, plan
+            if best_plan is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return best_score, copy.deepcopy(best_plan)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._sync()
+            return len(self._order)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "plans": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,115 @@
+"""
+스트리밍 계획 파싱
+LLM이 계획 JSON을 토큰 단위로 보내는 동안 "steps" 배열의 원소가 하나 완성될 때마다
+그 단계를 바로 꺼내 줍니다. Executor는 계획이 끝나기를 기다리지 않고
+선행 단계가 없는 단계부터 실행을 시작할 수 있습니다.
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+
+class IncrementalStepParser:
+    """
+    조각으로 들어오는 계획 JSON에서 steps[i] 객체를 완성되는 즉시 꺼내는 파서
+
+    - 문자열 안의 괄호와 이스케이프를 구분하며 괄호 깊이만 추적하므로,
+      이미 읽은 글자를 다시 훑지 않습니다 (조각 전체에 대해 O(n)).
+    - 최상위 객체의 "steps" 키 바로 뒤의 배열만 단계로 봅니다.
+      JSON 앞뒤의 설명 문장이나 ```json 같은 감싸개는 무시합니다.
+    - 완성된 원소가 JSON으로 읽히지 않으면(예: 주석이 섞인 경우) 건너뛰고 errors에 남깁니다.
+      이런 단계는 전체 응답을 다시 파싱하는 result()에서 복구할 수 있습니다.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.errors: List[str] = []
+        self.steps_emitted = 0
+        self._pos = 0
+        self._stack: List[str] = []        # 열린 괄호 ('{' 또는 '[')
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._steps_depth: Optional[int] = None   # steps 배열이 열린 깊이
+        self._steps_closed = False
+        self._item_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """조각을 이어 붙이고, 이번 조각으로 완성된 단계 목록을 돌려줍니다"""
+        self.text += chunk
+        completed = []
+        text = self.text
+        for pos in range(self._pos, len(text)):
+            char = text[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:pos + 1]
+                continue
+
+            if char == '"':
+                if self._stack:
+                    self._in_string = True
+                    self._string_start = pos
+            elif char in "{[":
+                if char == "[" and self._is_steps_key():
+                    self._steps_depth = len(self._stack) + 1
+                elif (char == "{" and self._steps_depth is not None
+                        and len(self._stack) == self._steps_depth):
+                    self._item_start = pos
+                self._stack.append(char)
+            elif char in "}]" and self._stack:
+                self._stack.pop()
+                depth = len(self._stack)
+                if (char == "}" and self._item_start is not None
+                        and depth == self._steps_depth):
+                    step = self._decode(text[self._item_start:pos + 1])
+                    self._item_start = None
+                    if step is not None:
+                        completed.append(step)
+                elif (char == "]" and self._steps_depth is not None
+                        and depth == self._steps_depth - 1):
+                    self._steps_depth = None
+                    self._steps_closed = True
+            elif char not in " \t\r\n:":
+                self._last_string = None   # 키 뒤에는 ':'와 공백만 올 수 있습니다
+        self._pos = len(text)
+        self.steps_emitted += len(completed)
+        return completed
+
+    def _is_steps_key(self) -> bool:
+        """지금 여는 '['가 최상위 객체의 "steps" 값인지"""
+        return (not self._steps_closed and self._stack == ["{"]
+                and self._last_string == '"steps"')
+
+    def _decode(self, raw: str) -> Optional[Dict]:
+        try:
+            step = json.loads(raw)
+        except json.JSONDecodeError as e:
+            self.errors.append(f"단계 파싱 실패: {e}")
+            return None
+        if not isinstance(step, dict) or 'step_number' not in step:
+            self.errors.append(f"단계 형식 오류: {raw[:80]}")
+            return None
+        return step
+
+    @property
+    def done(self) -> bool:
+        """steps 배열이 닫혔는지 (이후 조각에서는 단계가 더 나오지 않습니다)"""
+        return self._steps_closed
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        """지금까지 받은 전체 응답을 계획으로 파싱합니다 (실패하면 None)"""
+        start = self.text.find("{")
+        end = self.text.rfind("}") + 1
+        if start < 0 or end <= start:
+            return None
+        try:
+            plan = json.loads(self.text[start:end])
+        except json.JSONDecodeError:
+            return None
+        return plan if isinstance(plan, dict) else None
@@ -1,7 +1,9 @@
+import asyncio
 import json
+import math
 import os
 import sys
-from typing import Dict, List, Any
+from typing import AsyncIterator, Dict, Hashable, List, Any, Optional, Tuple
 
 # 코드 2-6의 통합 LLM 인터페이스를 불러옵니다.
 # 현재 작업 디렉터리에 영향받지 않도록 __file__ 기준으로 경로를 추가합니다.
@@ -11,7 +13,14 @@ _CHAPTER2_DIR = os.path.abspath(
 if _CHAPTER2_DIR not in sys.path:
     sys.path.insert(0, _CHAPTER2_DIR)
 
-from llm_interface import LLM
+from llm_interface import shared_llm
+
+from cost_model import ToolCostModel
+from plan_cache import PlanCache, PlanLibrary, plan_scope, plan_tools
+from plan_stream import IncrementalStepParser
+from tracing import annotate, echo, span
+
+FALLBACK_RISK = "자동 생성된 기본 계획"
 
 class Planner:
     """
@@ -19,9 +28,23 @@ class Planner:
     복잡한 작업을 실행 가능한 단계들로 분해합니다
     """
     
-    def __init__(self, llm=None):
-        # 통합 LLM 인터페이스 사용 - llm이 없으면 자동 생성 
-        self.llm = llm or LLM()  # 자동으로 최적의 제공자 선택
+    def __init__(self, llm=None, plan_cache: PlanCache = None,
+                 plan_library: PlanLibrary = None, cost_model: ToolCostModel = None,
+                 replan_below: float = 0.5):
+        # 통합 LLM 인터페이스 사용 - llm이 없으면 프로세스 공유 인스턴스 사용
+        self.llm = llm or shared_llm()  # 자동으로 최적의 제공자 선택
+
+        # 같은 요청·같은 도구면 캐시에서, 비슷한 요청이면 성공했던 과거 계획에서 가져옵니다
+        self.plan_cache = plan_cache if plan_cache is not None else PlanCache()
+        self.plan_library = plan_library  # 예: PlanLibrary(executor.execution_history)
+        # 실행 이력에서 배운 도구별 소요 시간·실패율 (예: executor.cost_model)
+        # 있으면 계획마다 plan['estimate']에 예상 시간과 성공 확률을 담고, 후보 중 빠른 계획을 고릅니다
+        self.cost_model = cost_model
+        # 재사용할 계획의 추정 성공 확률이 이보다 낮으면 새 계획을 만들어 비교합니다
+        self.replan_below = replan_below
+        self.max_alternatives = 3  # 고른 계획과 함께 보관할 다른 후보 수
+        self.llm_calls = 0
+        self.last_plan: Optional[Dict] = None  # astream_plan이 마지막으로 완성한 계획
         
         self.planning_prompt_template = """
         당신은 작업 계획을 수립하는 전문가입니다.
@@ -50,24 +73,262 @@ class Planner:
         """
     
     def create_plan(self, user_request: str, available_tools: List[str], 
-                   context: Dict = None) -> Dict: # 계획 생성 메인 메서드
+                   context: Dict = None, candidates: int = 1,
+                   cache_scope: Optional[Hashable] = None) -> Dict: # 계획 생성 메인 메서드
         """
         사용자 요청에 대한 실행 계획을 생성합니다
+        캐시나 계획 라이브러리에서 찾으면 LLM을 호출하지 않습니다.
+        candidates > 1이면 계획을 여러 개 만들어 성공까지의 기대 시간이 가장 짧은 계획을 고르고,
+        나머지는 plan['alternatives']에 남겨 재사용할 때 최신 관측값으로 다시 비교합니다.
+        재사용할 계획의 추정 성공 확률이 모두 replan_below보다 낮으면 새 계획도 만들어 함께 비교합니다.
+        cache_scope(예: 세션 id)를 주면 context의 기억을 보고 만든 계획은 그 범위에만 저장하고,
+        재사용할 계획도 그 범위와 공유 범위에서만 찾습니다.
+        """
+        reused = self._reuse_candidates(user_request, available_tools, cache_scope)
+        if reused and not self._should_replan(reused, available_tools):
+            return self._choose_plan(user_request, available_tools, reused)
+
+        annotate(plan_source='llm')
+        scope = self._new_plan_scope(cache_scope, context)
+        generated = [
+            self._generate_plan(user_request, available_tools, context,
+                                temperature=self._candidate_temperature(i, reused))
+            for i in range(candidates)
+        ]
+        return self._choose_plan(user_request, available_tools,
+                                 reused + [('llm', plan) for plan in generated], scope)
+
+    async def acreate_plan(self, user_request: str, available_tools: List[str],
+                           context: Dict = None, candidates: int = 1,
+                           cache_scope: Optional[Hashable] = None) -> Dict:
+        """
+        create_plan의 비동기 버전
+        LLM 응답을 기다리는 동안 이벤트 루프를 막지 않으므로
+        여러 세션의 요청이 한 루프에서 동시에 계획을 세울 수 있습니다.
+        계획 후보는 동시에 생성합니다.
+        """
+        reused = self._reuse_candidates(user_request, available_tools, cache_scope)
+        if reused and not self._should_replan(reused, available_tools):
+            return self._choose_plan(user_request, available_tools, reused)
+
+        annotate(plan_source='llm')
+        scope = self._new_plan_scope(cache_scope, context)
+        generated = await asyncio.gather(*(
+            self._agenerate_plan(user_request, available_tools, context,
+                                 temperature=self._candidate_temperature(i, reused))
+            for i in range(candidates)
+        ))
+        return self._choose_plan(user_request, available_tools,
+                                 reused + [('llm', plan) for plan in generated], scope)
+
+    def estimate_plan(self, plan: Dict, available_tools: List[str] = None) -> Optional[Dict]:
+        """
+        비용 모델로 계획의 예상 시간을 계산해 plan['estimate']에 담고 돌려줍니다 (모델이 없으면 None)
+        critical_path_seconds(평균)와 p90_seconds는 호출한 쪽이 실행 마감 시간을 정할 때 씁니다.
+        """
+        if self.cost_model is None:
+            return None
+        plan['estimate'] = self.cost_model.estimate_plan(plan, available_tools)
+        return plan['estimate']
+
+    def _plan_cost(self, plan: Dict) -> float:
+        estimate = plan.get('estimate')
+        return ToolCostModel.expected_seconds(estimate) if estimate else 0.0
+
+    @staticmethod
+    def _new_plan_scope(cache_scope: Optional[Hashable], context: Dict = None) -> Optional[Hashable]:
+        """
+        새로 만든 계획을 둘 범위 - 프롬프트에 범위(세션)의 기억이 들어가면 그 범위,
+        기억 없이 만든 계획은 다른 범위에 나눠 줘도 되므로 공유 범위(None)
+        """
+        return cache_scope if context and context.get('memories') else None
+
+    def _reuse_candidates(self, user_request: str, available_tools: List[str],
+                          cache_scope: Optional[Hashable] = None) -> List[Tuple[str, Dict]]:
+        """재사용할 계획과 그 계획을 고를 때 비교했던 다른 후보들"""
+        plan = self._reuse_plan(user_request, available_tools, cache_scope)
+        if plan is None:
+            return []
+        alternatives = plan.pop('alternatives', [])
+        return [('reused', plan)] + [('reused', alternative) for alternative in alternatives]
+
+    def _should_replan(self, reused: List[Tuple[str, Dict]], available_tools: List[str]) -> bool:
+        """
+        재사용 후보가 모두 관측상 자주 실패하는지
+        (후보가 쓰는 도구를 하나도 관측하지 않았으면 판단하지 않습니다)
+        """
+        if self.cost_model is None:
+            return False
+        observed = False
+        for _, plan in reused:
+            estimate = self.estimate_plan(plan, available_tools)
+            if estimate['success_probability'] >= self.replan_below:
+                return False
+            observed = observed or len(estimate['unobserved_tools']) < len(plan_tools(plan))
+        if observed:
+            echo(f" 재사용 계획의 예상 성공 확률이 낮아 새 계획과 비교합니다 "
+                 f"({reused[0][1]['estimate']['success_probability']:.0%})")
+        return observed
+
+    @staticmethod
+    def _candidate_temperature(index: int, reused: List[Tuple[str, Dict]]) -> float:
+        # 첫 후보는 일관성을 위해 낮은 온도로, 나머지는 다른 계획이 나오도록 높은 온도로 만듭니다.
+        # 재사용 계획을 대신할 계획을 찾을 때는 같은 계획이 다시 나오지 않도록 처음부터 높은 온도를 씁니다
+        return 0.3 if index == 0 and not reused else 0.7
+
+    def _choose_plan(self, user_request: str, available_tools: List[str],
+                     candidates: List[Tuple[str, Dict]],
+                     scope: Optional[Hashable] = None) -> Dict:
+        """
+        후보 ('reused' 또는 'llm', 계획) 중 성공까지의 기대 시간이 가장 짧은 계획을 고릅니다
+        기대 시간이 같으면 앞의 후보(재사용 계획, 낮은 온도의 계획)를 씁니다.
+        고른 계획이 바뀌었으면 나머지 후보를 alternatives로 붙여 캐시에 저장합니다.
+        새로 만든 계획은 scope 범위에 둡니다 (재사용 계획은 원래 범위를 그대로 가집니다).
+        """
+        for source, plan in candidates:
+            plan['request'] = user_request
+            if source == 'llm' and scope is not None:
+                plan['scope'] = scope
+            self.estimate_plan(plan, available_tools)
+        source, best = min(candidates, key=lambda candidate: self._plan_cost(candidate[1]))
+        if len(candidates) > 1:
+            others = sorted((plan for _, plan in candidates if plan is not best),
+                            key=self._plan_cost)
+            best['alternatives'] = [
+                {key: value for key, value in plan.items() if key != 'alternatives'}
+                for plan in others[:self.max_alternatives]
+            ]
+            cost = self._plan_cost(best)
+            expected = f", 성공까지 예상 {cost:.2f}초" if math.isfinite(cost) else ""
+            echo(f" 계획 후보 {len(candidates)}개 중 선택 ({source}{expected})")
+            annotate(plan_source=source, plan_candidates=len(candidates))
+        if source == 'llm' or best is not candidates[0][1]:
+            # 공유 계획이라도 다른 범위의 후보가 붙었으면 그 범위에만 저장합니다
+            scopes = {plan_scope(plan) for _, plan in candidates} - {None}
+            if scopes and plan_scope(best) is None:
+                best['scope'] = scopes.pop()
+            self._remember_plan(user_request, available_tools, best)
+        return best
+
+    async def astream_plan(self, user_request: str, available_tools: List[str],
+                           context: Dict = None,
+                           cache_scope: Optional[Hashable] = None) -> AsyncIterator[Dict]:
+        """
+        계획 단계를 LLM이 만들어 내는 대로 하나씩 내보내는 비동기 제너레이터
+        Executor.aexecute_stream에 넘기면 계획 생성과 실행이 겹쳐 진행됩니다.
+        캐시나 계획 라이브러리에서 찾으면 LLM 없이 저장된 단계를 바로 내보냅니다.
+        스트림이 끝나면 완성된 전체 계획이 self.last_plan에 남습니다.
+        단계를 내보내는 즉시 실행되므로 계획 후보 비교는 하지 않고, 추정값만 last_plan에 담습니다.
         """
+        plan = self._reuse_plan(user_request, available_tools, cache_scope)
+        if plan is not None:
+            self.estimate_plan(plan, available_tools)
+            self.last_plan = plan
+            for step in plan['steps']:
+                yield step
+            return
+
+        prompt = self._planning_prompt(user_request, available_tools, context)
+        self.llm_calls += 1
+        parser = IncrementalStepParser()
+        streamed: List[Dict] = []
+        # 제너레이터가 멈춘 사이에는 호출한 쪽 코드가 실행되므로 현재 구간으로 설정하지 않습니다
+        with span("llm.generate_stream", "llm", activate=False, purpose="plan") as current:
+            try:
+                async for chunk in self.llm.agenerate_stream(
+                    prompt=prompt, temperature=0.3, max_tokens=1000
+                ):
+                    for step in parser.feed(chunk):
+                        streamed.append(step)
+                        yield step
+            except Exception as e:
+                echo(f"계획 스트리밍 실패: {e}")
+            if current is not None:
+                current.attrs['steps'] = parser.steps_emitted
+
+        # 전체 응답으로 계획을 다시 읽어, 조각 단위로 읽지 못한 단계가 있으면 마저 내보냅니다
+        plan = parser.result()
+        complete = plan is not None and isinstance(plan.get('steps'), list)
+        if not complete:
+            plan = ({'steps': streamed} if streamed
+                    else self.create_fallback_plan(user_request))
+        sent = {step['step_number'] for step in streamed}
+        for step in plan['steps']:
+            if isinstance(step, dict) and step.get('step_number') not in sent:
+                yield step
+        for error in parser.errors:
+            echo(f" {error}")
+        plan['request'] = user_request
+        scope = self._new_plan_scope(cache_scope, context)
+        if scope is not None:
+            plan['scope'] = scope
+        if complete:
+            self._remember_plan(user_request, available_tools, plan)  # 중간에 끊긴 계획은 저장하지 않습니다
+        self.estimate_plan(plan, available_tools)
+        self.last_plan = plan
+
+    def _reuse_plan(self, user_request: str, available_tools: List[str],
+                    cache_scope: Optional[Hashable] = None) -> Optional[Dict]:
+        """캐시, 그다음 계획 라이브러리에서 재사용할 계획을 찾습니다 (cache_scope와 공유 범위만)"""
+        cached = self.plan_cache.get(user_request, available_tools, cache_scope)
+        if cached is not None:
+            echo(" 캐시된 계획 재사용 (LLM 호출 생략)")
+            annotate(plan_source='cache')
+            return cached
+
+        if self.plan_library is not None:
+            found = self.plan_library.find(user_request, available_tools, cache_scope)
+            if found is not None:
+                similarity, plan = found
+                echo(f" 비슷한 과거 계획 재사용 (유사도 {similarity:.2f}, LLM 호출 생략)")
+                plan['request'] = user_request
+                self.plan_cache.put(user_request, available_tools, plan, plan_scope(plan))
+                annotate(plan_source='library', similarity=round(similarity, 3))
+                return plan
+        return None
+
+    def _remember_plan(self, user_request: str, available_tools: List[str], plan: Dict):
+        if FALLBACK_RISK not in plan.get('potential_risks', []):
+            # 기본 계획은 저장하지 않습니다
+            self.plan_cache.put(user_request, available_tools, plan, plan_scope(plan))
+
+    def plan_stats(self) -> Dict:
+        """LLM 호출 수와 캐시·라이브러리 적중률"""
+        return {
+            'llm_calls': self.llm_calls,
+            'cache': self.plan_cache.stats(),
+            'library': self.plan_library.stats() if self.plan_library is not None else None,
+        }
+
+    def _generate_plan(self, user_request: str, available_tools: List[str],
+                       context: Dict = None, temperature: float = 0.3) -> Dict:
+        """LLM으로 계획을 만듭니다"""
         # 프롬프트 준비
-        prompt = self.planning_prompt_template.format(
-            user_request=user_request,
-            available_tools=", ".join(available_tools),
-            current_context=context or "없음"
-        )
+        prompt = self._planning_prompt(user_request, available_tools, context)
         
         # 통합 LLM 인터페이스를 사용하여 계획 생성
-        plan_response = self.llm.generate(
-            prompt=prompt,
-            temperature=0.3,  # 계획 수립은 일관성이 중요하므로 낮은 온도
-            max_tokens=1000   # 충분한 길이의 계획을 위해
-        )
-        
+        self.llm_calls += 1
+        with span("llm.generate", "llm", purpose="plan"):
+            plan_response = self.llm.generate(
+                prompt=prompt,
+                temperature=temperature,  # 계획 수립은 일관성이 중요하므로 낮은 온도
+                max_tokens=1000   # 충분한 길이의 계획을 위해
+            )
+        return self._parse_plan(plan_response, user_request)
+
+    async def _agenerate_plan(self, user_request: str, available_tools: List[str],
+                              context: Dict = None, temperature: float = 0.3) -> Dict:
+        """_generate_plan의 비동기 버전"""
+        prompt = self._planning_prompt(user_request, available_tools, context)
+        self.llm_calls += 1
+        with span("llm.generate", "llm", purpose="plan"):
+            plan_response = await self.llm.agenerate(
+                prompt=prompt, temperature=temperature, max_tokens=1000
+            )
+        return self._parse_plan(plan_response, user_request)
+
+    def _parse_plan(self, plan_response: str, user_request: str) -> Dict:
+        """LLM 응답을 계획으로 읽습니다 (실패하면 기본 계획)"""
         try:
             # JSON 파싱 시도
             plan = json.loads(plan_response)
@@ -77,9 +338,17 @@ class Planner:
             # JSON 파싱 실패 시 텍스트에서 JSON 추출 시도
             return self.extract_json_from_text(plan_response, user_request)
         except Exception as e:
-            print(f"계획 생성 실패: {e}")
+            echo(f"계획 생성 실패: {e}")
             return self.create_fallback_plan(user_request)
 
+    def _planning_prompt(self, user_request: str, available_tools: List[str],
+                         context: Dict = None) -> str:
+        return self.planning_prompt_template.format(
+            user_request=user_request,
+            available_tools=", ".join(available_tools),
+            current_context=context or "없음"
+        )
+
     def validate_plan(self, plan: Dict) -> bool:
         """계획의 유효성을 검증합니다"""
         required_fields = ['steps']
@@ -122,5 +391,5 @@ class Planner:
                 }
             ],
             "estimated_time": "알 수 없음",
-            "potential_risks": ["자동 생성된 기본 계획"]
+            "potential_risks": [FALLBACK_RISK]
         }
@@ -0,0 +1,199 @@
+"""
+가벼운 실행 추적과 콘솔 출력 제어
+- Tracer: 요청 하나를 루트 구간(span)으로, 그 안의 단계·LLM 호출·도구 호출을 자식 구간으로 기록합니다.
+  끝난 추적은 고정 크기 링 버퍼에 남고, Chrome trace-event JSON으로 내보낼 수 있습니다
+  (chrome://tracing, https://ui.perfetto.dev 에서 열면 플레임그래프로 보입니다).
+- 현재 구간은 contextvars로 전달하므로 asyncio 작업마다 부모가 올바르게 이어집니다.
+- echo(): 구성요소의 진행 출력. verbosity(False) 안에서는 아무것도 출력하지 않습니다.
+"""
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+_verbose: ContextVar[bool] = ContextVar("verbose", default=True)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+_trace_ids = itertools.count(1)
+
+
+def echo(*args, **kwargs):
+    """진행 상황 출력 (verbosity(False) 안에서는 출력하지 않습니다)"""
+    if _verbose.get():
+        print(*args, **kwargs)
+
+
+def is_verbose() -> bool:
+    return _verbose.get()
+
+
+@contextmanager
+def verbosity(enabled: bool) -> Iterator[None]:
+    """이 블록과 여기서 만든 asyncio 작업의 echo() 출력을 켜거나 끕니다"""
+    token = _verbose.set(enabled)
+    try:
+        yield
+    finally:
+        _verbose.reset(token)
+
+
+class Span:
+    """구간 하나 - 시각은 time.perf_counter_ns() 기준 나노초입니다"""
+
+    __slots__ = ("tracer", "trace", "span_id", "parent_id", "name", "category",
+                 "start_ns", "end_ns", "lane", "attrs")
+
+    def __init__(self, tracer: "Tracer", trace: Dict[str, Any], parent: Optional["Span"],
+                 name: str, category: str, concurrent: bool, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.trace = trace
+        self.span_id = next(_span_ids)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.category = category
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+        # 같은 레인의 구간은 겹치지 않고 포개집니다. 동시에 도는 구간은 새 레인을 씁니다
+        self.lane = self.span_id if concurrent or parent is None else parent.lane
+        self.attrs = attrs
+
+    @property
+    def duration(self) -> float:
+        """초 단위 소요 시간 (끝나지 않았으면 지금까지)"""
+        end = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return (end - self.start_ns) / 1e9
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id, "parent_id": self.parent_id, "name": self.name,
+            "category": self.category, "start_ns": self.start_ns, "end_ns": self.end_ns,
+            "duration": self.duration, "lane": self.lane, "attrs": dict(self.attrs),
+        }
+
+
+class Tracer:
+    """
+    구간 기록기
+    루트 구간이 끝나면 그 추적(구간 목록)을 capacity개짜리 링 버퍼에 넣습니다.
+    enabled=False면 span()은 아무것도 기록하지 않고 None을 줍니다.
+    """
+
+    def __init__(self, capacity: int = 100, enabled: bool = True):
+        self.enabled = enabled
+        self._traces: "deque[Dict[str, Any]]" = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.dropped_spans = 0
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", concurrent: bool = False,
+             activate: bool = True, **attrs) -> Iterator[Optional[Span]]:
+        """
+        구간을 기록합니다. 현재 구간이 이 Tracer의 것이면 그 자식이 되고, 아니면 새 추적을 시작합니다.
+        activate=False면 현재 구간으로 설정하지 않습니다 (비동기 제너레이터처럼
+        yield 사이에 호출한 쪽 코드가 실행되는 곳에서 씁니다).
+        """
+        if not self.enabled:
+            yield None
+            return
+        parent = _current_span.get()
+        if parent is None or parent.tracer is not self or parent.end_ns is not None:
+            parent = None
+            trace = {"trace_id": next(_trace_ids), "spans": []}
+        else:
+            trace = parent.trace
+        current = Span(self, trace, parent, name, category, concurrent, attrs)
+        token = _current_span.set(current) if activate else None
+        try:
+            yield current
+        except BaseException as e:
+            current.attrs["error"] = repr(e)
+            raise
+        finally:
+            current.end_ns = time.perf_counter_ns()
+            if token is not None:
+                _current_span.reset(token)
+            self._finish(current)
+
+    def _finish(self, finished: Span):
+        trace = finished.trace
+        if trace.get("closed"):
+            # 루트가 끝난 뒤에 끝난 구간 (예: 백그라운드 작업)은 버립니다
+            self.dropped_spans += 1
+            return
+        trace["spans"].append(finished)
+        if finished.parent_id is None:
+            trace["closed"] = True
+            trace["name"] = finished.name
+            trace["duration"] = finished.duration
+            with self._lock:
+                self._traces.append(trace)
+
+    def traces(self) -> List[Dict[str, Any]]:
+        """링 버퍼에 남은 추적 (오래된 것부터)"""
+        with self._lock:
+            traces = list(self._traces)
+        return [{"trace_id": trace["trace_id"], "name": trace["name"],
+                 "duration": trace["duration"],
+                 "spans": [span.to_dict() for span in trace["spans"]]} for trace in traces]
+
+    def last_trace(self) -> Optional[Dict[str, Any]]:
+        traces = self.traces()
+        return traces[-1] if traces else None
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+
+    def export_chrome_trace(self, path: Optional[str] = None,
+                            traces: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Chrome trace-event 형식(완료 이벤트 "X")으로 내보냅니다
+        추적마다 pid를, 레인마다 tid를 따로 써서 동시에 실행된 단계가 서로 다른 줄에 보입니다.
+        path를 주면 파일로도 씁니다.
+        """
+        traces = traces if traces is not None else self.traces()
+        events = []
+        for trace in traces:
+            pid = trace["trace_id"]
+            events.append({"ph": "M", "name": "process_name", "pid": pid, "tid": 0,
+                           "args": {"name": f"{trace['name']} #{pid}"}})
+            for span in trace["spans"]:
+                events.append({
+                    "ph": "X", "name": span["name"], "cat": span["category"],
+                    "ts": span["start_ns"] / 1000, "dur": (span["end_ns"] - span["start_ns"]) / 1000,
+                    "pid": pid, "tid": span["lane"],
+                    "args": dict(span["attrs"], span_id=span["span_id"],
+                                 parent_id=span["parent_id"]),
+                })
+        document = {"traceEvents": events, "displayTimeUnit": "ms"}
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(document, f, ensure_ascii=False, default=str)
+        return document
+
+
+def annotate(**attrs):
+    """현재 구간에 속성을 덧붙입니다 (추적 중이 아니면 무시합니다)"""
+    current = _current_span.get()
+    if current is not None and current.end_ns is None:
+        current.attrs.update(attrs)
+
+
+@contextmanager
+def span(name: str, category: str = "stage", concurrent: bool = False,
+         activate: bool = True, **attrs) -> Iterator[Optional[Span]]:
+    """
+    지금 추적 중인 요청이 있으면 그 안에 자식 구간을 기록합니다
+    (없으면 아무것도 하지 않으므로 구성요소를 단독으로 쓸 때 비용이 거의 없습니다)
+    """
+    parent = _current_span.get()
+    if parent is None or parent.end_ns is not None:
+        yield None
+        return
+    with parent.tracer.span(name, category, concurrent=concurrent, activate=activate,
+                            **attrs) as current:
+        yield current
@@ -0,0 +1,141 @@
+import heapq
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# 영문·숫자 단어와 한글 음절 덩어리를 함께 잡습니다
+_WORD_RE = re.compile(r"\w+")
+_HANGUL_RE = re.compile(r"[가-힣]")
+
+
+def tokenize(text: str) -> Set[str]:
+    """
+    검색어 단위로 텍스트를 나눕니다
+    - 영문·숫자는 소문자 단어 그대로 사용합니다.
+    - 한글은 조사·어미가 붙어도 찾을 수 있도록 두 글자씩(bigram) 나눕니다.
+      예: "회의를" → {"회의를", "회의", "의를"}
+    """
+    terms = set()
+    for word in set(_WORD_RE.findall(text.lower())):
+        terms.add(word)
+        if len(word) > 2 and _HANGUL_RE.search(word):
+            terms.update(word[i:i + 2] for i in range(len(word) - 1))
+    return terms
+
+
+def query_terms(text: str) -> Set[str]:
+    """
+    검색어를 색인 단위로 바꿉니다
+    두 글자 이상인 한글 단어는 bigram으로만 찾아야 "회의" 검색이 "회의를"에도 맞습니다.
+    """
+    terms = set()
+    for word in set(_WORD_RE.findall(text.lower())):
+        if len(word) > 2 and _HANGUL_RE.search(word):
+            terms.update(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            terms.add(word)
+    return terms
+
+
+def searchable_text(value: Any, skip_keys=("id", "timestamp")) -> str:
+    """
+    기억 항목에서 검색 대상 텍스트만 모읍니다
+    딕셔너리 키, 항목 id, 시각은 모든 항목에 들어 있어 검색에 도움이 되지 않으므로 뺍니다.
+    """
+    parts: List[str] = []
+
+    def walk(item: Any, top_level: bool):
+        if isinstance(item, dict):
+            for key, child in item.items():
+                if top_level and key in skip_keys:
+                    continue
+                walk(child, False)
+        elif isinstance(item, (list, tuple, set)):
+            for child in item:
+                walk(child, False)
+        elif isinstance(item, datetime) or item is None:
+            return
+        else:
+            parts.append(str(item))
+
+    walk(value, True)
+    return " ".join(parts)
+
+
+class InvertedIndex:
+    """
+    단어 → 문서 번호 집합(posting list)으로 된 역색인
+    문서 번호는 저장 순서대로 늘어나므로 큰 번호일수록 최근 문서입니다.
+
+    max_scan: 일부만 겹치는 문서를 찾을 때 통째로 훑을 posting list의 최대 길이.
+        이보다 흔한 단어는 불용어처럼 후보 수집에서 빼고 점수에만 더합니다.
+    """
+
+    def __init__(self, max_scan: int = 1000):
+        self.max_scan = max_scan
+        self.postings: Dict[str, Set[int]] = {}
+        self.doc_terms: Dict[int, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def add(self, doc_id: int, text: str):
+        terms = tokenize(text)
+        self.doc_terms[doc_id] = terms
+        for term in terms:
+            self.postings.setdefault(term, set()).add(doc_id)
+
+    def remove(self, doc_id: int):
+        for term in self.doc_terms.pop(doc_id, ()):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            posting.discard(doc_id)
+            if not posting:
+                del self.postings[term]
+
+    def search(self, query: str, k: int,
+               allowed: Optional[Iterable[int]] = None) -> List[int]:
+        """
+        검색어와 겹치는 단어가 많은 순서, 같으면 최근 순서로 문서 번호 k개를 돌려줍니다
+        모든 단어를 포함하는 문서는 posting list 교집합으로 먼저 찾고,
+        부족할 때만 일부 단어가 겹치는 문서까지 넓혀 셉니다.
+        allowed가 주어지면 그 안의 문서만 돌려줍니다 (메모리 종류 필터).
+        """
+        terms = query_terms(query)
+        if not terms:
+            candidates = self.doc_terms.keys() if allowed is None else allowed
+            return heapq.nlargest(k, candidates)
+
+        postings = sorted((self.postings.get(term, set()) for term in terms), key=len)
+        allowed = None if allowed is None else set(allowed)
+
+        # 1) 모든 단어를 포함하는 문서: 가장 짧은 목록부터 교집합
+        full = set(postings[0])
+        for posting in postings[1:]:
+            if not full:
+                break
+            full &= posting
+        if allowed is not None:
+            full &= allowed
+        ranked = heapq.nlargest(k, full)
+        if len(ranked) >= k or len(terms) == 1:
+            return ranked
+
+        # 2) 부족하면 겹치는 단어 수로 순위를 매겨 채웁니다
+        #    후보는 드문 단어의 목록에서만 모으므로 문서가 늘어도 검색 시간이 거의 같습니다
+        rare = [posting for posting in postings if len(posting) <= self.max_scan]
+        if not rare:
+            rare = postings[:1]
+        common = postings[len(rare):]
+        overlap = Counter()
+        for posting in rare:
+            overlap.update(posting)
+        for doc_id in overlap:
+            overlap[doc_id] += sum(doc_id in posting for posting in common)
+        partial = heapq.nlargest(k - len(ranked), (
+            (count, doc_id) for doc_id, count in overlap.items()
+            if doc_id not in full and (allowed is None or doc_id in allowed)
+        ))
+        return ranked + [doc_id for _, doc_id in partial]
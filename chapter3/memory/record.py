@@ -0,0 +1,63 @@
+import sys
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+_MISSING = object()
+
+
+class MemoryRecord:
+    """
+    기억 한 건
+    딕셔너리에 시각(datetime)과 uuid 문자열을 덧붙이는 대신
+    정수 id, float 시각, intern된 종류 태그, 원본 내용(payload) 참조만 슬롯에 둡니다.
+    payload는 복사하지 않으므로 저장한 뒤 원본을 바꾸면 기억도 바뀝니다.
+
+    기존 딕셔너리처럼 record['content'], record.get('timestamp')로도 읽을 수 있습니다
+    ('id', 'timestamp', 'type'은 슬롯 값, 나머지는 payload에서 찾습니다).
+    """
+
+    __slots__ = ("id", "timestamp", "kind", "payload")
+
+    def __init__(self, id: int, timestamp: float, kind: str, payload: Dict[str, Any]):
+        self.id = id
+        self.timestamp = timestamp
+        self.kind = sys.intern(kind)
+        self.payload = payload
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key == "id":
+            return self.id
+        if key == "timestamp":
+            return datetime.fromtimestamp(self.timestamp)
+        if key == "type":
+            return self.kind
+        return self.payload.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return key in ("id", "timestamp", "type") or key in self.payload
+
+    def to_dict(self) -> Dict[str, Any]:
+        """직렬화용 딕셔너리 (payload 사본 + id, timestamp, type)"""
+        data = dict(self.payload)
+        data.update(id=self.id, timestamp=self.get("timestamp"), type=self.kind)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], kind: Optional[str] = None) -> "MemoryRecord":
+        """to_dict()로 만든 딕셔너리(예: 디스크에서 읽은 기록)를 다시 기록으로 만듭니다"""
+        payload = dict(data)
+        record_id = payload.pop("id", 0)
+        timestamp = payload.pop("timestamp", None)
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+        kind = kind or payload.pop("type", None) or "memory"
+        return cls(record_id, timestamp or 0.0, kind, payload)
+
+    def __repr__(self) -> str:
+        return f"MemoryRecord(id={self.id}, kind={self.kind!r}, payload={self.payload!r})"
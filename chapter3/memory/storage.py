@@ -0,0 +1,449 @@
+"""
+장기 기억 영속화 계층 (SQLite WAL)
+- 저장은 호출한 스레드를 막지 않도록 큐에 넣고, 백그라운드 스레드가 모아서 한 트랜잭션으로 씁니다.
+- 프로세스가 다시 시작되면 기억 본문은 읽지 않고 (순번, 시각, 중요도)만 담은
+  작은 배열 색인을 만든 뒤, 본문은 필요할 때 한 건씩 읽어 LRU 캐시에 둡니다.
+- 검색용 단어는 FTS5 테이블에 함께 저장하므로 메모리에 올리지 않고도 찾을 수 있습니다.
+"""
+import json
+import os
+import pickle
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+_MEMORY_DIR = os.path.dirname(os.path.abspath(__file__))
+if _MEMORY_DIR not in sys.path:
+    sys.path.insert(0, _MEMORY_DIR)
+
+from inverted_index import query_terms, searchable_text, tokenize
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    tier TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    importance REAL NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS memory_terms USING fts5(terms);
+CREATE VIRTUAL TABLE IF NOT EXISTS memory_vocab USING fts5vocab(memory_terms, 'row');
+"""
+
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    return str(value)
+
+
+def _json_object_hook(obj: Dict) -> Any:
+    if len(obj) == 1 and "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+def encode_record(record: Dict) -> str:
+    return json.dumps(record, default=_json_default, ensure_ascii=False)
+
+
+def decode_record(payload: str) -> Dict:
+    return json.loads(payload, object_hook=_json_object_hook)
+
+
+class SQLiteMemoryStore:
+    """
+    SQLite(WAL 모드)에 기억을 저장하는 영속 저장소
+
+    - append(): 순번을 바로 정해 메모리 색인에 넣고, 디스크 쓰기는 백그라운드 스레드가
+      batch_size개 또는 flush_interval초 단위로 모아서 처리합니다.
+      아직 쓰이지 않은 기록도 get()으로 읽을 수 있습니다.
+    - 메모리 색인: 순번·시각·중요도만 담은 array 3개 (항목당 20바이트)
+    - get()/recent()/search(): 본문은 그때 읽어 cache_size개까지 LRU로 보관합니다.
+    """
+
+    def __init__(self, path: str, batch_size: int = 1000, flush_interval: float = 0.05,
+                 cache_size: int = 1024, max_scan: int = 1000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.cache_size = cache_size
+        self.max_scan = max_scan  # 부분 일치 검색에서 이보다 흔한 단어는 빼고 찾습니다
+
+        self._conn = self._connect()
+        self._conn.executescript(_SCHEMA)
+        self._read_lock = threading.Lock()
+
+        # 메모리 색인: 같은 위치끼리 한 기록을 이룹니다
+        self._seqs = array("q")
+        self._timestamps = array("d")
+        self._importance = array("f")
+        self._load_index()
+        self._next_seq = (self._seqs[-1] + 1) if self._seqs else 1
+
+        self._cache: "OrderedDict[int, Dict]" = OrderedDict()
+        self._unflushed: Dict[int, Dict] = {}
+        self._state_lock = threading.Lock()
+        self.cache_hits = 0
+        self.disk_reads = 0
+        self.batches_written = 0
+        self.records_written = 0
+        self.last_error: Optional[str] = None
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="memory-writer",
+                                        daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # WAL에서는 커밋마다 fsync하지 않아도 안전합니다
+        return conn
+
+    def _load_index(self):
+        """본문 없이 (순번, 시각, 중요도)만 읽어 메모리 색인을 만듭니다"""
+        cursor = self._conn.execute(
+            "SELECT seq, timestamp, importance FROM memories ORDER BY seq")
+        while True:
+            rows = cursor.fetchmany(50000)
+            if not rows:
+                break
+            seqs, timestamps, importance = zip(*rows)
+            self._seqs.extend(seqs)
+            self._timestamps.extend(timestamps)
+            self._importance.extend(importance)
+
+    def __len__(self) -> int:
+        return len(self._seqs)
+
+    def last_record_id(self) -> int:
+        """가장 최근에 저장된 기록의 정수 id (없거나 정수가 아니면 0)"""
+        with self._read_lock:
+            row = self._conn.execute(
+                "SELECT id FROM memories ORDER BY seq DESC LIMIT 1").fetchone()
+        try:
+            return int(row[0]) if row else 0
+        except ValueError:
+            return 0
+
+    # ------------------------------------------------------------------
+    # 쓰기
+    # ------------------------------------------------------------------
+    def append(self, record: Dict, tier: str = "long", importance: float = 0.5) -> int:
+        return self.append_many([record], tier=tier, importance=importance)[0]
+
+    def append_many(self, records: Iterable[Dict], tier: str = "long",
+                    importance: float = 0.5) -> List[int]:
+        """
+        기록을 저장 대기열에 넣고 순번 목록을 돌려줍니다
+        기록은 딕셔너리 또는 MemoryRecord(to_dict()가 있는 객체)입니다.
+        내용은 지금 시점으로 직렬화하므로 이후 원본을 바꿔도 저장 내용은 바뀌지 않습니다.
+        기록에 'importance'가 없으면 인자로 받은 값을 씁니다.
+        """
+        rows = []
+        seqs = []
+        with self._state_lock:
+            for record in records:
+                seq = self._next_seq
+                self._next_seq += 1
+                data = record.to_dict() if hasattr(record, "to_dict") else record
+                timestamp = data.get("timestamp")
+                timestamp = (timestamp.timestamp() if isinstance(timestamp, datetime)
+                             else time.time())
+                score = float(data.get("importance", importance))
+                text = searchable_text(getattr(record, "payload", record))
+                rows.append((seq, str(data.get("id", seq)), tier, timestamp, score,
+                             encode_record(data), " ".join(tokenize(text))))
+                self._seqs.append(seq)
+                self._timestamps.append(timestamp)
+                self._importance.append(score)
+                self._unflushed[seq] = record
+                seqs.append(seq)
+        if rows:
+            self._queue.put(rows)
+        return seqs
+
+    def _write_loop(self):
+        conn = self._connect()
+        stop = False
+        while not stop:
+            batch = self._queue.get()
+            if batch is None:
+                self._queue.task_done()
+                break
+            batches = 1
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    more = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if more is None:
+                    stop = True
+                    batches += 1
+                    break
+                batch.extend(more)
+                batches += 1
+            self._write_batch(conn, batch)
+            for _ in range(batches):
+                self._queue.task_done()
+        conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, rows: List[tuple]):
+        """
+        기록을 한 트랜잭션으로 씁니다
+        이미 있는 id를 다시 저장하면 새 순번의 기록만 남기고, 예전 순번은 FTS 행과
+        메모리 색인에서도 지웁니다. 쓰기에 실패하면 이 기록들을 메모리 색인에서 되돌립니다.
+        """
+        # 같은 배치 안에서 같은 id가 여러 번 나오면 마지막 기록만 씁니다
+        latest = {row[1]: row for row in rows}
+        written = [row for row in rows if latest[row[1]] is row]
+        superseded = [row[0] for row in rows if latest[row[1]] is not row]
+        try:
+            with conn:
+                # 새 순번은 아직 쓰이지 않았으므로 찾은 순번은 모두 예전 기록입니다
+                replaced = self._existing_seqs(conn, list(latest))
+                conn.executemany("DELETE FROM memory_terms WHERE rowid = ?",
+                                 [(seq,) for seq in replaced])
+                conn.executemany("DELETE FROM memories WHERE seq = ?",
+                                 [(seq,) for seq in replaced])
+                conn.executemany(
+                    "INSERT INTO memories (seq, id, tier, timestamp, importance, payload)"
+                    " VALUES (?, ?, ?, ?, ?, ?)", [row[:6] for row in written])
+                conn.executemany("INSERT INTO memory_terms (rowid, terms) VALUES (?, ?)",
+                                 [(row[0], row[6]) for row in written])
+            self.batches_written += 1
+            self.records_written += len(written)
+            dropped = superseded + replaced
+        except sqlite3.Error as e:
+            self.last_error = str(e)
+            print(f"[Memory] 기억 저장 실패 ({len(rows)}건): {e}")
+            dropped = [row[0] for row in rows]   # 디스크에 없는 기록이 색인에 남지 않도록
+        with self._state_lock:
+            for row in rows:
+                self._unflushed.pop(row[0], None)
+            self._drop_from_index(dropped)
+
+    @staticmethod
+    def _existing_seqs(conn: sqlite3.Connection, ids: List[str]) -> List[int]:
+        """이미 저장된 id들의 순번 (SQLite 변수 개수 제한 때문에 나눠서 찾습니다)"""
+        seqs = []
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            seqs.extend(seq for (seq,) in conn.execute(
+                "SELECT seq FROM memories WHERE id IN (%s)" % ",".join("?" * len(chunk)),
+                chunk))
+        return seqs
+
+    def _drop_from_index(self, seqs: Iterable[int]):
+        """메모리 색인과 캐시에서 순번들을 지웁니다 (_state_lock을 잡은 상태에서 호출)"""
+        for seq in sorted(seqs, reverse=True):
+            self._cache.pop(seq, None)
+            pos = bisect_left(self._seqs, seq)   # 순번은 늘어나는 순서로만 추가됩니다
+            if pos < len(self._seqs) and self._seqs[pos] == seq:
+                del self._seqs[pos]
+                del self._timestamps[pos]
+                del self._importance[pos]
+
+    def flush(self):
+        """대기 중인 기록이 모두 디스크에 쓰일 때까지 기다립니다"""
+        self._queue.join()
+
+    def close(self):
+        """남은 기록을 쓰고 백그라운드 스레드와 연결을 닫습니다"""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        with self._read_lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------
+    # 읽기 (지연 로딩)
+    # ------------------------------------------------------------------
+    def get(self, seq: int) -> Optional[Dict]:
+        """순번으로 기록을 읽습니다 (캐시 → 아직 쓰이지 않은 기록 → 디스크 순서)"""
+        with self._state_lock:
+            record = self._cache.get(seq)
+            if record is not None:
+                self._cache.move_to_end(seq)
+                self.cache_hits += 1
+                return record
+            record = self._unflushed.get(seq)
+            if record is not None:
+                return record
+        with self._read_lock:
+            row = self._conn.execute(
+                "SELECT payload FROM memories WHERE seq = ?", (seq,)).fetchone()
+        if row is None:
+            return None
+        record = decode_record(row[0])
+        with self._state_lock:
+            self.disk_reads += 1
+            self._cache[seq] = record
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return record
+
+    def recent(self, n: int = 10) -> List[Dict]:
+        """가장 최근에 저장된 기록 n개 (메모리 색인의 뒤쪽부터 읽습니다)"""
+        seqs = self._seqs[-n:] if n > 0 else []
+        records = [self.get(seq) for seq in reversed(seqs)]
+        return [record for record in records if record is not None]
+
+    def search(self, query: str, k: int = 5, exclude: Iterable[str] = ()) -> List[Dict]:
+        """
+        검색어의 단어를 모두 포함한 기록을 최근 순으로 먼저 찾고,
+        모자라면 일부만 겹치는 기록을 관련도(BM25) 순으로 채웁니다
+        아직 디스크에 쓰이지 않은 기록은 다음 flush 이후에 검색됩니다.
+        """
+        terms = sorted(query_terms(query))
+        if not terms or k <= 0:
+            return []
+        exclude = set(exclude)
+        seqs: List[int] = []
+        limit = k + len(exclude)
+        with self._read_lock:
+            queries = [(self._match(terms, " AND "), "rowid DESC")]
+            if len(terms) > 1:
+                # 흔한 단어까지 OR로 찾으면 그 단어의 모든 기록을 채점하게 되므로
+                # 드문 단어로만 찾습니다 (InvertedIndex와 같은 방식)
+                counts = dict(self._conn.execute(
+                    "SELECT term, doc FROM memory_vocab WHERE term IN (%s)"
+                    % ",".join("?" * len(terms)), terms).fetchall())
+                rare = [term for term in terms if 0 < counts.get(term, 0) <= self.max_scan]
+                if not rare and counts:
+                    rare = [min(counts, key=counts.get)]
+                if rare:
+                    queries.append((self._match(rare, " OR "), "rank"))
+            for match, order in queries:
+                rows = self._conn.execute(
+                    "SELECT rowid FROM memory_terms WHERE memory_terms MATCH ?"
+                    f" ORDER BY {order} LIMIT ?", (match, limit + len(seqs))).fetchall()
+                for (seq,) in rows:
+                    if seq not in seqs:
+                        seqs.append(seq)
+                if len(seqs) >= limit:
+                    break
+
+        results = []
+        for seq in seqs:
+            record = self.get(seq)
+            if record is None or record.get("id") in exclude:
+                continue
+            results.append(record)
+            if len(results) >= k:
+                break
+        return results
+
+    @staticmethod
+    def _match(terms: List[str], operator: str) -> str:
+        return operator.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._seqs),
+            "unflushed": len(self._unflushed),
+            "batches_written": self.batches_written,
+            "records_written": self.records_written,
+            "index_bytes": sum(a.itemsize * len(a) for a in
+                               (self._seqs, self._timestamps, self._importance)),
+            "cache_size": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "disk_reads": self.disk_reads,
+            "last_error": self.last_error,
+        }
+
+
+class SQLiteSessionStore:
+    """
+    유휴 세션의 기억을 보관하는 저장소 (세션 하나 = pickle 한 행)
+    AgentRuntime이 오래 쓰이지 않은 세션을 메모리에서 내릴 때 save()하고,
+    그 세션에 다시 요청이 오면 pop()으로 읽어 되살립니다.
+    기억 내용에는 정수 키 딕셔너리(선행 단계 결과)나 datetime이 들어 있으므로
+    JSON 대신 pickle로 저장해 load()한 상태가 save()한 상태와 같게 합니다.
+    예전 버전이 JSON으로 저장한 행도 읽을 수 있습니다.
+    호출한 스레드에서 바로 처리하므로, 이벤트 루프에서는 작업 스레드로 넘겨 호출합니다.
+    path를 주지 않으면 프로세스 메모리 안의 SQLite를 씁니다 (재시작하면 사라집니다).
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY, updated REAL NOT NULL, state BLOB NOT NULL)")
+        self._lock = threading.Lock()
+        self.saves = 0
+        self.loads = 0
+        self.bytes_written = 0
+
+    def save(self, session_id: str, state: Dict[str, Any]):
+        payload = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, updated, state) VALUES (?, ?, ?)",
+                (session_id, time.time(), payload))
+            self.saves += 1
+            self.bytes_written += len(payload)
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return self._decode(row[0]) if row is not None else None
+
+    def pop(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """세션 상태를 읽고 저장소에서 지웁니다 (없으면 None)"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT state FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self.loads += 1
+        return self._decode(row[0])
+
+    @staticmethod
+    def _decode(payload: Any) -> Dict[str, Any]:
+        """pickle로 저장한 행 (예전 버전의 JSON 문자열 행은 JSON으로 읽습니다)"""
+        if isinstance(payload, str):
+            return decode_record(payload)
+        return pickle.loads(payload)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        return cursor.rowcount > 0
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self),
+            "saves": self.saves,
+            "loads": self.loads,
+            "bytes_written": self.bytes_written,
+        }
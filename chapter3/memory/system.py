@@ -1,76 +1,316 @@
+import itertools
+import math
+import os
+import sys
+import time
 from collections import deque
-from datetime import datetime
-from typing import Dict, List, Any
-import uuid
+from typing import Dict, List, Any, Optional, Set
+
+_MEMORY_DIR = os.path.dirname(os.path.abspath(__file__))
+# 진행 출력 제어(echo)는 core 폴더의 tracing 모듈을 씁니다
+_CORE_DIR = os.path.abspath(os.path.join(_MEMORY_DIR, os.pardir, "core"))
+for _p in (_MEMORY_DIR, _CORE_DIR):
+    if _p not in sys.path:
+        sys.path.insert(0, _p)
+
+from inverted_index import InvertedIndex, searchable_text, tokenize
+from record import MemoryRecord
+from tracing import echo
+from vector_store import InMemoryVectorStore
+
+
+def _deep_size(obj: Any, seen: Optional[Set[int]] = None) -> int:
+    """컨테이너 안쪽까지 합친 대략적인 메모리 사용량 (바이트)"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(key, seen) + _deep_size(value, seen)
+                    for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(_deep_size(item, seen) for item in obj)
+    return size
+
 
 class MemorySystem:
     """
     에이전트의 기억 시스템
     단기, 장기, 작업 기억을 통합 관리합니다
+    검색은 저장할 때마다 갱신하는 역색인으로 처리하므로 기억이 늘어도 느려지지 않습니다.
+    기억은 MemoryRecord(정수 id, float 시각, 종류 태그, 원본 참조)로 보관합니다.
     """
     
-    def __init__(self, vector_store=None):
+    def __init__(self, vector_store=None, storage=None,
+                 long_term_budget: Optional[int] = 64 * 1024 * 1024, compact: bool = True):
         # 단기 기억: 최근 100개 상호작용만 유지
         self.short_term_memory = deque(maxlen=100)
 
         # 장기 기억: 중요한 정보를 영구 저장
-        self.long_term_memory = []  # 실제로는 벡터 DB 사용
+        # 의미 검색은 벡터 저장소가 맡습니다 (기본값은 numpy 기반 메모리 내 저장소)
+        self.long_term_memory = []
+        self.vector_store = vector_store if vector_store is not None else InMemoryVectorStore()
+        # 영속 저장소 (예: SQLiteMemoryStore). 이전 실행의 장기 기억은 검색할 때 읽어 옵니다
+        self.storage = storage
+
+        # 장기 기억 용량 제한 (바이트, None이면 제한 없음)
+        # 넘으면 중요도·최신성·조회 빈도 점수가 낮은 기억부터 내보내고,
+        # compact=True면 내보내는 기억 중 비슷한 것끼리 요약 기록 하나로 합칩니다
+        self.long_term_budget = long_term_budget
+        self.compact = compact
+        self.recency_half_life = 24 * 3600
+        self._long_meta: Dict[int, Dict[str, float]] = {}
+        self._long_bytes = 0
+        self.evicted_count = 0
+        self.compacted_count = 0
 
         # 작업 기억: 현재 작업 콘텍스트
         self.working_memory = {}
         
         self.importance_threshold = 0.7
+
+        # 역색인: 기억 id → 기억, 기억 id → 들어 있는 기억 종류
+        # id는 저장 순서대로 늘어나므로 역색인의 최신순 정렬에 그대로 씁니다
+        self._index = InvertedIndex()
+        self._docs: Dict[int, MemoryRecord] = {}
+        self._tiers: Dict[str, Set[int]] = {'short': set(), 'long': set(), 'working': set()}
+
+        # 이전 실행에서 저장한 기억과 id가 겹치지 않도록 이어서 매깁니다
+        first_id = storage.last_record_id() + 1 if storage is not None else 1
+        self._ids = itertools.count(first_id)
     
-    def store(self, information: Dict, memory_type: str = 'short'):
+    def store(self, information: Dict, memory_type: str = 'short',
+              kind: Optional[str] = None) -> MemoryRecord:
         """
         정보를 메모리에 저장합니다
+        information은 복사하지 않고 기록의 payload로 참조합니다.
+        kind는 기억 종류 태그입니다 (없으면 information['type'], 그것도 없으면 'memory').
         """
-        information['timestamp'] = datetime.now()
-        information['id'] = str(uuid.uuid4())
+        record = MemoryRecord(next(self._ids), time.time(),
+                              kind or information.get('type') or 'memory', information)
         
         if memory_type == 'short':
-            self.short_term_memory.append(information)
+            # 가득 찬 deque는 가장 오래된 항목을 밀어내므로 색인에서도 미리 뺍니다
+            if len(self.short_term_memory) == self.short_term_memory.maxlen:
+                self._unindex(self.short_term_memory[0], 'short')
+            self.short_term_memory.append(record)
+            self._index_memory(record, 'short')
             
             # 중요도 평가하여 장기 기억으로 승격  ❹
-            if self._evaluate_importance(information) > self.importance_threshold:
-                self.long_term_memory.append(information)
-                print(f" 중요 정보를 장기 기억으로 승격")
+            importance = self._evaluate_importance(record)
+            if importance > self.importance_threshold:
+                self._add_long_term(record, importance)
+                if self.storage is not None:
+                    self.storage.append(record, tier='long', importance=importance)
+                echo(f" 중요 정보를 장기 기억으로 승격")
+                self._enforce_budget()
                 
         elif memory_type == 'working':
             # 작업 기억에 저장
-            key = information.get('key', information['id'])
-            self.working_memory[key] = information
+            key = information.get('key', record.id)
+            previous = self.working_memory.get(key)
+            if previous is not None:
+                self._unindex(previous, 'working')
+            self.working_memory[key] = record
+            self._index_memory(record, 'working')
+        return record
     
-    def retrieve(self, query: str, memory_type: str = 'all', k: int = 5) -> List:
+    def retrieve(self, query: str, memory_type: str = 'all', k: int = 5,
+                 min_similarity: float = 0.0) -> List:
         """
         관련 기억을 검색합니다
+        검색어의 단어를 모두 포함한 기억을 먼저, 그다음 많이 겹치는 기억을
+        같은 조건이면 최근 것부터 돌려줍니다. 단기·장기에 함께 있는 기억은 한 번만 나옵니다.
+        memory_type='long'이면 벡터 저장소에서 유사도·최신성·중요도를 섞은 점수로 찾습니다.
+        이때 유사도가 min_similarity 이하인 기억은 최근이거나 중요해도 돌려주지 않습니다.
+        영속 저장소가 있으면 결과가 k개보다 적을 때 디스크의 장기 기억으로 채웁니다.
         """
-        results = []
-        
-        # 작업 기억에서 먼저 검색 (가장 빠름)
-        if memory_type in ['all', 'working']:
-            for value in self.working_memory.values():
-                if query.lower() in str(value).lower():
-                    results.append(value)
-        
-        # 단기 기억에서 검색
-        if memory_type in ['all', 'short']:
-            for memory in self.short_term_memory:
-                if query.lower() in str(memory).lower():
-                    results.append(memory)
-        
-        # 장기 기억에서 검색
-        if memory_type in ['all', 'long']:
-            for memory in self.long_term_memory:
-                if query.lower() in str(memory).lower():
-                    results.append(memory)
-        
-        # 최근 것부터 반환
-        return sorted(results, 
-                     key=lambda x: x.get('timestamp', datetime.min), 
-                     reverse=True)[:k]
+        if memory_type == 'long':
+            hits = self.vector_store.search(query, k, min_similarity=min_similarity)
+            results = [hit['item'] for hit in hits]
+        else:
+            allowed: Optional[Set[int]] = None
+            if memory_type != 'all':
+                allowed = self._tiers.get(memory_type, set())
+            doc_ids = self._index.search(query, k, allowed=allowed)
+            results = [self._docs[doc_id] for doc_id in doc_ids]
+
+        now = time.time()
+        for record in results:
+            meta = self._long_meta.get(record.id)
+            if meta is not None:
+                meta['hits'] += 1
+                meta['last_access'] = now
+
+        if (self.storage is not None and memory_type in ('all', 'long')
+                and len(results) < k):
+            seen = [record.id for record in results]
+            for stored in self.storage.search(query, k - len(results), exclude=seen):
+                results.append(stored if isinstance(stored, MemoryRecord)
+                               else MemoryRecord.from_dict(stored))
+        return results
+
+    def export_state(self) -> Dict[str, Any]:
+        """
+        메모리에 있는 기억(단기·장기·작업)을 pickle로 저장할 수 있는 딕셔너리로 내보냅니다
+        유휴 세션을 저장소로 내렸다가 load_state()로 되살릴 때 씁니다.
+        영속 저장소(storage)에 이미 있는 기억은 담지 않습니다.
+        """
+        records: Dict[int, MemoryRecord] = {}
+        for record in itertools.chain(self.short_term_memory, self.long_term_memory,
+                                      self.working_memory.values()):
+            records[record.id] = record
+        return {
+            'records': [record.to_dict() for record in records.values()],
+            'short': [record.id for record in self.short_term_memory],
+            'long': [[record.id, self._long_meta[record.id]['importance'],
+                      self._long_meta[record.id]['hits'],
+                      self._long_meta[record.id]['last_access']]
+                     for record in self.long_term_memory],
+            'working': [[key, record.id] for key, record in self.working_memory.items()],
+            'evicted': self.evicted_count,
+            'compacted': self.compacted_count,
+        }
+
+    def load_state(self, state: Dict[str, Any]):
+        """export_state()로 내보낸 기억을 비어 있는 MemorySystem에 다시 넣고 색인합니다"""
+        records = {}
+        for data in state.get('records', []):
+            record = MemoryRecord.from_dict(data)
+            records[record.id] = record
+        for record_id in state.get('short', []):
+            self.short_term_memory.append(records[record_id])
+            self._index_memory(records[record_id], 'short')
+        for record_id, importance, hits, last_access in state.get('long', []):
+            self._add_long_term(records[record_id], importance)
+            self._long_meta[record_id].update(hits=hits, last_access=last_access)
+        for key, record_id in state.get('working', []):
+            self.working_memory[key] = records[record_id]
+            self._index_memory(records[record_id], 'working')
+        self.evicted_count = state.get('evicted', 0)
+        self.compacted_count = state.get('compacted', 0)
+        if records:
+            self._ids = itertools.count(max(records) + 1)
+
+    def close(self):
+        """영속 저장소의 대기 중인 기록을 디스크에 쓰고 닫습니다"""
+        if self.storage is not None:
+            self.storage.close()
+
+    # ------------------------------------------------------------------
+    # 장기 기억 용량 관리
+    # ------------------------------------------------------------------
+    def _add_long_term(self, record: MemoryRecord, importance: float):
+        self.long_term_memory.append(record)
+        self._index_memory(record, 'long')
+        self.vector_store.add(record.id, searchable_text(record.payload), record,
+                              importance=importance, timestamp=record.timestamp)
+        size = sys.getsizeof(record) + _deep_size(record.payload)
+        self._long_meta[record.id] = {
+            'size': size, 'importance': importance, 'hits': 0,
+            'last_access': record.timestamp,
+        }
+        self._long_bytes += size
+
+    def _retention_score(self, record: MemoryRecord, now: float) -> float:
+        """남겨 둘 가치: 중요도 50% + 최신성 30% + 조회 빈도 20% (0~1)"""
+        meta = self._long_meta[record.id]
+        age = max(0.0, now - meta['last_access'])
+        recency = 0.5 ** (age / self.recency_half_life)
+        frequency = min(1.0, math.log1p(meta['hits']) / math.log1p(10))
+        return 0.5 * meta['importance'] + 0.3 * recency + 0.2 * frequency
+
+    def _enforce_budget(self):
+        """
+        장기 기억이 예산을 넘으면 점수가 낮은 기억부터 예산의 90%가 될 때까지 내보냅니다
+        매번 조금씩 지우지 않고 한 번에 여유를 만들어 정렬 비용을 나눠 냅니다.
+        """
+        if self.long_term_budget is None or self._long_bytes <= self.long_term_budget:
+            return
+        target = self.long_term_budget * 0.9
+        now = time.time()
+        victims = []
+        remaining = self._long_bytes
+        for record in sorted(self.long_term_memory,
+                             key=lambda m: self._retention_score(m, now)):
+            if remaining <= target:
+                break
+            victims.append(record)
+            remaining -= self._long_meta[record.id]['size']
+
+        victim_ids = {record.id for record in victims}
+        self.long_term_memory = [m for m in self.long_term_memory if m.id not in victim_ids]
+        for record in victims:
+            self._unindex(record, 'long')
+            self.vector_store.remove(record.id)
+            self._long_bytes -= self._long_meta.pop(record.id)['size']
+        self.evicted_count += len(victims)
+
+        if self.compact:
+            for group in self._group_similar(victims):
+                if len(group) >= 2:
+                    summary, importance = self._summarize_group(group)
+                    self._add_long_term(summary, importance)
+                    self.compacted_count += len(group)
+
+    def _group_similar(self, memories: List[MemoryRecord],
+                       threshold: float = 0.8) -> List[List[MemoryRecord]]:
+        """내용 단어의 자카드 유사도가 threshold 이상인 기억끼리 묶습니다"""
+        groups: List[tuple] = []
+        for memory in memories:
+            terms = tokenize(str(memory.get('content', '')))
+            for group_terms, group in groups:
+                union = len(terms | group_terms)
+                if union and len(terms & group_terms) / union >= threshold:
+                    group.append(memory)
+                    break
+            else:
+                groups.append((terms, [memory]))
+        return [group for _, group in groups]
+
+    def _summarize_group(self, group: List[MemoryRecord]) -> tuple:
+        """비슷한 경험 여러 개를 계획·결과 없이 내용만 남긴 요약 기록 하나로 만듭니다"""
+        contents = list(dict.fromkeys(str(m.get('content', '')) for m in group))
+        oldest = min(group, key=lambda m: m.timestamp)
+        newest = max(group, key=lambda m: m.timestamp)
+        summary = MemoryRecord(next(self._ids), newest.timestamp, 'summary', {
+            'content': f"비슷한 경험 {len(group)}건 요약: " + " / ".join(contents[:3]),
+            'summary_of': len(group),
+            'first_seen': oldest.get('timestamp'),
+            'last_seen': newest.get('timestamp'),
+        })
+        importance = max(self._evaluate_importance(m) for m in group)
+        return summary, importance
+
+    def long_term_stats(self) -> Dict[str, Any]:
+        """장기 기억 크기와 내보내기·요약 횟수"""
+        return {
+            'entries': len(self.long_term_memory),
+            'bytes': self._long_bytes,
+            'budget_bytes': self.long_term_budget,
+            'evicted': self.evicted_count,
+            'compacted': self.compacted_count,
+        }
+
+    def _index_memory(self, record: MemoryRecord, tier: str):
+        """기억을 역색인에 추가합니다 (이미 색인된 기억이면 종류만 추가)"""
+        if record.id not in self._docs:
+            self._docs[record.id] = record
+            self._index.add(record.id, searchable_text(record.payload))
+        self._tiers[tier].add(record.id)
+
+    def _unindex(self, record: MemoryRecord, tier: str):
+        """기억을 한 종류에서 빼고, 어느 종류에도 남지 않으면 색인에서 지웁니다"""
+        if record.id not in self._docs:
+            return
+        self._tiers[tier].discard(record.id)
+        if not any(record.id in docs for docs in self._tiers.values()):
+            self._index.remove(record.id)
+            del self._docs[record.id]
     
-    def _evaluate_importance(self, information: Dict) -> float:
+    def _evaluate_importance(self, information) -> float:
         """정보의 중요도를 평가합니다"""
         score = 0.5  # 기본 점수
         
@@ -91,5 +331,7 @@ class MemorySystem:
     
     def clear_working_memory(self):
         """작업 기억을 비웁니다 (작업 완료 시)"""
+        for record in self.working_memory.values():
+            self._unindex(record, 'working')
         self.working_memory.clear()
-        print("작업 기억이 초기화되었습니다")
+        echo("작업 기억이 초기화되었습니다")
@@ -0,0 +1,254 @@
+"""
+장기 기억용 벡터 저장소
+- VectorStore: MemorySystem이 사용하는 저장소 인터페이스 (다른 벡터 DB로 바꿔 끼울 수 있습니다)
+- InMemoryVectorStore: 임베딩을 연속된 float32 행렬 하나에 모아 두고
+  행렬-벡터 곱 한 번과 argpartition으로 상위 k개를 찾는 기본 구현
+- HashingEmbedder: 외부 모델 없이 동작하는 해싱 임베딩 (단어 → 차원 해시)
+"""
+import hashlib
+import math
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError as _e:
+    raise ImportError(
+        "numpy 패키지가 필요합니다. `pip install numpy` 로 설치해 주세요."
+    ) from _e
+
+_MEMORY_DIR = os.path.dirname(os.path.abspath(__file__))
+if _MEMORY_DIR not in sys.path:
+    sys.path.insert(0, _MEMORY_DIR)
+
+from inverted_index import tokenize
+
+
+class HashingEmbedder:
+    """
+    단어를 해시로 dim차원 중 하나에 더하는 임베딩 (feature hashing)
+    같은 단어를 많이 공유하는 텍스트일수록 코사인 유사도가 높아집니다.
+    실제 서비스에서는 임베딩 모델 호출 함수로 바꿔 끼우면 됩니다.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def __call__(self, texts: Sequence[str]) -> "np.ndarray":
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term in tokenize(text):
+                digest = hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                # 부호도 해시로 정해 충돌한 단어끼리 서로 상쇄되도록 합니다
+                vectors[row, value % self.dim] += 1.0 if value >> 63 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class VectorStore:
+    """
+    장기 기억 저장소 인터페이스
+    add / search / remove / __len__ 을 구현하면 MemorySystem(vector_store=...)로 쓸 수 있습니다.
+    """
+
+    def add(self, item_id: str, text: str, item: Dict,
+            importance: float = 0.5, timestamp: Optional[float] = None):
+        raise NotImplementedError
+
+    def search(self, query: str, k: int = 5,
+               min_similarity: Optional[float] = None) -> List[Dict]:
+        """
+        점수가 높은 순서로 {'item', 'score', 'similarity'} 목록을 돌려줍니다
+        min_similarity를 주면 유사도가 그 값 이하인 기억은 점수가 높아도 빼야 합니다.
+        """
+        raise NotImplementedError
+
+    def remove(self, item_id: str) -> bool:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class InMemoryVectorStore(VectorStore):
+    """
+    numpy 행렬 기반 기본 벡터 저장소
+
+    - 임베딩은 (용량 × 차원) float32 행렬에 행 단위로 쌓고, 가득 차면 두 배로 늘립니다.
+    - 삭제는 마지막 행을 빈자리로 옮겨 행렬이 항상 앞쪽부터 꽉 차 있게 합니다.
+    - 같은 내용은 해시 캐시에서 임베딩을 꺼내 다시 계산하지 않습니다.
+    - 점수 = 유사도 × similarity_weight + 최신성 × recency_weight + 중요도 × importance_weight
+      (최신성은 half_life초마다 절반으로 줄어듭니다)
+    """
+
+    def __init__(self, embedder: Optional[Callable[[Sequence[str]], "np.ndarray"]] = None,
+                 initial_capacity: int = 1024, cache_size: int = 4096,
+                 similarity_weight: float = 0.7, recency_weight: float = 0.15,
+                 importance_weight: float = 0.15, half_life: float = 7 * 24 * 3600):
+        self.embedder = embedder or HashingEmbedder()
+        self.similarity_weight = similarity_weight
+        self.recency_weight = recency_weight
+        self.importance_weight = importance_weight
+        self.half_life = half_life
+
+        self._capacity = initial_capacity
+        self._vectors: Optional[np.ndarray] = None   # 첫 임베딩에서 차원을 정합니다
+        self._timestamps = np.zeros(initial_capacity, dtype=np.float64)
+        self._importance = np.zeros(initial_capacity, dtype=np.float32)
+        self._ids: List[str] = []
+        self._items: List[Dict] = []
+        self._rows: Dict[str, int] = {}
+
+        # 내용 해시 → 임베딩 LRU 캐시
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    # ------------------------------------------------------------------
+    # 저장과 삭제
+    # ------------------------------------------------------------------
+    def add(self, item_id: str, text: str, item: Dict,
+            importance: float = 0.5, timestamp: Optional[float] = None):
+        self.add_many([(item_id, text, item, importance, timestamp)])
+
+    def add_many(self, entries: Sequence[tuple]):
+        """
+        (item_id, text, item, importance, timestamp) 목록을 한 번에 저장합니다
+        캐시에 없는 텍스트만 모아 임베딩 함수를 한 번 호출합니다.
+        """
+        if not entries:
+            return
+        vectors = self._embed([entry[1] for entry in entries])
+        self._reserve(len(self._ids) + len(entries), vectors.shape[1])
+        now = time.time()
+        for (item_id, _, item, importance, timestamp), vector in zip(entries, vectors):
+            row = self._rows.get(item_id)
+            if row is None:
+                row = len(self._ids)
+                self._ids.append(item_id)
+                self._items.append(item)
+                self._rows[item_id] = row
+            else:
+                self._items[row] = item
+            self._vectors[row] = vector
+            self._timestamps[row] = now if timestamp is None else timestamp
+            self._importance[row] = importance
+
+    def remove(self, item_id: str) -> bool:
+        row = self._rows.pop(item_id, None)
+        if row is None:
+            return False
+        last = len(self._ids) - 1
+        if row != last:
+            # 마지막 행을 빈자리로 옮깁니다
+            self._vectors[row] = self._vectors[last]
+            self._timestamps[row] = self._timestamps[last]
+            self._importance[row] = self._importance[last]
+            self._ids[row] = self._ids[last]
+            self._items[row] = self._items[last]
+            self._rows[self._ids[row]] = row
+        self._ids.pop()
+        self._items.pop()
+        return True
+
+    def _reserve(self, size: int, dim: int):
+        if self._vectors is None:
+            self._capacity = max(self._capacity, size)
+            self._vectors = np.zeros((self._capacity, dim), dtype=np.float32)
+            self._timestamps = np.resize(self._timestamps, self._capacity)
+            self._importance = np.resize(self._importance, self._capacity)
+            return
+        if dim != self._vectors.shape[1]:
+            raise ValueError(f"임베딩 차원이 다릅니다: {dim} != {self._vectors.shape[1]}")
+        if size <= self._capacity:
+            return
+        while self._capacity < size:
+            self._capacity *= 2
+        used = len(self._ids)
+        for name in ("_vectors", "_timestamps", "_importance"):
+            old = getattr(self, name)
+            grown = np.zeros((self._capacity,) + old.shape[1:], dtype=old.dtype)
+            grown[:used] = old[:used]
+            setattr(self, name, grown)
+
+    # ------------------------------------------------------------------
+    # 검색
+    # ------------------------------------------------------------------
+    def search(self, query: str, k: int = 5,
+               min_similarity: Optional[float] = None) -> List[Dict]:
+        n = len(self._ids)
+        if n == 0 or k <= 0:
+            return []
+        query_vector = self._embed([query])[0]
+        similarity = self._vectors[:n] @ query_vector
+
+        scores = similarity * np.float32(self.similarity_weight)
+        if self.recency_weight:
+            # 에포크 초는 float32로 바꾸면 정밀도가 부족하므로 나이를 먼저 계산합니다
+            age = (time.time() - self._timestamps[:n]).astype(np.float32)
+            decay = np.float32(-math.log(2) / self.half_life)
+            scores += np.float32(self.recency_weight) * np.exp(np.maximum(age, 0) * decay)
+        if self.importance_weight:
+            scores += np.float32(self.importance_weight) * self._importance[:n]
+
+        # 관련 없는 기억은 최신성·중요도 점수가 높아도 상위 k개에 들지 못하도록 먼저 뺍니다
+        if min_similarity is not None:
+            rows = np.flatnonzero(similarity > min_similarity)
+        else:
+            rows = np.arange(n)
+        # 전체 정렬 대신 상위 k개만 골라낸 뒤 그 안에서 정렬합니다
+        if k < len(rows):
+            top = rows[np.argpartition(scores[rows], len(rows) - k)[len(rows) - k:]]
+        else:
+            top = rows
+        top = top[np.argsort(scores[top])[::-1]]
+        return [{"item": self._items[row], "score": float(scores[row]),
+                 "similarity": float(similarity[row])} for row in top]
+
+    # ------------------------------------------------------------------
+    # 임베딩 캐시
+    # ------------------------------------------------------------------
+    def _embed(self, texts: Sequence[str]) -> "np.ndarray":
+        keys = [hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+                for text in texts]
+        found: Dict[bytes, np.ndarray] = {}
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key in found or key in missing:
+                continue
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                found[key] = vector
+                self.cache_hits += 1
+            else:
+                missing[key] = text
+                self.cache_misses += 1
+        if missing:
+            fresh = np.asarray(self.embedder(list(missing.values())), dtype=np.float32)
+            for key, vector in zip(missing, fresh):
+                found[key] = vector
+                self._cache[key] = vector
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return np.stack([found[key] for key in keys])
+
+    def stats(self) -> Dict[str, Any]:
+        dim = 0 if self._vectors is None else self._vectors.shape[1]
+        return {
+            "size": len(self._ids),
+            "capacity": self._capacity,
+            "dim": dim,
+            "matrix_bytes": 0 if self._vectors is None else self._vectors.nbytes,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
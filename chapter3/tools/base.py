@@ -1,6 +1,16 @@
+import asyncio
+import contextvars
+import json
+import multiprocessing
 import os
+import pickle
+import random
 import sys
-from typing import Any, Dict, List
+import threading
+import weakref
+from concurrent.futures import Executor as PoolExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional
 from datetime import datetime
 
 # 코드 2-6의 통합 LLM 인터페이스를 불러옵니다.
@@ -11,7 +21,83 @@ _CHAPTER2_DIR = os.path.abspath(
 if _CHAPTER2_DIR not in sys.path:
     sys.path.insert(0, _CHAPTER2_DIR)
 
-from llm_interface import LLM
+from llm_interface import shared_llm
+from llm_transport import run_sync  # 캐시 갱신 스레드가 비동기 실행 경로를 쓸 때 필요합니다
+
+_TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+# 호출 추적과 진행 출력 제어는 core 폴더의 tracing 모듈을 씁니다
+_CORE_DIR = os.path.abspath(os.path.join(_TOOLS_DIR, os.pardir, "core"))
+for _p in (_TOOLS_DIR, _CORE_DIR):
+    if _p not in sys.path:
+        sys.path.insert(0, _p)
+
+from result_cache import STALE, ToolResultCache
+from router import ToolRouter
+from tracing import echo, span
+
+
+@dataclass
+class RetryPolicy:
+    """
+    도구 호출의 재시도 정책
+    재시도 전 대기 시간은 0 ~ min(max_delay, base_delay × 2^attempt) 사이에서 무작위로 고릅니다
+    (full jitter). 여러 단계가 동시에 실패해도 재시도가 한꺼번에 몰리지 않습니다.
+    """
+    max_attempts: int = 3      # 첫 시도를 포함한 최대 시도 횟수
+    base_delay: float = 1.0    # 첫 재시도 대기 시간의 상한 (초)
+    max_delay: float = 30.0    # 대기 시간 상한 (초)
+
+    def __post_init__(self):
+        if self.max_attempts < 1:
+            raise ValueError(f"max_attempts는 1 이상이어야 합니다 (받은 값: {self.max_attempts})")
+
+    def backoff(self, attempt: int) -> float:
+        """attempt번째(0부터) 실패 후 기다릴 시간"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+# 실행 중인 도구 호출의 취소 신호 (작업 스레드마다 따로 보관)
+_call_state = threading.local()
+
+
+def bind_cancel_event(event: Optional[threading.Event]):
+    """Executor가 도구를 실행하기 전에 현재 스레드에 취소 신호를 연결합니다"""
+    _call_state.cancel_event = event
+
+
+def is_cancelled() -> bool:
+    """
+    현재 도구 호출이 시간 초과로 취소되었는지 확인합니다
+    오래 걸리는 도구는 중간중간 이 값을 확인하고 작업을 멈추면 됩니다.
+    """
+    event = getattr(_call_state, "cancel_event", None)
+    return event is not None and event.is_set()
+
+
+def _call_with_cancel(func, input_data: Dict[str, Any],
+                      cancel_event: Optional[threading.Event]) -> Any:
+    """작업 스레드에서 취소 신호를 연결한 채로 동기 도구를 실행합니다"""
+    bind_cancel_event(cancel_event)
+    try:
+        return func(input_data)
+    finally:
+        bind_cancel_event(None)
+
+
+class _ThreadCall:
+    """작업 스레드에서 실행하는 동기 도구 호출 하나 (시간 초과 뒤에도 스레드를 차지하는지 추적합니다)"""
+    __slots__ = ("started", "finished", "abandoned")
+
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self.abandoned = False   # 기다리던 쪽이 취소(시간 초과)되어 결과를 버린 호출
+
+
+def _run_in_process(tool: "BaseTool", input_data: Dict[str, Any]) -> Any:
+    """프로세스 풀의 작업 프로세스에서 실행됩니다 (도구와 입력은 피클로 전달됩니다)"""
+    return tool.execute(input_data)
+
 
 class BaseTool:
     """
@@ -19,19 +105,65 @@ class BaseTool:
 
     참고: ABC를 상속하지 않아 직접 인스턴스화할 수 있습니다.
     실제 프로덕션에서는 추상 클래스로 만들고 구체적인 도구를 구현해야 합니다.
+
+    동기 도구는 execute를, 비동기 도구(HTTP 호출 등)는 aexecute를 오버라이드합니다.
+    둘 중 하나만 구현하면 나머지는 기본 어댑터가 채워 줍니다 (둘 다 super()로 서로를 부르면 안 됩니다).
     """
-    def __init__(self, name: str, description: str):
+    def __init__(self, name: str, description: str,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 timeout: Optional[float] = None,
+                 cpu_bound: bool = False,
+                 max_concurrency: Optional[int] = None,
+                 cacheable: bool = False,
+                 cache_ttl: float = 300.0,
+                 cache_key: Optional[Callable[[Dict[str, Any]], Hashable]] = None,
+                 stale_ttl: float = 0.0):
         self.name = name
         self.description = description
         self.usage_count = 0
 
+        # 실행 메타데이터: Executor가 재시도와 시간 제한에 사용합니다
+        self.retry_policy = retry_policy  # None이면 Executor 기본 정책
+        self.timeout = timeout            # 한 번 호출의 제한 시간 (초, None이면 무제한)
+        # CPU를 오래 쓰는 도구는 ToolManager가 프로세스 풀에서 실행합니다
+        # (도구 객체와 입력이 피클 가능해야 하고, 작업 프로세스에서 바뀐 도구 상태는 돌아오지 않습니다)
+        self.cpu_bound = cpu_bound
+        self.max_concurrency = max_concurrency  # 이 도구를 동시에 실행할 최대 호출 수 (None이면 무제한)
+        # 같은 입력에 같은 결과를 돌려주는 도구는 결과 캐시를 허용할 수 있습니다
+        # cache_key: 입력 → 캐시 키 (없으면 입력 전체), stale_ttl: 만료 후 오래된 결과를 쓰며 갱신할 시간
+        self.cacheable = cacheable
+        self.cache_ttl = cache_ttl
+        self.cache_key = cache_key
+        self.stale_ttl = stale_ttl
+
+    @property
+    def is_async(self) -> bool:
+        """aexecute를 직접 구현한 비동기 도구인지"""
+        return type(self).aexecute is not BaseTool.aexecute
+
+    def make_cache_key(self, input_data: Dict[str, Any]) -> Hashable:
+        """결과 캐시 키 (cache_key가 없으면 입력 전체를 정렬된 JSON으로 씁니다)"""
+        if self.cache_key is not None:
+            return self.cache_key(input_data)
+        return json.dumps(input_data, sort_keys=True, default=str, ensure_ascii=False)
+
     def execute(self, input_data: Dict[str, Any]) -> Any:
         """
         도구를 실행합니다.
 
         기본 구현은 시뮬레이션 결과를 반환합니다.
         실제 도구는 이 메서드를 오버라이드해야 합니다.
+        aexecute만 구현한 도구는 새 이벤트 루프에서 aexecute를 실행합니다.
         """
+        if self.is_async:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return asyncio.run(self.aexecute(input_data))
+            raise RuntimeError(
+                f"이벤트 루프 안에서는 await {self.name}.aexecute(...)를 사용하세요."
+            )
+
         self.usage_count += 1
         # 시뮬레이션: 입력을 받아서 성공 결과 반환
         return {
@@ -40,6 +172,14 @@ class BaseTool:
             'data': f"{self.description} 완료",
             'input': input_data
         }
+
+    async def aexecute(self, input_data: Dict[str, Any]) -> Any:
+        """
+        도구를 비동기로 실행합니다.
+        기본 구현은 동기 execute를 기본 스레드 풀에서 실행하므로 이벤트 루프를 막지 않습니다.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.execute, input_data)
     
     def validate_input(self, input_data: Dict[str, Any]) -> bool:
         """입력 데이터의 유효성을 검증"""
@@ -85,14 +225,35 @@ class ToolManager:
     """
     모든 도구를 관리하는 클래스
     """
-    def __init__(self, llm=None):
+    def __init__(self, llm=None, router: Optional[ToolRouter] = None,
+                 process_workers: Optional[int] = None,
+                 result_cache: Optional[ToolResultCache] = None):
         self.tools = {}  
-        self.llm = llm or LLM()  # 통합 LLM 인터페이스 사용
+        self.llm = llm or shared_llm()  # 통합 LLM 인터페이스 (프로세스 공유 인스턴스)
+        # 도구 설명 임베딩 색인 - 애매할 때만 LLM에게 묻습니다
+        self.router = router if router is not None else ToolRouter()
+
+        # CPU 작업용 프로세스 풀 (처음 필요할 때 만듭니다)
+        self.process_workers = process_workers or os.cpu_count() or 1
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        # 이벤트 루프별 도구 동시 실행 제한 (asyncio.Semaphore는 한 루프에서만 쓸 수 있습니다)
+        self._limits: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+        # cacheable 도구의 결과 캐시. 오래된 결과의 갱신은 이벤트 루프가 끝나도
+        # 이어지도록 별도 스레드에서 합니다
+        self.result_cache = result_cache if result_cache is not None else ToolResultCache()
+        self._refresh_pool: Optional[ThreadPoolExecutor] = None
+
+        # 도구별로 시간 초과 뒤에도 작업 스레드에서 끝나지 않은 동기 호출 수
+        self._stuck: Dict[str, int] = {}
+        self._stuck_lock = threading.Lock()
     
     def register_tool(self, tool: BaseTool):
         """도구를 등록합니다"""
         self.tools[tool.name] = tool
-        print(f" 도구 등록됨: {tool.name}")
+        self.router.add(tool.name, tool.description)
+        echo(f" 도구 등록됨: {tool.name}")
     
     def get_tool(self, name: str) -> BaseTool:
         """이름으로 도구를 가져옵니다"""
@@ -102,13 +263,231 @@ class ToolManager:
         """등록된 모든 도구의 이름을 반환합니다"""
         return list(self.tools.keys())
     
+    def execute_tool(self, name: str, input_data: Dict[str, Any],
+                     cache_scope: Optional[Hashable] = None) -> Any:
+        """이름으로 도구를 찾아 동기로 실행합니다"""
+        tool = self.get_tool(name)
+        if not tool:
+            raise ValueError(f"도구를 찾을 수 없음: {name}")
+        with span(f"tool.{name}", "tool") as current:
+            key, cached, state = self._cache_lookup(tool, input_data, cache_scope)
+            if current is not None and tool.cacheable:
+                current.attrs['cache'] = state or 'miss'
+            if state is not None:
+                return cached
+            result = tool.execute(input_data)
+            self._cache_store(tool, key, result)
+            return result
+
+    async def aexecute_tool(self, name: str, input_data: Dict[str, Any],
+                            thread_pool: Optional[PoolExecutor] = None,
+                            cancel_event: Optional[threading.Event] = None,
+                            cache_scope: Optional[Hashable] = None) -> Any:
+        """
+        도구 종류에 맞는 방식으로 비동기 실행합니다
+        - 비동기 도구: 이벤트 루프에서 바로 await (스레드를 차지하지 않습니다)
+        - CPU 작업 도구: 프로세스 풀에서 실행 (이벤트 루프와 다른 도구를 막지 않습니다)
+        - 그 밖의 동기 도구: thread_pool(없으면 기본 스레드 풀)에서 실행
+        도구에 max_concurrency가 있으면 그 수를 넘는 호출은 차례를 기다립니다.
+        cacheable 도구는 캐시에 있는 결과를 먼저 돌려줍니다.
+        cache_scope(예: 세션 id)를 주면 같은 범위의 호출끼리만 캐시된 결과를 나눠 씁니다.
+        """
+        tool = self.get_tool(name)
+        if not tool:
+            raise ValueError(f"도구를 찾을 수 없음: {name}")
+        with span(f"tool.{name}", "tool") as current:
+            key, cached, state = self._cache_lookup(tool, input_data, cache_scope)
+            if current is not None and tool.cacheable:
+                current.attrs['cache'] = state or 'miss'
+            if state is not None:
+                return cached
+            result = await self._arun(tool, input_data, thread_pool, cancel_event)
+            self._cache_store(tool, key, result)
+            return result
+
+    async def _arun(self, tool: BaseTool, input_data: Dict[str, Any],
+                    thread_pool: Optional[PoolExecutor],
+                    cancel_event: Optional[threading.Event]) -> Any:
+        """캐시를 거치지 않고 도구 종류에 맞게 실행합니다 (max_concurrency 적용)"""
+        limit = self._limit_for(tool)
+        if limit is None:
+            return await self._adispatch(tool, input_data, thread_pool, cancel_event)
+        async with limit:
+            return await self._adispatch(tool, input_data, thread_pool, cancel_event)
+
+    # ------------------------------------------------------------------
+    # 결과 캐시
+    # ------------------------------------------------------------------
+    def _cache_lookup(self, tool: BaseTool, input_data: Dict[str, Any],
+                      scope: Optional[Hashable] = None) -> tuple:
+        """(캐시 키, 결과, FRESH/STALE/None) - 오래된 결과면 뒤에서 갱신을 시작합니다"""
+        if not tool.cacheable:
+            return None, None, None
+        key = tool.make_cache_key(input_data)
+        if scope is not None:
+            key = (scope, key)   # 다른 범위(세션)의 결과와 섞이지 않도록 범위를 키에 넣습니다
+        cached, state = self.result_cache.get(tool.name, key, tool.cache_ttl, tool.stale_ttl)
+        if state == STALE and self.result_cache.begin_refresh(tool.name, key):
+            # 출력 설정(verbosity)이 갱신 스레드에도 적용되도록 현재 콘텍스트에서 실행합니다
+            self._get_refresh_pool().submit(contextvars.copy_context().run,
+                                            self._refresh, tool, key, input_data)
+        return key, cached, state
+
+    def _cache_store(self, tool: BaseTool, key: Hashable, result: Any):
+        """성공한 결과만 저장합니다 (실패 결과를 캐시하면 실패가 ttl 동안 반복됩니다)"""
+        if not tool.cacheable or result is None:
+            return
+        if isinstance(result, dict) and not result.get('success', True):
+            return
+        self.result_cache.put(tool.name, key, result)
+
+    def _refresh(self, tool: BaseTool, key: Hashable, input_data: Dict[str, Any]):
+        """
+        갱신 스레드에서 실행됩니다 - 일반 호출과 같은 경로(CPU 작업은 프로세스 풀, 비동기 도구는 await,
+        max_concurrency와 제한 시간)를 run_sync의 백그라운드 루프에서 탑니다
+        """
+        try:
+            self._cache_store(tool, key, run_sync(self._arefresh(tool, input_data)))
+        except Exception as e:
+            echo(f"[ToolManager] {tool.name} 캐시 갱신 실패: {e}")
+        finally:
+            self.result_cache.end_refresh(tool.name, key)
+
+    async def _arefresh(self, tool: BaseTool, input_data: Dict[str, Any]) -> Any:
+        cancel_event = threading.Event()
+        call = self._arun(tool, input_data, None, cancel_event)
+        if tool.timeout is None:
+            return await call
+        try:
+            return await asyncio.wait_for(call, tool.timeout)
+        except asyncio.TimeoutError:
+            cancel_event.set()
+            raise TimeoutError(f"{tool.name} 시간 초과 ({tool.timeout}초)") from None
+
+    def _get_refresh_pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._refresh_pool is None:
+                self._refresh_pool = ThreadPoolExecutor(
+                    max_workers=2, thread_name_prefix="tool-cache-refresh"
+                )
+            return self._refresh_pool
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """도구별 결과 캐시 적중/실패 횟수"""
+        return self.result_cache.stats()
+
+    async def _adispatch(self, tool: BaseTool, input_data: Dict[str, Any],
+                         thread_pool: Optional[PoolExecutor],
+                         cancel_event: Optional[threading.Event]) -> Any:
+        if tool.is_async:
+            return await tool.aexecute(input_data)
+        loop = asyncio.get_running_loop()
+        if tool.cpu_bound:
+            try:
+                result = await loop.run_in_executor(self._get_process_pool(), _run_in_process,
+                                                    tool, input_data)
+            except (pickle.PicklingError, TypeError, AttributeError) as e:
+                raise self._pickle_error(tool, input_data, e) or e
+            tool.usage_count += 1  # 작업 프로세스의 사본에서 센 값은 돌아오지 않습니다
+            return result
+        call = _ThreadCall()
+        try:
+            return await loop.run_in_executor(thread_pool, self._run_thread_call,
+                                              tool, input_data, cancel_event, call)
+        except asyncio.CancelledError:
+            self._abandon(tool, call)
+            raise
+
+    def _run_thread_call(self, tool: BaseTool, input_data: Dict[str, Any],
+                         cancel_event: Optional[threading.Event], call: _ThreadCall) -> Any:
+        """작업 스레드에서 실행됩니다 - 시간 초과된 호출이 끝나면 stuck_calls에서 뺍니다"""
+        with self._stuck_lock:
+            if call.abandoned:
+                return None   # 스레드를 기다리는 동안 이미 포기한 호출은 시작하지 않습니다
+            call.started = True
+        try:
+            return _call_with_cancel(tool.execute, input_data, cancel_event)
+        finally:
+            with self._stuck_lock:
+                call.finished = True
+                if call.abandoned:
+                    self._stuck[tool.name] -= 1
+
+    def _abandon(self, tool: BaseTool, call: _ThreadCall):
+        with self._stuck_lock:
+            call.abandoned = True
+            if call.started and not call.finished:
+                self._stuck[tool.name] = self._stuck.get(tool.name, 0) + 1
+
+    def stuck_calls(self, name: str) -> int:
+        """
+        시간 초과로 기다리기를 멈췄지만 작업 스레드에서 아직 끝나지 않은 호출 수
+        스레드는 강제로 멈출 수 없으므로, is_cancelled()를 확인하지 않는 도구는 끝날 때까지 스레드를 차지합니다.
+        """
+        with self._stuck_lock:
+            return self._stuck.get(name, 0)
+
+    @staticmethod
+    def _pickle_error(tool: BaseTool, input_data: Dict[str, Any],
+                      error: Exception) -> Optional[TypeError]:
+        """
+        프로세스 풀 호출이 실패했을 때, 도구나 입력을 보내지 못한 탓이면 알아보기 쉬운 오류를 만듭니다
+        호출마다 미리 직렬화해 보면 입력을 두 번 피클하게 되므로 실패했을 때만 확인합니다.
+        (도구 자신이 낸 TypeError 등이면 None - 원래 오류를 그대로 올립니다)
+        """
+        try:
+            pickle.dumps((tool, input_data))
+        except Exception:
+            return TypeError(
+                f"{tool.name}: CPU 작업 도구의 객체와 입력은 피클 가능해야 합니다 ({error})"
+            )
+        return None
+
+    def _limit_for(self, tool: BaseTool) -> Optional[asyncio.Semaphore]:
+        if not tool.max_concurrency:
+            return None
+        limits = self._limits.setdefault(asyncio.get_running_loop(), {})
+        limit = limits.get(tool.name)
+        if limit is None:
+            limit = limits[tool.name] = asyncio.Semaphore(tool.max_concurrency)
+        return limit
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._process_pool is None:
+                # 스레드가 있는 프로세스를 fork하면 잠금 상태까지 복사되므로 spawn으로 시작합니다
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._process_pool
+
+    def close(self):
+        """프로세스 풀과 캐시 갱신 스레드를 정리합니다"""
+        with self._pool_lock:
+            if self._process_pool is not None:
+                self._process_pool.shutdown()
+                self._process_pool = None
+            if self._refresh_pool is not None:
+                self._refresh_pool.shutdown()
+                self._refresh_pool = None
+
     def select_best_tool(self, task_description: str) -> BaseTool:
-        """작업에 가장 적합한 도구를 자동 선택합니다"""
+        """
+        작업에 가장 적합한 도구를 자동 선택합니다
+        설명 임베딩이 가장 비슷한 도구를 고르고, 점수가 애매할 때만
+        상위 후보 몇 개를 LLM에게 보여 주고 고르게 합니다.
+        """
+        selected = self.router.route(task_description, self._choose_with_llm)
+        return self.tools.get(selected) or list(self.tools.values())[0]
+
+    def _choose_with_llm(self, task_description: str, candidates: List[str]) -> str:
+        """후보 도구 중에서 LLM이 하나를 고릅니다"""
         
-        # 도구 정보를 프롬프트에 포함
+        # 도구 정보를 프롬프트에 포함 (전체 목록이 아니라 후보만)
         tools_info = "\n".join([
-            f"- {name}: {tool.description}"
-            for name, tool in self.tools.items()
+            f"- {name}: {self.tools[name].description}"
+            for name in candidates
         ])
         
         prompt = f"""
@@ -121,6 +500,6 @@ class ToolManager:
         """
         
         # LLM을 사용하여 도구 선택
-        selected = self.llm.generate(prompt, temperature=0.1, max_tokens=50)
-        
-        return self.tools.get(selected.strip()) or list(self.tools.values())[0]
+        with span("llm.generate", "llm", purpose="tool_selection"):
+            selected = self.llm.generate(prompt, temperature=0.1, max_tokens=50)
+        return selected.strip()
@@ -0,0 +1,99 @@
+"""
+도구 결과 캐시
+같은 입력이면 같은 결과를 돌려주는(멱등) 도구의 결과를 프로세스 안에 보관합니다.
+- 도구가 BaseTool(cacheable=True, cache_ttl=..., cache_key=...)로 캐시를 허용해야 씁니다.
+- 만료 후 stale_ttl초 동안은 오래된 결과를 바로 돌려주고, 새 결과는 뒤에서 다시 받아 둡니다
+  (stale-while-revalidate).
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+FRESH = "fresh"
+STALE = "stale"
+
+
+def _new_counters() -> Dict[str, int]:
+    return {"hits": 0, "misses": 0, "stale_hits": 0, "refreshes": 0}
+
+
+class ToolResultCache:
+    """
+    (도구 이름, 캐시 키) → (저장 시각, 결과) LRU 캐시
+    항목 수는 max_entries개로 제한하며, 유효 기간은 꺼낼 때 도구의 설정으로 판단합니다.
+    결과는 넣을 때와 꺼낼 때 복사하므로 호출한 쪽이 결과를 바꿔도 캐시는 그대로입니다.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self.evictions = 0
+
+    def get(self, tool_name: str, key: Hashable, ttl: float,
+            stale_ttl: float = 0.0) -> Tuple[Any, Optional[str]]:
+        """(결과, FRESH/STALE) 또는 (None, None)"""
+        with self._lock:
+            counters = self._counters.setdefault(tool_name, _new_counters())
+            entry = self._entries.get((tool_name, key))
+            age = time.monotonic() - entry[0] if entry is not None else None
+            if age is None or age > ttl + stale_ttl:
+                if entry is not None:
+                    del self._entries[(tool_name, key)]
+                counters["misses"] += 1
+                return None, None
+            self._entries.move_to_end((tool_name, key))
+            counters["hits"] += 1
+            state = FRESH
+            if age > ttl:
+                counters["stale_hits"] += 1
+                state = STALE
+            value = entry[1]
+        return copy.deepcopy(value), state
+
+    def put(self, tool_name: str, key: Hashable, value: Any):
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[(tool_name, key)] = (time.monotonic(), value)
+            self._entries.move_to_end((tool_name, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def begin_refresh(self, tool_name: str, key: Hashable) -> bool:
+        """같은 항목을 이미 다시 받고 있으면 False (중복 갱신 방지)"""
+        with self._lock:
+            if (tool_name, key) in self._refreshing:
+                return False
+            self._refreshing.add((tool_name, key))
+            self._counters.setdefault(tool_name, _new_counters())["refreshes"] += 1
+            return True
+
+    def end_refresh(self, tool_name: str, key: Hashable):
+        with self._lock:
+            self._refreshing.discard((tool_name, key))
+
+    def invalidate(self, tool_name: Optional[str] = None):
+        """도구 하나(또는 전체)의 결과를 지웁니다"""
+        with self._lock:
+            if tool_name is None:
+                self._entries.clear()
+                return
+            for entry_key in [k for k in self._entries if k[0] == tool_name]:
+                del self._entries[entry_key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """도구별 적중/실패 횟수와 전체 크기"""
+        with self._lock:
+            tools = {}
+            for name, counters in self._counters.items():
+                total = counters["hits"] + counters["misses"]
+                tools[name] = dict(counters, hit_rate=counters["hits"] / total if total else 0.0)
+            return {"entries": len(self._entries), "evictions": self.evictions, "tools": tools}
@@ -0,0 +1,150 @@
+"""
+도구 라우터
+도구 설명을 등록할 때 한 번만 임베딩해 두고, 작업 설명과 가장 비슷한 도구를 고릅니다.
+1위와 2위 점수가 비슷하거나 1위 점수가 너무 낮을 때만 LLM에게 후보 중에서 고르게 하고,
+같은 작업 설명에 대한 결정은 캐시해 둡니다.
+"""
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 기억 검색과 같은 해싱 임베딩을 쓰기 위해 memory 폴더를 경로에 추가합니다.
+# 진행 출력 제어는 core 폴더의 tracing 모듈을 씁니다.
+_MEMORY_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, "memory")
+)
+_CORE_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, "core")
+)
+for _p in (_MEMORY_DIR, _CORE_DIR):
+    if _p not in sys.path:
+        sys.path.insert(0, _p)
+
+from tracing import echo
+from vector_store import HashingEmbedder
+
+_SPACE_RE = re.compile(r"\s+")
+
+# (작업 설명, 후보 도구 이름 목록) -> 고른 도구 이름
+Chooser = Callable[[str, List[str]], Optional[str]]
+
+
+class ToolRouter:
+    """
+    임베딩 최근접 이웃으로 도구를 고르는 색인
+
+    - add()/remove(): 도구 설명 임베딩을 (도구 수 × 차원) 행렬의 한 행으로 관리합니다.
+      도구 구성이 바뀌면 결정 캐시를 비웁니다.
+    - route(): 1위 유사도가 min_score 이상이고 2위보다 margin 이상 높으면 바로 결정하고,
+      아니면 상위 candidates개만 chooser(보통 LLM)에 넘깁니다.
+    """
+
+    def __init__(self, embedder: Optional[Callable[[Sequence[str]], "np.ndarray"]] = None,
+                 min_score: float = 0.1, margin: float = 0.05, candidates: int = 3,
+                 cache_size: int = 1024):
+        # 도구 설명은 짧아서 차원이 작으면 단어 해시 충돌이 점수를 좌우하므로 넉넉하게 잡습니다
+        self.embedder = embedder or HashingEmbedder(dim=1024)
+        self.min_score = min_score
+        self.margin = margin
+        self.candidates = candidates
+        self.cache_size = cache_size
+
+        self._names: List[str] = []
+        self._vectors: Optional[np.ndarray] = None
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.embedding_decisions = 0
+        self.llm_decisions = 0
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, name: str, description: str):
+        """도구를 색인에 넣습니다 (같은 이름이면 설명 임베딩을 바꿉니다)"""
+        vector = np.asarray(self.embedder([f"{name} {description}"]), dtype=np.float32)
+        with self._lock:
+            if name in self._names:
+                self._vectors[self._names.index(name)] = vector[0]
+            elif self._vectors is None:
+                self._names.append(name)
+                self._vectors = vector
+            else:
+                self._names.append(name)
+                self._vectors = np.vstack([self._vectors, vector])
+            self._cache.clear()
+
+    def remove(self, name: str) -> bool:
+        with self._lock:
+            if name not in self._names:
+                return False
+            row = self._names.index(name)
+            del self._names[row]
+            self._vectors = np.delete(self._vectors, row, axis=0)
+            self._cache.clear()
+            return True
+
+    def rank(self, task_description: str, k: int = 3) -> List[Tuple[str, float]]:
+        """유사도가 높은 순서로 (도구 이름, 코사인 유사도) 최대 k개"""
+        with self._lock:
+            names, vectors = list(self._names), self._vectors
+        if not names or k <= 0:
+            return []
+        query = np.asarray(self.embedder([task_description]), dtype=np.float32)[0]
+        scores = vectors @ query
+        top = np.argsort(scores)[::-1][:k]
+        return [(names[row], float(scores[row])) for row in top]
+
+    def route(self, task_description: str, chooser: Optional[Chooser] = None) -> Optional[str]:
+        """
+        작업에 쓸 도구 이름 (등록된 도구가 없으면 None)
+        chooser가 후보 밖의 이름을 돌려주거나 실패하면 임베딩 1위를 씁니다.
+        """
+        key = _SPACE_RE.sub(" ", task_description.strip().lower())
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return cached
+
+        ranked = self.rank(task_description, max(2, self.candidates))
+        if not ranked:
+            return None
+        best, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+        if chooser is None or (best_score >= self.min_score
+                               and best_score - runner_up >= self.margin):
+            decision = best
+            self.embedding_decisions += 1
+        else:
+            candidates = [name for name, _ in ranked[:self.candidates]]
+            self.llm_decisions += 1
+            try:
+                chosen = chooser(task_description, candidates)
+            except Exception as e:
+                echo(f"[ToolRouter] 도구 선택 실패, 유사도 1위 사용: {e}")
+                chosen = None
+            decision = chosen if chosen in candidates else best
+
+        with self._lock:
+            self._cache[key] = decision
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return decision
+
+    def stats(self) -> Dict[str, Any]:
+        decisions = self.embedding_decisions + self.llm_decisions
+        return {
+            "tools": len(self._names),
+            "cache_size": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "embedding_decisions": self.embedding_decisions,
+            "llm_decisions": self.llm_decisions,
+            "llm_rate": self.llm_decisions / decisions if decisions else 0.0,
+        }
@@ -14,7 +14,7 @@ from langchain_core.outputs import Generation, LLMResult
 
 # 부모 디렉터리의 모듈을 불러오기 위한 경로 추가
 sys.path.append(str(Path(__file__).parent.parent.parent))
-from chapter2.llm_interface import LLM
+from chapter2.llm_interface import LLM, shared_llm
 
 logger = logging.getLogger(__name__)
 
@@ -29,13 +29,15 @@ class CachedLLMBridge(LLM):
     cache_hits: int = 0
     cache_misses: int = 0
 
-    def __init__(self, provider: str = "auto", cache_ttl: int = 3600):
+    def __init__(self, provider: str = "auto", cache_ttl: int = 3600,
+                 llm: Optional[LLM] = None):
         """
         초기화
         cache_ttl: 캐시 유효 시간 (초 단위, 기본 1시간)
+        llm: 공유할 LLM 인스턴스 (주면 그 커넥션 풀을 함께 사용)
         """
         super().__init__()
-        self.llm = LLM(provider=provider)
+        self.llm = llm or shared_llm(provider=provider)
         self._cache = {}
         self.cache_ttl = timedelta(seconds=cache_ttl)
         self.cache_hits = 0
@@ -71,6 +73,17 @@ class CachedLLMBridge(LLM):
         cache_key = self._generate_cache_key(prompt, **kwargs)
 
         # 캐시 확인
+        cached = self._lookup_cache(cache_key)
+        if cached is not None:
+            return cached
+
+        # 캐시 미스 - 실제 LLM 호출
+        self.cache_misses += 1
+        response = self.llm.generate(prompt, **kwargs)
+        return self._store_response(cache_key, response, stop)
+
+    def _lookup_cache(self, cache_key: str) -> Optional[str]:
+        """유효한 캐시 항목이 있으면 응답을 돌려줍니다"""
         if cache_key in self._cache:
             cache_entry = self._cache[cache_key]
             if self._is_cache_valid(cache_entry):
@@ -78,11 +91,11 @@ class CachedLLMBridge(LLM):
                 hit_rate = self.get_cache_hit_rate()
                 logger.info(f"Cache hit! (hit rate: {hit_rate:.1%})")
                 return cache_entry['response']
+        return None
 
-        # 캐시 미스 - 실제 LLM 호출
-        self.cache_misses += 1
-        response = self.llm.generate(prompt, **kwargs)
-
+    def _store_response(self, cache_key: str, response: str,
+                        stop: Optional[List[str]]) -> str:
+        """stop 단어를 처리한 응답을 캐시에 저장합니다"""
         # stop 단어 처리
         if stop:
             for stop_word in stop:
@@ -103,7 +116,15 @@ class CachedLLMBridge(LLM):
         return self.cache_hits / total if total > 0 else 0.0
 
     async def _acall(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
-        return self._call(prompt, stop, **kwargs)
+        """비동기 버전 - 캐시 미스일 때 agenerate로 이벤트 루프를 막지 않고 호출"""
+        cache_key = self._generate_cache_key(prompt, **kwargs)
+        cached = self._lookup_cache(cache_key)
+        if cached is not None:
+            return cached
+
+        self.cache_misses += 1
+        response = await self.llm.agenerate(prompt, **kwargs)
+        return self._store_response(cache_key, response, stop)
 
     def _generate(
         self,
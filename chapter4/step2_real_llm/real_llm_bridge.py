@@ -16,7 +16,7 @@ logger = logging.getLogger(__name__)
 
 # 2장 코드를 불러오기
 sys.path.append(str(Path(__file__).parent.parent.parent / 'chapter2'))
-from llm_interface import LLM
+from llm_interface import LLM, shared_llm
 
 
 class RealLLMBridge(LLM):
@@ -26,15 +26,16 @@ class RealLLMBridge(LLM):
     llm: Any = None
     provider: str = "auto"
 
-    def __init__(self, provider: str = "auto"):  
+    def __init__(self, provider: str = "auto", llm: Optional[LLM] = None):  
         """
         초기화 메서드
         provider: LLM 제공자 ("auto", "ollama", "openai", "mock")
+        llm: 공유할 LLM 인스턴스 (주면 그 커넥션 풀을 함께 사용)
         """
         super().__init__()
 
         # 2장에서 만든 LLM 인터페이스 사용  
-        self.llm = LLM(provider=provider)
+        self.llm = llm or shared_llm(provider=provider)
         self.provider = provider
 
         # 초기화 성공 로그
@@ -76,14 +77,28 @@ class RealLLMBridge(LLM):
             return "죄송합니다. 일시적인 오류가 발생했습니다."
     
     async def _acall(
-              self,
-              prompt: str,
-              stop: Optional[List[str]] = None,
-              **kwargs: Any
-              ) -> str:
-              """비동기 버전"""
-              return self._call(prompt, stop, **kwargs)
-
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 500,
+        **kwargs: Any
+    ) -> str:
+        """비동기 버전 - agenerate를 사용하므로 이벤트 루프를 막지 않습니다"""
+        try:
+            response = await self.llm.agenerate(
+                prompt=prompt,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            if stop:
+                for stop_word in stop:
+                    if stop_word in response:
+                        response = response.split(stop_word)[0]
+            return response
+        except Exception as e:
+            logger.error(f"LLM call failed: {e}")
+            return "죄송합니다. 일시적인 오류가 발생했습니다."
 
     def _generate(
         self,
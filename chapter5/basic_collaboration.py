@@ -2,6 +2,7 @@
 기본 멀티 에이전트: 두 전문가의 순차적 협업
 """
 
+import asyncio
 import sys
 from pathlib import Path
 
@@ -17,7 +18,16 @@ class TechnicalAgent:
         self.llm = CachedLLMBridge(provider="mock")
 
     def analyze(self, problem): 
-        prompt = f"""당신은 기술 지원 전문가입니다.
+        response = self.llm._call(self._build_prompt(problem))
+        return self._parse(response)
+
+    async def aanalyze(self, problem):
+        """analyze의 비동기 버전 (LLM 대기 중에 이벤트 루프를 막지 않음)"""
+        response = await self.llm._acall(self._build_prompt(problem))
+        return self._parse(response)
+
+    def _build_prompt(self, problem):
+        return f"""당신은 기술 지원 전문가입니다.
 고객 문제: {problem}
 
 아래의 형태로 분석하세요:
@@ -25,7 +35,7 @@ class TechnicalAgent:
 - 심각도: (높음/중간/낮음)
 - 권장 조치: (교체 필요/수리 가능/업데이트)"""
 
-        response = self.llm._call(prompt)
+    def _parse(self, response):
         return {
             "analysis": response,
             "needs_replacement": "교체" in response or "하드웨어" in response
@@ -36,7 +46,14 @@ class PolicyAgent:
         self.llm = CachedLLMBridge(provider="mock")
 
     def check(self, tech_result): 
-        prompt = f"""당신은 회사 정책 전문가입니다.
+        return {"guidance": self.llm._call(self._build_prompt(tech_result))}
+
+    async def acheck(self, tech_result):
+        """check의 비동기 버전"""
+        return {"guidance": await self.llm._acall(self._build_prompt(tech_result))}
+
+    def _build_prompt(self, tech_result):
+        return f"""당신은 회사 정책 전문가입니다.
 기술팀 분석: {tech_result['analysis']}
 교체 필요: {tech_result['needs_replacement']}
 
@@ -45,8 +62,6 @@ class PolicyAgent:
 - 필요 절차와 서류
 - 예상 처리 기간"""
 
-        return {"guidance": self.llm._call(prompt)}
-
 class SimpleCoordinator:
     def __init__(self):
         self.tech = TechnicalAgent()
@@ -55,7 +70,15 @@ class SimpleCoordinator:
     def process(self, inquiry): 
         tech_result = self.tech.analyze(inquiry)
         policy_result = self.policy.check(tech_result)
+        return self._format(tech_result, policy_result)
+
+    async def aprocess(self, inquiry):
+        """process의 비동기 버전 - 여러 문의를 한 이벤트 루프에서 동시에 처리할 수 있습니다"""
+        tech_result = await self.tech.aanalyze(inquiry)
+        policy_result = await self.policy.acheck(tech_result)
+        return self._format(tech_result, policy_result)
 
+    def _format(self, tech_result, policy_result):
         return f"""고객님, 문의 주신 내용을 확인했습니다.
 
 【기술 진단】
@@ -68,3 +91,11 @@ if __name__ == "__main__":
     coordinator = SimpleCoordinator()
     result = coordinator.process("제품이 작동하지 않는데, 교환이나 환불이 가능한가요?")
     print(result)
+
+    # 비동기 버전: 여러 문의를 동시에 처리
+    async def main():
+        inquiries = ["화면이 깨졌어요", "전원이 켜지지 않아요"]
+        return await asyncio.gather(*(coordinator.aprocess(q) for q in inquiries))
+
+    for answer in asyncio.run(main()):
+        print(answer)
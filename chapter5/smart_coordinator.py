@@ -63,16 +63,35 @@ class SmartCoordinator:
         if routing["technical_needed"]: 
             print(" 기술 에이전트 활성화...")
             results["tech"] = self.tech_agent.analyze(inquiry)
-            if not routing["policy_needed"]:
-                self.stats["tech_only"] += 1
 
         if routing["policy_needed"]:
             print(" 정책 에이전트 활성화...")
             context = results.get("tech", {})
             results["policy"] = self.policy_agent.check(context)
-            if not routing["technical_needed"]:
-                self.stats["policy_only"] += 1
 
+        return self._finish(routing, results, inquiry)
+
+    async def aprocess(self, inquiry):
+        """process의 비동기 버전 (에이전트의 LLM 호출이 이벤트 루프를 막지 않음)"""
+        self.stats["total"] += 1
+        routing = self.analyze_inquiry_type(inquiry)
+        results = {}
+
+        if routing["technical_needed"]:
+            results["tech"] = await self.tech_agent.aanalyze(inquiry)
+
+        if routing["policy_needed"]:
+            context = results.get("tech", {})
+            results["policy"] = await self.policy_agent.acheck(context)
+
+        return self._finish(routing, results, inquiry)
+
+    def _finish(self, routing, results, inquiry):
+        """통계를 갱신하고 최종 응답을 만듭니다"""
+        if routing["technical_needed"] and not routing["policy_needed"]:
+            self.stats["tech_only"] += 1
+        if routing["policy_needed"] and not routing["technical_needed"]:
+            self.stats["policy_only"] += 1
         if routing["technical_needed"] and routing["policy_needed"]:
             self.stats["both"] += 1
 